@@ -0,0 +1,195 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from twapExecution.exchanges.database import databaseTWAP
+from twapExecution.exchanges.executionMethods.fillEvent import format_fill_time
+from twapExecution.exchanges.executionMethods.preprocessMsg import PreprocessMsg
+from twapExecution.exchanges.utils.utils import compute_rolling_average_price_and_qty
+
+"""
+This is a Fill Path Benchmark, which times the per fill hot path: PreprocessMsg.handle_msg on every exchange's user
+stream messages, compute_rolling_average_price_and_qty, databaseTWAP.execute and ExecutionJournal.record;
+
+Payloads are the recorded user stream messages in benchmarks/fixtures. Every benchmark reports msgs/sec and the
+p50/p99 latency of a single call. --save writes the results, --compare checks them against saved ones and exits
+non zero when msgs/sec dropped by more than --max-regression percent, e.g. from the repo root:
+
+    python -m benchmarks.benchFillPath --save baseline.json
+    python -m benchmarks.benchFillPath --compare baseline.json
+"""
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)
+
+
+def measure(fn, payloads, n_messages, warmup=1000):
+    """
+    Calls fn on payloads round robin and times every call
+
+    Parameters
+    ----------
+    fn function; takes one payload
+    payloads list;
+    n_messages int; timed calls
+    warmup int; untimed calls before
+
+    Returns
+    -------
+    result: dict; messages, msgs_per_sec, p50_us, p99_us
+    """
+    n_payloads = len(payloads)
+    for i in range(min(warmup, n_messages)):
+        fn(payloads[i % n_payloads])
+
+    latencies = np.empty(n_messages)
+    perf_counter_ns = time.perf_counter_ns
+
+    start = perf_counter_ns()
+    for i in range(n_messages):
+        payload = payloads[i % n_payloads]
+        t0 = perf_counter_ns()
+        fn(payload)
+        latencies[i] = perf_counter_ns() - t0
+    elapsed = (perf_counter_ns() - start) / 1e9
+
+    return {'messages': n_messages,
+            'msgs_per_sec': n_messages / elapsed,
+            'p50_us': float(np.percentile(latencies, 50)) / 1e3,
+            'p99_us': float(np.percentile(latencies, 99)) / 1e3}
+
+
+@contextlib.contextmanager
+def _in_directory(path):
+    # The journal writes <db_name>.db into the working directory;
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+def _fills(messages):
+    """
+    FillEvents of the recorded messages as PreprocessMsg returns them, the journal payloads
+    """
+    fills = []
+    for key, exchange_messages in messages.items():
+        preprocessor = PreprocessMsg(*key.split('_'))
+        for message in exchange_messages:
+            msg = preprocessor.handle_msg(message)
+            if msg is not None and msg.price is not None:
+                fills.append(msg)
+    return fills
+
+
+def bench_handle_msg(messages, n_messages):
+    results = {}
+    for key, exchange_messages in messages.items():
+        preprocessor = PreprocessMsg(*key.split('_'))
+        results[f'handle_msg[{key}]'] = measure(preprocessor.handle_msg, exchange_messages, n_messages)
+    return results
+
+
+def bench_rolling_average(fills, n_messages):
+    state = [0., 0.]
+
+    def _update(msg):
+        state[0], state[1] = compute_rolling_average_price_and_qty(state[0], state[1], msg.qty, msg.price)
+
+    return {'rolling_average': measure(_update, fills, n_messages)}
+
+
+def _journal_row(msg, i):
+    return dict(exchange=msg.exchange, market=msg.market, order_id=msg.order_id, symbol=msg.symbol,
+                time=format_fill_time(msg.time), price=msg.price, side=msg.side, qty=msg.qty,
+                overall_average=msg.price, remaining_qty=1. - i * 1e-6, executed_qty=i * 1e-6,
+                complete_flag=False)
+
+
+def bench_journal(fills, n_messages):
+    rows = [_journal_row(msg, i) for i, msg in enumerate(fills)]
+    results = {}
+
+    with tempfile.TemporaryDirectory() as db_dir, _in_directory(db_dir):
+        results['databaseTWAP.execute'] = measure(lambda row: databaseTWAP.execute('BENCH_EXECUTE', **row),
+                                                  rows, n_messages, warmup=10)
+
+        journal = databaseTWAP.ExecutionJournal('BENCH_JOURNAL')
+        try:
+            results['ExecutionJournal.record'] = measure(lambda row: journal.record(**row), rows, n_messages)
+        finally:
+            journal.close()
+
+    return results
+
+
+def compare(results, baseline, max_regression):
+    """
+    Prints the change of every benchmark against baseline; returns the names that regressed
+    """
+    regressed = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        change = (result['msgs_per_sec'] / baseline[name]['msgs_per_sec'] - 1) * 100
+        p99_change = (result['p99_us'] / baseline[name]['p99_us'] - 1) * 100
+        flag = ''
+        if change < -max_regression:
+            regressed.append(name)
+            flag = '  REGRESSION'
+        print(f'{name:<40}msgs/sec {change:+7.1f}%  p99 {p99_change:+7.1f}%{flag}')
+    return regressed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='----FILL PATH BENCHMARK----')
+    parser.add_argument('--messages', type=int, default=100000, help='timed calls per in memory benchmark')
+    parser.add_argument('--journal-messages', type=int, default=2000, help='timed calls per journal benchmark')
+    parser.add_argument('--only', default=None, help='run the benchmarks whose name contains this')
+    parser.add_argument('--save', default=None, help='write the results to this json file')
+    parser.add_argument('--compare', default=None, help='json file written by --save')
+    parser.add_argument('--max-regression', type=float, default=10., help='percent of msgs/sec')
+
+    args = parser.parse_args()
+
+    messages = load_fixture('userStreamMessages.json')
+
+    # PreprocessMsg and the TWAP print per message, time them as they are but keep the terminal readable;
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        fills = _fills(messages)
+        results = {}
+        if args.only is None or 'handle_msg' in args.only:
+            results.update(bench_handle_msg(messages, args.messages))
+        if args.only is None or 'rolling' in args.only:
+            results.update(bench_rolling_average(fills, args.messages))
+        if args.only is None or 'execute' in args.only or 'Journal' in args.only:
+            results.update(bench_journal(fills, args.journal_messages))
+
+    results = {name: result for name, result in results.items() if args.only is None or args.only in name}
+
+    for name, result in results.items():
+        print(f'{name:<40}{result["msgs_per_sec"]:>14,.0f} msgs/sec  p50 {result["p50_us"]:>9.2f}us  '
+              f'p99 {result["p99_us"]:>9.2f}us')
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        if compare(results, baseline, args.max_regression):
+            sys.exit(1)
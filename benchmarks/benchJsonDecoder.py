@@ -0,0 +1,52 @@
+import argparse
+import json
+
+from benchmarks.benchFillPath import load_fixture, measure
+from twapExecution.exchanges.utils.jsonDecoder import SCHEMAS, available_backends, get_decoder, get_typed_decoder
+
+"""
+This is a JSON Decoder Benchmark, which compares every installed backend of jsonDecoder on recorded frames;
+
+Frames are the market data frames (Binance bookTicker/aggTrade, OKEx, Coinbase and Deribit tickers) and the user
+stream messages in benchmarks/fixtures, as they come off the socket. Binance frames are also decoded into the
+typed records of get_typed_decoder. From the repo root:
+
+    python -m benchmarks.benchJsonDecoder
+"""
+
+
+def frames():
+    streams = load_fixture('marketDataFrames.json')
+    for key, messages in load_fixture('userStreamMessages.json').items():
+        streams[f'USER_{key}'] = [json.dumps(message) for message in messages]
+    return streams
+
+
+def bench_decoders(streams, n_messages, backends):
+    results = {}
+    for stream, stream_frames in streams.items():
+        for backend in backends:
+            results[f'{stream}[{backend}]'] = measure(get_decoder(backend), stream_frames, n_messages)
+
+        if stream in SCHEMAS:
+            for backend in backends:
+                results[f'{stream}[{backend} typed]'] = measure(get_typed_decoder(stream, backend), stream_frames,
+                                                                n_messages)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='----JSON DECODER BENCHMARK----')
+    parser.add_argument('--messages', type=int, default=100000, help='timed decodes per stream and backend')
+    parser.add_argument('--backends', nargs='+', default=None, help=f'any of {" ".join(available_backends())}')
+    parser.add_argument('--only', default=None, help='run the streams whose name contains this')
+
+    args = parser.parse_args()
+
+    streams = {stream: stream_frames for stream, stream_frames in frames().items()
+               if args.only is None or args.only in stream}
+    results = bench_decoders(streams, args.messages, args.backends or available_backends())
+
+    for name, result in results.items():
+        print(f'{name:<48}{result["msgs_per_sec"]:>14,.0f} msgs/sec  p50 {result["p50_us"]:>8.2f}us  '
+              f'p99 {result["p99_us"]:>8.2f}us')
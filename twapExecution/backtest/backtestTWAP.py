@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from twapExecution.backtest.simulatedExchange import MarketReplay, NullNotifier, SimClock, SimulatedExchange, \
+    SimulatedMarketData, SimulatedWSManager
+from twapExecution.exchanges.executionMethods.baseTWAP import TWAP
+from twapExecution.exchanges.executionMethods.executionSchedule import IS_RISK_AVERSION, POV_PARTICIPATION, \
+    ImplementationShortfallSchedule, VWAPSchedule
+from twapExecution.exchanges.marketData.volumeProfile import build_volatility, build_volume_profile
+
+"""
+This is a TWAP Backtest, which replays stored Binance trades or candles through TWAP and OrderManager;
+
+Runs fully offline on a simulated clock, far faster than real time, and reports the execution against the arrival
+price and the market VWAP of the execution window together with fill counts, fees and wall clock throughput.
+Data is recorded once with --record (the only step that needs the network).
+"""
+
+
+def run_backtest(replay, market, coin, qty, price_threshold, side, execution_minutes, execution_freq_per_minute,
+                 start=None, precision=3, min_notional=None, fee_rate=0.001, half_spread_bps=1.0, impact_bps=10.0,
+                 latency_ms=20.0, latency_jitter_ms=5.0, seed=0, schedule=None, participation=POV_PARTICIPATION,
+                 quiet=True):
+    """
+
+    Parameters
+    ----------
+    replay MarketReplay;
+    market string; 'SPOT', 'USDT-FUTURES' or 'COIN-FUTURES'
+    coin string; pair as passed to baseTWAP, e.g. 'btc-usdt'
+    qty float;
+    price_threshold float;
+    side string; as passed to baseTWAP, e.g. 'buy', 'long-buy'
+    execution_minutes float;
+    execution_freq_per_minute float;
+    start float; epoch seconds the execution starts at, start of the data by default
+    precision int; quantity decimals
+    min_notional float; None keeps the venue default
+    fee_rate float; taker fee
+    half_spread_bps float;
+    impact_bps float; cost per 100% participation of the last minute of volume
+    latency_ms float;
+    latency_jitter_ms float;
+    seed int; same seed, same result
+    schedule ExecutionSchedule; None runs the uniform TWAP slices, 'POV' follows the replayed volume
+    participation float; POV share of the replayed volume
+    quiet bool; swallow the TWAP prints
+
+    Returns
+    -------
+    report: dict;
+    """
+    np.random.seed(seed)
+    clock = SimClock(replay.start if start is None else start)
+    exchange = SimulatedExchange(market, replay, clock, fee_rate=fee_rate, half_spread_bps=half_spread_bps,
+                                 impact_bps=impact_bps, latency_ms=latency_ms, latency_jitter_ms=latency_jitter_ms,
+                                 seed=seed)
+    notifier = NullNotifier()
+    start_time = clock.time()
+
+    with tempfile.TemporaryDirectory() as db_dir, \
+            contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.suppress():
+        twap = TWAP('binance', market, coin, qty, price_threshold, side, execution_minutes, execution_freq_per_minute,
+                    'false',
+                    ws=SimulatedWSManager(exchange),
+                    client_order_prefix=f'backtest{os.getpid()}',
+                    market_data=SimulatedMarketData(replay, clock, half_spread_bps),
+                    symbol_rule={'symbol': coin.upper(), 'precision': precision, 'lot_size': 10 ** -precision,
+                                 'min_qty': 10 ** -precision, 'tick_size': None, 'min_notional': min_notional},
+                    notifier=notifier,
+                    clock=clock,
+                    db_name=os.path.join(db_dir, 'BACKTEST'),
+                    schedule=schedule,
+                    participation=participation)
+        exchange.callback = twap._handle_message
+
+        wall_start = time.perf_counter()
+        asyncio.run(_replay(twap, replay, clock))
+        wall_time = time.perf_counter() - wall_start
+
+    report = build_report(replay, exchange, twap, side, qty, start_time, clock.time(), wall_time)
+    # No fill, the first one included, may pay more than the half spread and the full impact over its mid;
+    if report['max_fill_cost_bps'] is not None and report['max_fill_cost_bps'] > half_spread_bps + impact_bps + 1e-6:
+        raise Exception(f'Fill cost {report["max_fill_cost_bps"]:.2f}bps over mid, more than the half spread '
+                        f'{half_spread_bps}bps and impact {impact_bps}bps!')
+    return report
+
+
+async def _replay(twap, replay, clock):
+    # Nothing trades past the data, an execution still open there (e.g. POV short of volume) is stopped;
+    async def _stop_at_end():
+        while clock.time() <= replay.end:
+            await asyncio.sleep(0)
+        twap.control.push('stop')
+
+    watcher = asyncio.ensure_future(_stop_at_end())
+    try:
+        await twap.async_run()
+    finally:
+        watcher.cancel()
+
+
+def build_report(replay, exchange, twap, side, qty, start_time, end_time, wall_time):
+    fills = exchange.fills
+    sign = 1 if 'BUY' in side.upper() else -1
+    arrival_price = replay.price_at(start_time)
+    market_vwap = replay.vwap(start_time, end_time)
+
+    executed_qty = sum(fill['qty'] for fill in fills)
+    average_price = sum(fill['qty'] * fill['price'] for fill in fills) / executed_qty if executed_qty else None
+    fees = sum(fill['fee'] for fill in fills)
+    fill_costs = [sign * (fill['price'] - fill['mid']) / fill['mid'] * 1e4 for fill in fills]
+
+    def _slippage_bps(benchmark):
+        if average_price is None:
+            return None
+        return sign * (average_price - benchmark) / benchmark * 1e4
+
+    slices = twap._scheduler.jitter_stats()['slices']
+    sim_duration = end_time - start_time
+
+    return {'fills': len(fills),
+            'slices': slices,
+            'qty': float(qty),
+            'executed_qty': executed_qty,
+            'twap_executed_qty': twap._executed_qty,
+            'average_price': average_price,
+            'arrival_price': arrival_price,
+            'market_vwap': market_vwap,
+            'slippage_vs_arrival_bps': _slippage_bps(arrival_price),
+            'slippage_vs_vwap_bps': _slippage_bps(market_vwap),
+            'fees': fees,
+            'fees_bps': fees / (executed_qty * average_price) * 1e4 if executed_qty else None,
+            'first_fill_cost_bps': fill_costs[0] if fill_costs else None,
+            'max_fill_cost_bps': max(fill_costs) if fill_costs else None,
+            'simulated_seconds': sim_duration,
+            'wall_seconds': wall_time,
+            'speedup': sim_duration / wall_time if wall_time > 0 else None,
+            'slices_per_second': slices / wall_time if wall_time > 0 else None}
+
+
+def record(client, symbol, path, interval='1m', start_date=None, end_date=None, from_id=None, n_pages=10):
+    """
+    Stores candles (.csv) or trades (.json) for later offline runs; needs the network
+
+    Parameters
+    ----------
+    client BinanceClient;
+    symbol string; e.g. 'BTCUSDT'
+    path string; .csv for candles, .json for trades
+    interval string; candles only
+    start_date string; candles only, 'YYYYMMDD'
+    end_date string; candles only, 'YYYYMMDD'
+    from_id int; trades only, first trade id
+    n_pages int; trades only, pages of 500 trades
+    """
+    if path.endswith('.json'):
+        trades = []
+        for _ in range(n_pages):
+            page = client.get_historical_trades(symbol, from_id)
+            if not page or 'code' in page:
+                break
+            trades += page
+            from_id = page[-1]['id'] + 1
+        with open(path, 'w') as f:
+            json.dump(trades, f)
+    else:
+        client.get_candlestick_data(symbol, interval, start_date, end_date).to_csv(path, index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='----TWAP BACKTEST----')
+    parser.add_argument('--data', required=True, help='.csv candles or .json trades file')
+    parser.add_argument('--args', nargs='+', help='market pair qty price_threshold side minutes freq, as baseTWAP')
+    parser.add_argument('--start', type=float, default=None, help='epoch seconds, start of the data by default')
+    parser.add_argument('--precision', type=int, default=3)
+    parser.add_argument('--fee', type=float, default=0.001)
+    parser.add_argument('--spread-bps', type=float, default=1.0)
+    parser.add_argument('--impact-bps', type=float, default=10.0)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--schedule', default='TWAP', help='TWAP, VWAP, IS or POV')
+    parser.add_argument('--history', default=None,
+                        help='.csv candles or .json trades the VWAP profile / IS volatility is built from')
+    parser.add_argument('--risk-aversion', type=float, default=IS_RISK_AVERSION)
+    parser.add_argument('--participation', type=float, default=POV_PARTICIPATION)
+    parser.add_argument('--verbose', action='store_true')
+    parser.add_argument('--record', nargs='+', default=None,
+                        help='symbol [market] [interval start_date end_date | from_id]; download --data and exit')
+
+    args = parser.parse_args()
+
+    if args.record:
+        from twapExecution.exchanges.binance.binanceClient import BinanceClient
+        from twapExecution.exchanges.env import env_vars
+
+        symbol = args.record[0].upper()
+        market = args.record[1].upper() if len(args.record) > 1 else 'SPOT'
+        client = BinanceClient(env_vars['BINANCE_API_KEY'],
+                               env_vars['BINANCE_SECRET_KEY'],
+                               env_vars[f'BINANCE_{market.replace("-", "_")}_URL'])
+
+        if args.data.endswith('.json'):
+            record(client, symbol, args.data, from_id=int(args.record[2]) if len(args.record) > 2 else None)
+        else:
+            record(client, symbol, args.data, *args.record[2:5])
+        print(f'RECORDED {args.data}')
+    else:
+        market, coin, qty, price_threshold, side, minutes, freq = args.args
+        schedule = None
+        if args.schedule.upper() == 'POV':
+            # Needs the replay's clock, TWAP builds it on the simulated market data;
+            schedule = 'POV'
+        elif args.schedule.upper() != 'TWAP':
+            # Built from other days than the replay, the replayed market would be known in advance;
+            history = MarketReplay.from_file(args.history)
+            if args.schedule.upper() == 'VWAP':
+                schedule = VWAPSchedule(build_volume_profile(history.times * 1e3, history.volumes), float(minutes),
+                                        float(freq))
+            else:
+                schedule = ImplementationShortfallSchedule(build_volatility(history.times * 1e3, history.prices),
+                                                           side, float(minutes), float(freq),
+                                                           risk_aversion=args.risk_aversion)
+
+        report = run_backtest(MarketReplay.from_file(args.data), market, coin, float(qty), float(price_threshold),
+                              side, float(minutes), float(freq), start=args.start, precision=args.precision,
+                              fee_rate=args.fee, half_spread_bps=args.spread_bps, impact_bps=args.impact_bps,
+                              latency_ms=args.latency_ms, seed=args.seed, schedule=schedule,
+                              participation=args.participation, quiet=not args.verbose)
+
+        for key, value in report.items():
+            print(f'{key:<26}{value}')
@@ -0,0 +1,334 @@
+import asyncio
+import json
+
+import numpy as np
+import pandas as pd
+
+"""
+This is a Simulated Exchange, which stands in for the Binance REST client, user stream and market data feed so a
+TWAP can be replayed against stored trades or candles without keys or network;
+
+Time comes from a SimClock that jumps straight to the next slice instead of sleeping, market orders fill at the
+replayed price after a sampled latency plus half spread and a linear participation impact, and every fill is sent
+back as a Binance user stream message so it goes through the same PreprocessMsg/handle_fill path as live fills.
+"""
+
+
+class SimClock:
+    def __init__(self, start):
+        """
+
+        Parameters
+        ----------
+        start float; epoch seconds the simulation starts at
+        """
+        self._now = float(start)
+
+    def time(self):
+        return self._now
+
+    def advance(self, seconds):
+        self._now += seconds
+
+    async def sleep(self, delay):
+        self._now += delay
+        await asyncio.sleep(0)
+
+
+class MarketReplay:
+    def __init__(self, times, prices, volumes):
+        """
+
+        Parameters
+        ----------
+        times np.array; epoch seconds, ascending
+        prices np.array; trade price at each time
+        volumes np.array; base volume traded at each time
+        """
+        self.times = np.asarray(times, dtype=np.float64)
+        self.prices = np.asarray(prices, dtype=np.float64)
+        self.volumes = np.asarray(volumes, dtype=np.float64)
+
+        # Prefix sums, so volume and VWAP of any window are O(log n);
+        self._cum_volume = np.concatenate(([0.], np.cumsum(self.volumes)))
+        self._cum_notional = np.concatenate(([0.], np.cumsum(self.volumes * self.prices)))
+
+    @classmethod
+    def from_trades(cls, trades):
+        """
+        Parameters
+        ----------
+        trades list; Binance trades as returned by get_historical_trades/get_recent_trades
+        """
+        trades = sorted(trades, key=lambda trade: trade['time'])
+        return cls([trade['time'] / 1e3 for trade in trades],
+                   [float(trade['price']) for trade in trades],
+                   [float(trade['qty']) for trade in trades])
+
+    @classmethod
+    def from_candles(cls, candles):
+        """
+        Walks every candle open -> low -> high -> close (open -> high -> low -> close when it closed down),
+        a quarter of its volume at each point
+
+        Parameters
+        ----------
+        candles pd.DataFrame; as returned by get_candlestick_data
+        """
+        candles = candles.sort_values('openTime')
+        times, prices, volumes = [], [], []
+
+        for candle in candles.itertuples():
+            span = (candle.closeTime + 1 - candle.openTime) / 1e3
+            start = candle.openTime / 1e3
+            path = (candle.open, candle.low, candle.high, candle.close) if candle.close >= candle.open \
+                else (candle.open, candle.high, candle.low, candle.close)
+
+            for i, price in enumerate(path):
+                times.append(start + span * i / 4)
+                prices.append(price)
+                volumes.append(candle.volume / 4)
+
+        return cls(times, prices, volumes)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Loads a .json trades file or a .csv candles file written by record()
+        """
+        if path.endswith('.json'):
+            with open(path) as f:
+                return cls.from_trades(json.load(f))
+        return cls.from_candles(pd.read_csv(path))
+
+    @property
+    def start(self):
+        return self.times[0]
+
+    @property
+    def end(self):
+        return self.times[-1]
+
+    def _index(self, t):
+        return int(np.searchsorted(self.times, t, side='right'))
+
+    def price_at(self, t):
+        return self.prices[max(self._index(t) - 1, 0)]
+
+    def volume_between(self, t0, t1):
+        return self._cum_volume[self._index(t1)] - self._cum_volume[self._index(t0)]
+
+    def vwap(self, t0, t1):
+        i0, i1 = self._index(t0), self._index(t1)
+        volume = self._cum_volume[i1] - self._cum_volume[i0]
+        if volume <= 0:
+            return self.price_at(t1)
+        return (self._cum_notional[i1] - self._cum_notional[i0]) / volume
+
+
+class SimulatedExchange:
+    def __init__(self, market, replay, clock, fee_rate=0.001, half_spread_bps=1.0, impact_bps=10.0,
+                 latency_ms=20.0, latency_jitter_ms=5.0, impact_window=60, bnb_balance=0, seed=0):
+        """
+
+        Parameters
+        ----------
+        market string; 'SPOT', 'USDT-FUTURES' or 'COIN-FUTURES'
+        replay MarketReplay;
+        clock SimClock;
+        fee_rate float; taker fee
+        half_spread_bps float; paid on every market order
+        impact_bps float; extra cost at 100% participation in the last impact_window seconds of volume, the most an
+            order pays on top of the half spread
+        latency_ms float; mean order latency
+        latency_jitter_ms float; std of the order latency
+        impact_window float; seconds
+        bnb_balance float; spot BNB balance reported to the TWAP fee logic
+        seed int; latency sampling seed, same seed same run
+        """
+        self._market = market.upper()
+        self._replay = replay
+        self._clock = clock
+        self._fee_rate = fee_rate
+        self._half_spread_bps = half_spread_bps
+        self._impact_bps = impact_bps
+        self._latency_ms = latency_ms
+        self._latency_jitter_ms = latency_jitter_ms
+        self._impact_window = impact_window
+        # Volume per second of the whole replay, stands in for the window before impact_window is replayed;
+        self._volume_rate = replay.volume_between(replay.start - 1, replay.end) / max(replay.end - replay.start, 1.)
+        self._bnb_balance = bnb_balance
+        self._rng = np.random.RandomState(seed)
+
+        # User stream callback, set to TWAP._handle_message by the backtest;
+        self.callback = None
+        self.fills = []
+        self._next_order_id = 0
+
+    @property
+    def fee_rate(self):
+        return self._fee_rate
+
+    def get_commission_rate(self, symbol, taker=True):
+        return self._fee_rate
+
+    def get_account_info(self):
+        return {'balances': [{'asset': 'BNB', 'free': str(self._bnb_balance), 'locked': '0'}]}
+
+    def post_change_initial_margin(self, symbol, leverage):
+        return {'symbol': symbol, 'leverage': leverage}
+
+    def post_position_mode(self, dualSidePosition):
+        return {'code': 200, 'msg': 'success'}
+
+    def get_symbol_price_ticker(self, symbol):
+        return {'symbol': symbol, 'price': str(self._replay.price_at(self._clock.time()))}
+
+    def place_market_order(self, symbol, side, quantity, positionSide='BOTH', newClientOrderId=None):
+        latency = max(self._rng.normal(self._latency_ms, self._latency_jitter_ms), 0) / 1e3
+        self._clock.advance(latency)
+
+        now = self._clock.time()
+        mid = self._replay.price_at(now)
+        if now - self._replay.start < self._impact_window:
+            window_volume = self._volume_rate * self._impact_window
+        else:
+            window_volume = self._replay.volume_between(now - self._impact_window, now)
+        # Taking more than the window traded costs the full impact, not more;
+        participation = min(quantity / window_volume, 1.) if window_volume > 0 else 1.
+        cost_bps = self._half_spread_bps + self._impact_bps * participation
+        price = mid * (1 + cost_bps / 1e4) if side.upper() == 'BUY' else mid * (1 - cost_bps / 1e4)
+
+        self._next_order_id += 1
+        order_id = self._next_order_id
+        client_order_id = newClientOrderId or f'sim_{order_id}'
+        fill = {'order_id': order_id, 'time': now, 'side': side.upper(), 'qty': quantity, 'price': price, 'mid': mid,
+                'latency': latency, 'fee': price * quantity * self._fee_rate}
+        self.fills.append(fill)
+
+        if self.callback is not None:
+            self.callback(self._user_stream_message(symbol, side.upper(), quantity, price, order_id, client_order_id,
+                                                    int(now * 1e3)))
+
+        return {'symbol': symbol, 'orderId': order_id, 'clientOrderId': client_order_id, 'status': 'FILLED',
+                'executedQty': str(quantity), 'side': side.upper(), 'type': 'MARKET'}
+
+    def _user_stream_message(self, symbol, side, qty, price, order_id, client_order_id, ms):
+        # Every order fills in one trade, its order id doubles as the trade id;
+        order = {'s': symbol, 'c': client_order_id, 'S': side, 'X': 'FILLED', 'i': order_id, 't': order_id,
+                 'l': str(qty), 'L': str(price)}
+        if 'SPOT' in self._market:
+            return dict(order, e='executionReport', E=ms, T=ms)
+        return {'e': 'ORDER_TRADE_UPDATE', 'E': ms, 'T': ms, 'o': order}
+
+
+class NullMonitor:
+    """
+    Takes the place of StreamMonitor, a simulated stream never drops nor lags
+    """
+
+    dropped = False
+
+    def stale_reason(self):
+        return None
+
+
+class SimulatedWSManager:
+    """
+    Takes the place of BinanceWSManager; fills are pushed by the SimulatedExchange, nothing to connect
+    """
+
+    def __init__(self, exchange):
+        self.rest_client = exchange
+        self.public_client = exchange
+        self.ident = None
+        self.monitor = NullMonitor()
+
+    def close(self):
+        pass
+
+
+class ReplayVolumeCounter:
+    """
+    VolumeCounter interface over a MarketReplay, the replayed trades up to the simulated time
+    """
+
+    def __init__(self, replay, clock):
+        self._replay = replay
+        self._clock = clock
+
+    @property
+    def total(self):
+        return self._replay.volume_between(self._replay.start - 1, self._clock.time())
+
+    def recent(self, seconds):
+        now = self._clock.time()
+        return self._replay.volume_between(now - seconds, now)
+
+
+class ReplayPriceCache:
+    """
+    PriceCache interface over a MarketReplay, always fresh at the simulated time
+    """
+
+    def __init__(self, replay, clock, half_spread_bps=1.0):
+        self._replay = replay
+        self._clock = clock
+        self._half_spread = half_spread_bps / 1e4
+
+    def get(self, symbol):
+        price = self._replay.price_at(self._clock.time())
+        return {'price': price, 'bid': price * (1 - self._half_spread), 'ask': price * (1 + self._half_spread)}
+
+    def get_price(self, symbol, max_age=None):
+        return self._replay.price_at(self._clock.time())
+
+    def get_top_of_book(self, symbol, max_age=None):
+        entry = self.get(symbol)
+        return entry['bid'], entry['ask']
+
+    def age(self, symbol):
+        return 0.
+
+    def volume_counter(self, symbol):
+        return ReplayVolumeCounter(self._replay, self._clock)
+
+
+class SimulatedMarketData:
+    """
+    Takes the place of MarketDataFeed
+    """
+
+    def __init__(self, replay, clock, half_spread_bps=1.0):
+        self.cache = ReplayPriceCache(replay, clock, half_spread_bps)
+        self.ws = None
+
+    def subscribe(self, symbol):
+        pass
+
+    def stale_reason(self):
+        return None
+
+    def volume_counter(self, symbol):
+        return self.cache.volume_counter(symbol)
+
+    def close(self):
+        pass
+
+
+class NullNotifier:
+    """
+    Takes the place of TgNotifier, keeps the messages instead of sending them
+    """
+
+    def __init__(self):
+        self.messages = []
+
+    def send(self, chat_id, message, key=None, parse_mode=None):
+        self.messages.append(message)
+
+    def flush(self, timeout=None):
+        return True
+
+    def forget(self, key):
+        pass
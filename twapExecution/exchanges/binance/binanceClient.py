@@ -2,15 +2,22 @@ import hashlib
 import hmac
 import json
 import time
-import urllib
+import urllib.parse
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 
 import numpy as np
 import pandas as pd
 import requests
-from aiohttp import ClientSession
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+from requests.adapters import HTTPAdapter
 import asyncio
 
+# Orders per batchOrders request, futures only;
+BATCH_ORDERS_LIMIT = 5
+
 
 def generate_binance_signature(secret_key, builder):
     """
@@ -78,7 +85,8 @@ class RestApiRequest:
 
 
 class BinanceClient:
-    def __init__(self, api_key, secret_key, server_url='https://fapi.binance.com'):
+    def __init__(self, api_key, secret_key, server_url='https://fapi.binance.com', pool_size=10, timeout=10,
+                 latency_window=1000):
         """
 
         Parameters
@@ -86,15 +94,118 @@ class BinanceClient:
         api_key string; Binance API key
         secret_key: string; Binance secret key
         server_url: string; Binance API url
+        pool_size: int; keep-alive connections kept per pool (sync and async)
+        timeout: float; request timeout in seconds
+        latency_window: int; number of latencies kept per endpoint
         """
         self._api_key = api_key
         self._secret_key = secret_key
         self._server_url = server_url
         self._api_name = self._server_url.split('.')[0][8:]
+
+        # Hosts without an api/fapi/dapi label (e.g. the mock exchange) carry it as the url path instead;
+        parsed_url = urllib.parse.urlparse(server_url)
+        if parsed_url.path.strip('/'):
+            self._server_url = f'{parsed_url.scheme}://{parsed_url.netloc}'
+            self._api_name = parsed_url.path.strip('/')
         self._api_version = 'v3' if self._api_name == 'api' else 'v1'
 
+        # One keep-alive pool for the sync calls, one aiohttp session per event loop for the async ones;
+        self._pool_size = pool_size
+        self._timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+
+        # event loop -> aiohttp session, a session only works on the loop it was created on;
+        self._async_sessions = weakref.WeakKeyDictionary()
+        # Sends the legs of place_batch_orders concurrently over the sync pool, created on first use;
+        self._batch_executor = None
+
+        self._latency_window = latency_window
+        self._latencies = {}
+
         print(f"CONNECTING TO SERVER: {self._server_url}")
 
+    def _record_latency(self, r, seconds):
+        endpoint = f"{r.method} {r.url.split('?')[0]}"
+        if endpoint not in self._latencies:
+            self._latencies[endpoint] = deque(maxlen=self._latency_window)
+        self._latencies[endpoint].append(seconds * 1e3)
+
+    def _send(self, r):
+        start = time.perf_counter()
+        response = self._session.request(r.method, r.host + r.url, headers=r.header, timeout=self._timeout)
+        self._record_latency(r, time.perf_counter() - start)
+        return response.json()
+
+    async def _get_async_session(self):
+        loop = asyncio.get_event_loop()
+        session = self._async_sessions.get(loop)
+        if session is None or session.closed:
+            session = self._async_sessions[loop] = ClientSession(connector=TCPConnector(limit=self._pool_size),
+                                                                 timeout=ClientTimeout(total=self._timeout),
+                                                                 trust_env=True)
+        return session
+
+    async def _async_send(self, r):
+        session = await self._get_async_session()
+        start = time.perf_counter()
+        async with session.request(r.method, r.host + r.url, headers=r.header) as response:
+            body = await response.json()
+        self._record_latency(r, time.perf_counter() - start)
+        return body
+
+    async def _close_loop_async_session(self):
+        """
+        Closes the session of the running loop, the other loops keep theirs
+        """
+        session = self._async_sessions.pop(asyncio.get_event_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+    async def close_async_session(self):
+        """
+        Closes the sessions of every loop, each on its own loop
+        """
+        current = asyncio.get_event_loop()
+        sessions = list(self._async_sessions.items())
+        self._async_sessions.clear()
+
+        for loop, session in sessions:
+            if session.closed or loop.is_closed():
+                # A closed loop took the connections of its session along;
+                continue
+            if loop is current:
+                await session.close()
+            elif loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+            else:
+                # Idle loop, closed as soon as it runs again;
+                loop.call_soon_threadsafe(loop.create_task, session.close())
+
+    def close(self):
+        if self._batch_executor is not None:
+            self._batch_executor.shutdown(wait=False)
+        self._session.close()
+
+    def get_latency_stats(self):
+        """
+
+        Returns
+        -------
+        stats: dict; endpoint -> count, p50, p99 and last latency in milliseconds
+        """
+        stats = {}
+        for endpoint, latencies in list(self._latencies.items()):
+            values = np.array(latencies)
+            stats[endpoint] = {'count': len(values),
+                               'p50_ms': float(np.percentile(values, 50)),
+                               'p99_ms': float(np.percentile(values, 99)),
+                               'last_ms': float(values[-1])}
+        return stats
+
     def _create_request(self, mode, url, builder):
         request = RestApiRequest()
         request.method = mode.upper()
@@ -129,7 +240,7 @@ class BinanceClient:
         builder = UrlParamsBuilder()
 
         r = self._create_request("GET", f'/{self._api_name}/{self._api_version}/time', builder)
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
 
         return response
 
@@ -144,7 +255,7 @@ class BinanceClient:
         builder = UrlParamsBuilder()
 
         r = self._create_request("GET", f"/{self._api_name}/{self._api_version}/exchangeInfo", builder)
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
 
         return response
 
@@ -153,7 +264,7 @@ class BinanceClient:
 
         if self._api_name == 'api':
             r = self._create_request_with_signature("GET", f"/{self._api_name}/{self._api_version}/account", builder)
-            response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+            response = self._send(r)
             field = 'takerCommission' if taker else 'makerCommission'
             return float(response[field] / 10000)
 
@@ -161,7 +272,7 @@ class BinanceClient:
             builder.put_url("symbol", symbol)
             r = self._create_request_with_signature("GET", f"/{self._api_name}/{self._api_version}/commissionRate",
                                                     builder)
-            response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+            response = self._send(r)
             field = 'takerCommissionRate' if taker else 'makerCommissionRate'
             return float(response[field])
 
@@ -180,7 +291,7 @@ class BinanceClient:
         builder = UrlParamsBuilder()
 
         r = self._create_request("GET", f"/{self._api_name}/{self._api_version}/ticker/24hr", builder)
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
 
         symbols = []
 
@@ -209,7 +320,7 @@ class BinanceClient:
 
         builder = UrlParamsBuilder()
         r = self._create_request("POST", f'/{self._api_name}/{self._api_version}/{channel}', builder)
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
         return response
 
     def put_user_listen_key(self):
@@ -227,7 +338,7 @@ class BinanceClient:
         builder = UrlParamsBuilder()
 
         r = self._create_request("PUT", f'/{self._api_name}/{self._api_version}/{channel}', builder)
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
         return response
 
     def get_symbol_price_ticker(self, symbol):
@@ -245,7 +356,7 @@ class BinanceClient:
         builder.put_url("symbol", symbol)
         r = self._create_request("GET", f"/{self._api_name}/{self._api_version}/ticker/price", builder)
 
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
         return response
 
     def get_24hr_ticker_price_change(self, symbol):
@@ -253,7 +364,7 @@ class BinanceClient:
         builder.put_url("symbol", symbol)
         r = self._create_request("GET", f"/{self._api_name}/{self._api_version}/ticker/24hr", builder)
 
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
         return response
 
     async def async_get_latest_n_candles_without_newest(self, symbol, interval, n_candles):
@@ -265,26 +376,24 @@ class BinanceClient:
 
         r = self._create_request("GET", f"/{self._api_name}/{self._api_version}/klines", builder)
 
-        async with ClientSession(trust_env=True) as session:
-            async with session.request(r.method, r.host + r.url, headers=r.header) as response:
-                body = await response.json()
+        body = await self._async_send(r)
 
-                if len(body) <= 3:
-                    return []
-                else:
-                    cur_time = datetime.now().strftime('%Y-%m-%d %H:%M')
-                    latest_candle_open_time = datetime.fromtimestamp(body[-1][0] / 1e3).strftime('%Y-%m-%d %H:%M')
+        if len(body) <= 3:
+            return []
+        else:
+            cur_time = datetime.now().strftime('%Y-%m-%d %H:%M')
+            latest_candle_open_time = datetime.fromtimestamp(body[-1][0] / 1e3).strftime('%Y-%m-%d %H:%M')
 
-                    if latest_candle_open_time == cur_time:
-                        body.pop()
+            if latest_candle_open_time == cur_time:
+                body.pop()
 
-                    latest_candle_open_time = datetime.fromtimestamp(body[-1][0] / 1e3).strftime('%Y-%m-%d %H:%M')
-                    desired_time = (datetime.now() - timedelta(minutes=1)).strftime('%Y-%m-%d %H:%M')
+            latest_candle_open_time = datetime.fromtimestamp(body[-1][0] / 1e3).strftime('%Y-%m-%d %H:%M')
+            desired_time = (datetime.now() - timedelta(minutes=1)).strftime('%Y-%m-%d %H:%M')
 
-                    if latest_candle_open_time == desired_time:
-                        return body
-                    else:
-                        return []
+            if latest_candle_open_time == desired_time:
+                return body
+            else:
+                return []
 
     def run_async_get_latest_n_candles_without_newest(self, symbols, interval, n_candles):
 
@@ -292,7 +401,10 @@ class BinanceClient:
             jobs = []
             for symbol in symbols:
                 jobs.append(self.async_get_latest_n_candles_without_newest(*[symbol, interval, n_candles]))
-            return await asyncio.gather(*jobs)
+            try:
+                return await asyncio.gather(*jobs)
+            finally:
+                await self._close_loop_async_session()
 
         return asyncio.run(return_jobs())
 
@@ -325,7 +437,7 @@ class BinanceClient:
             builder.put_url("limit", 1000)
 
             r = self._create_request("GET", f"/{self._api_name}/{self._api_version}/klines", builder)
-            response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+            response = self._send(r)
 
             if 'code' not in response:
                 nth_consecutive_error = 1
@@ -391,7 +503,7 @@ class BinanceClient:
         builder.put_url('limit', limit)
 
         r = self._create_request("GET", f"/{self._api_name}/{self._api_version}/depth", builder)
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
         return response
 
     def get_recent_trades(self, symbol, limit=1000):
@@ -411,7 +523,7 @@ class BinanceClient:
         builder.put_url("limit", limit)
 
         r = self._create_request("GET", f"/{self._api_name}/{self._api_version}/trades", builder)
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
 
         return response
 
@@ -432,7 +544,7 @@ class BinanceClient:
         builder.put_url("fromId", fromId)
 
         r = self._create_request("GET", f"/{self._api_name}/{self._api_version}/historicalTrades", builder)
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
 
         return response
 
@@ -450,7 +562,7 @@ class BinanceClient:
 
             r = self._create_request_with_signature("GET", f"/{self._api_name}/{self._api_version}/positionSide/dual",
                                                     builder)
-            response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+            response = self._send(r)
 
             return response
 
@@ -478,7 +590,7 @@ class BinanceClient:
                 version = 'v2'
             r = self._create_request_with_signature("GET", f"/{self._api_name}/{version}/positionRisk",
                                                     builder)
-            response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+            response = self._send(r)
 
             return response
 
@@ -505,7 +617,7 @@ class BinanceClient:
                 version = 'v2'
             r = self._create_request_with_signature("GET", f"/{self._api_name}/{version}/positionRisk",
                                                     builder)
-            response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+            response = self._send(r)
 
             return response
 
@@ -528,7 +640,7 @@ class BinanceClient:
 
             r = self._create_request_with_signature("GET", f"/{self._api_name}/v2/positionRisk",
                                                     builder)
-            response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+            response = self._send(r)
 
             in_position = False
 
@@ -557,7 +669,7 @@ class BinanceClient:
 
             r = self._create_request_with_signature("POST", f"/{self._api_name}/{self._api_version}/positionSide/dual",
                                                     builder)
-            response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+            response = self._send(r)
 
             return response
 
@@ -571,7 +683,7 @@ class BinanceClient:
         builder = UrlParamsBuilder()
 
         r = self._create_request_with_signature("GET", f"/{self._api_name}/{self._api_version}/account", builder)
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
 
         return response
 
@@ -595,11 +707,12 @@ class BinanceClient:
             builder.put_url("leverage", leverage)
 
             r = self._create_request_with_signature("POST", f"/{self._api_name}/{self._api_version}/leverage", builder)
-            response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+            response = self._send(r)
 
             return response
 
-    def post_new_market_order(self, symbol, side, quantity, positionSide='BOTH', reduceOnly=False):
+    def post_new_market_order(self, symbol, side, quantity, positionSide='BOTH', reduceOnly=False,
+                              newClientOrderId=None):
         """
 
         Parameters
@@ -608,6 +721,7 @@ class BinanceClient:
         side string; 'buy' or 'sell'
         quantity float; qty
         positionSide string; "BOTH" for ONE-WAY mode, "LONG" or "SHORT" for HEDGED mode
+        newClientOrderId string; optional client order id, echoed back as 'c' on the user stream
 
         Returns
         -------
@@ -618,6 +732,7 @@ class BinanceClient:
         builder.put_url("side", side)
         builder.put_url("type", 'MARKET')
         builder.put_url("quantity", quantity)
+        builder.put_url("newClientOrderId", newClientOrderId)
 
         if positionSide == 'BOTH':
             builder.put_url("reduceOnly", reduceOnly)
@@ -627,11 +742,79 @@ class BinanceClient:
 
         r = self._create_request_with_signature("POST", f"/{self._api_name}/{self._api_version}/order", builder)
 
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
         return response
 
-    def place_market_order(self, symbol, side, quantity, positionSide='BOTH'):
-        return self.post_new_market_order(symbol, side, quantity, positionSide)
+    def place_market_order(self, symbol, side, quantity, positionSide='BOTH', newClientOrderId=None):
+        return self.post_new_market_order(symbol, side, quantity, positionSide, newClientOrderId=newClientOrderId)
+
+    def place_batch_orders(self, orders):
+        """
+        Places the legs of a multi symbol slice at once, results in the order of the legs
+
+        Futures send BATCH_ORDERS_LIMIT legs per batchOrders request; spot has no batch endpoint for new orders, so
+        every leg is its own request. The requests run concurrently over the keep-alive pool of the sync calls, a
+        batch costs about one round trip.
+
+        Parameters
+        ----------
+        orders list; kwargs of place_market_order per leg, a leg with price (and timeInForce) is a limit order
+
+        Returns
+        -------
+        responses: list; per leg the order, or the Binance error {'code', 'msg'} of that leg
+        """
+        if len(orders) == 0:
+            return []
+        if self._batch_executor is None:
+            self._batch_executor = ThreadPoolExecutor(max_workers=self._pool_size)
+
+        if self._api_name == 'fapi' or self._api_name == 'dapi':
+            chunks = [orders[i:i + BATCH_ORDERS_LIMIT] for i in range(0, len(orders), BATCH_ORDERS_LIMIT)]
+            return [response for responses in self._batch_executor.map(self._post_batch_orders, chunks)
+                    for response in responses]
+        return list(self._batch_executor.map(self._post_leg, orders))
+
+    def _post_leg(self, order):
+        order = dict(order)
+        try:
+            if order.get('price') is not None:
+                return self.post_new_limit_order(**order)
+            order.pop('price', None)
+            order.pop('timeInForce', None)
+            return self.post_new_market_order(**order)
+        except Exception as e:
+            return {'code': -1000, 'msg': f'{type(e).__name__}: {e}'}
+
+    def _post_batch_orders(self, orders):
+        legs = []
+        for order in orders:
+            leg = {'symbol': order['symbol'],
+                   'side': order['side'].upper(),
+                   'quantity': str(order['quantity']),
+                   'positionSide': order.get('positionSide') or 'BOTH'}
+            if order.get('price') is not None:
+                leg.update(type='LIMIT', price=str(order['price']), timeInForce=order.get('timeInForce', 'GTC'))
+            else:
+                leg['type'] = 'MARKET'
+            if order.get('reduceOnly') and leg['positionSide'] == 'BOTH':
+                leg['reduceOnly'] = 'true'
+            if order.get('newClientOrderId') is not None:
+                leg['newClientOrderId'] = order['newClientOrderId']
+            legs.append(leg)
+
+        builder = UrlParamsBuilder()
+        builder.put_url("batchOrders", legs)
+        r = self._create_request_with_signature("POST", f"/{self._api_name}/{self._api_version}/batchOrders", builder)
+
+        try:
+            response = self._send(r)
+        except Exception as e:
+            response = {'code': -1000, 'msg': f'{type(e).__name__}: {e}'}
+        # A rejected request fails every leg of it;
+        if not isinstance(response, list):
+            return [response] * len(orders)
+        return response
 
     async def async_post_new_market_order(self, symbol, side, quantity, positionSide='BOTH', reduceOnly=False):
         """
@@ -662,10 +845,7 @@ class BinanceClient:
 
         r = self._create_request_with_signature("POST", f"/{self._api_name}/{self._api_version}/order", builder)
 
-        async with ClientSession(trust_env=True) as session:
-            async with session.request(r.method, r.host + r.url, headers=r.header) as response:
-                body = await response.json()
-                return body
+        return await self._async_send(r)
 
     def async_execute_post_new_market_orders(self, orders):
 
@@ -673,20 +853,27 @@ class BinanceClient:
             jobs = []
             for order in orders:
                 jobs.append(self.async_post_new_market_order(*order))
-            return await asyncio.gather(*jobs)
+            try:
+                return await asyncio.gather(*jobs)
+            finally:
+                await self._close_loop_async_session()
 
         return asyncio.run(return_jobs())
 
     def post_new_limit_order(self, symbol, side, price, quantity, positionSide='BOTH', timeInForce='GTC',
-                             reduceOnly=False):
+                             reduceOnly=False, newClientOrderId=None, orderType='LIMIT'):
         """
 
         Parameters
         ----------
         symbol string; ticker symbol
         side string; 'buy' or 'sell'
+        price float; price to buy or sell
         quantity float; qty
         positionSide string; "BOTH" for ONE-WAY mode, "LONG" or "SHORT" for HEDGED mode
+        timeInForce string; 'GTC', 'IOC', 'FOK', 'GTX' (post only, futures), None for LIMIT_MAKER
+        newClientOrderId string; echoed back on the user stream
+        orderType string; 'LIMIT' or 'LIMIT_MAKER' (post only, spot), rejected with -2010 when it would take
 
         Returns
         -------
@@ -695,10 +882,11 @@ class BinanceClient:
         builder = UrlParamsBuilder()
         builder.put_url("symbol", symbol)
         builder.put_url("side", side)
-        builder.put_url("type", 'LIMIT')
+        builder.put_url("type", orderType)
         builder.put_url("timeInForce", timeInForce)
         builder.put_url("quantity", quantity)
         builder.put_url("price", price)
+        builder.put_url("newClientOrderId", newClientOrderId)
 
         if positionSide == 'BOTH':
             builder.put_url("reduceOnly", reduceOnly)
@@ -708,7 +896,7 @@ class BinanceClient:
 
         r = self._create_request_with_signature("POST", f"/{self._api_name}/{self._api_version}/order", builder)
 
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
         return response
 
     async def async_post_new_limit_order(self, symbol, side, price, quantity, positionSide='BOTH', timeInForce='GTC',
@@ -744,10 +932,7 @@ class BinanceClient:
 
         r = self._create_request_with_signature("POST", f"/{self._api_name}/{self._api_version}/order", builder)
 
-        async with ClientSession(trust_env=True) as session:
-            async with session.request(r.method, r.host + r.url, headers=r.header) as response:
-                body = await response.json()
-                return body
+        return await self._async_send(r)
 
     def async_execute_post_new_limit_orders(self, orders):
 
@@ -755,7 +940,10 @@ class BinanceClient:
             jobs = []
             for order in orders:
                 jobs.append(self.async_post_new_limit_order(*order))
-            return await asyncio.gather(*jobs)
+            try:
+                return await asyncio.gather(*jobs)
+            finally:
+                await self._close_loop_async_session()
 
         return asyncio.run(return_jobs())
 
@@ -790,10 +978,7 @@ class BinanceClient:
 
         r = self._create_request_with_signature("POST", f"/{self._api_name}/{self._api_version}/order", builder)
 
-        async with ClientSession(trust_env=True) as session:
-            async with session.request(r.method, r.host + r.url, headers=r.header) as response:
-                body = await response.json()
-                return body
+        return await self._async_send(r)
 
     async def post_new_stop_market_order(self, symbol, side, quantity, stopPrice, positionSide='BOTH',
                                          closePosition='false'):
@@ -825,10 +1010,7 @@ class BinanceClient:
 
         r = self._create_request_with_signature("POST", f"/{self._api_name}/{self._api_version}/order", builder)
 
-        async with ClientSession(trust_env=True) as session:
-            async with session.request(r.method, r.host + r.url, headers=r.header) as response:
-                body = await response.json()
-                return body
+        return await self._async_send(r)
 
     def get_all_open_orders(self, symbol):
         """
@@ -845,7 +1027,7 @@ class BinanceClient:
         builder.put_url("symbol", symbol)
 
         r = self._create_request_with_signature("GET", f"/{self._api_name}/{self._api_version}/openOrders", builder)
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
 
         return response
 
@@ -866,7 +1048,7 @@ class BinanceClient:
         builder.put_url("orderId", orderId)
 
         r = self._create_request_with_signature("GET", f"/{self._api_name}/{self._api_version}/order", builder)
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
 
         return response
 
@@ -877,10 +1059,7 @@ class BinanceClient:
 
         r = self._create_request_with_signature("GET", f"/{self._api_name}/{self._api_version}/order", builder)
 
-        async with ClientSession(trust_env=True) as session:
-            async with session.request(r.method, r.host + r.url, headers=r.header) as response:
-                body = await response.json()
-                return body
+        return await self._async_send(r)
 
     def async_run_get_order_status(self, symbols, orderIds):
 
@@ -888,7 +1067,10 @@ class BinanceClient:
             jobs = []
             for i in range(len(symbols)):
                 jobs.append(self.async_get_order_status(symbols[i], orderIds[i]))
-            return await asyncio.gather(*jobs)
+            try:
+                return await asyncio.gather(*jobs)
+            finally:
+                await self._close_loop_async_session()
 
         return asyncio.run(return_jobs())
 
@@ -909,7 +1091,7 @@ class BinanceClient:
         builder.put_url("orderId", orderId)
 
         r = self._create_request_with_signature("DELETE", f"/{self._api_name}/{self._api_version}/order", builder)
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
 
         return response
 
@@ -931,10 +1113,7 @@ class BinanceClient:
         r = self._create_request_with_signature("DELETE", f"/{self._api_name}/{self._api_version}/allOpenOrders",
                                                 builder)
 
-        async with ClientSession(trust_env=True) as session:
-            async with session.request(r.method, r.host + r.url, headers=r.header) as response:
-                body = await response.json()
-                return body
+        return await self._async_send(r)
 
     def del_all_open_orders_countdown(self, symbol, countdownTime):
         """
@@ -955,16 +1134,42 @@ class BinanceClient:
         r = self._create_request_with_signature("DELETE", f"/{self._api_name}/{self._api_version}/countdownCancelAll",
                                                 builder)
 
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
+
+        return response
+
+    def get_account_trade_history(self, symbol, startTime=None):
+        """
+
+        Parameters
+        ----------
+        symbol string; ticker symbol
+        startTime int; in milliseconds, trades at or after it, latest trades if None
+
+        Returns
+        -------
+        response: dict;
+        """
+        builder = UrlParamsBuilder()
+        builder.put_url("symbol", symbol)
+        builder.put_url("startTime", startTime)
+
+        # Spot calls it myTrades;
+        endpoint = 'myTrades' if self._api_name == 'api' else 'userTrades'
+        r = self._create_request_with_signature("GET", f"/{self._api_name}/{self._api_version}/{endpoint}",
+                                                builder)
+
+        response = self._send(r)
 
         return response
 
-    def get_account_trade_history(self, symbol):
+    def get_all_orders(self, symbol, startTime=None):
         """
 
         Parameters
         ----------
         symbol string; ticker symbol
+        startTime int; in milliseconds, orders created at or after it, latest orders if None
 
         Returns
         -------
@@ -972,11 +1177,12 @@ class BinanceClient:
         """
         builder = UrlParamsBuilder()
         builder.put_url("symbol", symbol)
+        builder.put_url("startTime", startTime)
 
-        r = self._create_request_with_signature("GET", f"/{self._api_name}/{self._api_version}/userTrades",
+        r = self._create_request_with_signature("GET", f"/{self._api_name}/{self._api_version}/allOrders",
                                                 builder)
 
-        response = requests.request(r.method, r.host + r.url, headers=r.header).json()
+        response = self._send(r)
 
         return response
 
@@ -7,6 +7,9 @@ import websockets
 
 from twapExecution.exchanges.binance.binanceClient import BinanceClient
 from twapExecution.exchanges.env import env_vars
+from twapExecution.exchanges.utils.jsonDecoder import loads
+from twapExecution.exchanges.utils.wsMonitor import StreamMonitor
+from twapExecution.exchanges.utils.wsReconnect import Backoff, connect
 
 """
 This is a Binance WS Manager, which connects to Binance WS as a client, and starts different streamings;
@@ -38,6 +41,14 @@ class BinanceWSManager(threading.Thread):
 
         self._conn = []
         self.cur_id = 0
+        self._user_stream = False
+        self._user_stream_sub = None
+        self._ws_loop = None
+
+        self._backoff = Backoff()
+        self.monitor = StreamMonitor(f'BINANCE {self.market.upper()}')
+        # Called off the event loop after a reconnect, e.g. UserStreamMultiplexer.recover;
+        self.on_reconnect = None
 
     def _add_aggTrade_stream(self, symbol):
         self._add_conn({'method': 'SUBSCRIBE',
@@ -59,11 +70,18 @@ class BinanceWSManager(threading.Thread):
                         'params': params,
                         'id': self.cur_id})
 
-    def _add_user_stream(self):
-        self._add_conn({'method': "SUBSCRIBE",
-                        'params': [self.rest_client.post_user_listen_key()['listenKey']],
+    def _add_ticker_stream(self, symbol):
+        self._add_conn({'method': 'SUBSCRIBE',
+                        'params': [f'{symbol}@bookTicker', f'{symbol}@aggTrade'],
                         'id': self.cur_id})
 
+    def _add_user_stream(self):
+        self._user_stream = True
+        self._user_stream_sub = {'method': "SUBSCRIBE",
+                                 'params': [self.rest_client.post_user_listen_key()['listenKey']],
+                                 'id': self.cur_id}
+        self._add_conn(self._user_stream_sub)
+
     def _add_candle_stream(self, symbols, interval):
         params = []
 
@@ -84,10 +102,20 @@ class BinanceWSManager(threading.Thread):
                         'params': params,
                         'id': self.cur_id})
 
+    def _add_diff_depth_stream(self, symbol):
+        self._add_conn({'method': "SUBSCRIBE",
+                        'params': [f'{symbol}@depth@100ms'],
+                        'id': self.cur_id})
+
     def _add_conn(self, sub):
         self._conn.append(sub)
         self.cur_id += 1
 
+    # Send the latest subscription on the running connection, it is sent on connect otherwise;
+    def _send_new_conn(self):
+        if self._ws_loop is not None:
+            asyncio.run_coroutine_threadsafe(self.ws.send(json.dumps(self._conn[-1])), self._ws_loop)
+
     # Start aggTrade Stream
     def start_aggTrade_stream(self, symbols, callback):
         for symbol in symbols:
@@ -113,6 +141,18 @@ class BinanceWSManager(threading.Thread):
         self._callback = callback
         self.start()
 
+    # Start top of book + last trade Stream, used by the price cache
+    def start_ticker_stream(self, symbols, callback):
+        for symbol in symbols:
+            self._add_ticker_stream(symbol)
+        self._callback = callback
+        self.start()
+
+    # Add a symbol to a running ticker Stream without reconnecting
+    def add_ticker_stream(self, symbol):
+        self._add_ticker_stream(symbol)
+        self._send_new_conn()
+
     def start_candle_stream(self, symbols, interval, callback):
         self._add_candle_stream(symbols, interval)
         self._callback = callback
@@ -123,27 +163,53 @@ class BinanceWSManager(threading.Thread):
         self._callback = callback
         self.start()
 
+    # Start diff depth Stream, used by the local order book
+    def start_diff_depth_stream(self, symbols, callback):
+        for symbol in symbols:
+            self._add_diff_depth_stream(symbol)
+        self._callback = callback
+        self.start()
+
+    # Add a symbol to a running diff depth Stream without reconnecting
+    def add_diff_depth_stream(self, symbol):
+        self._add_diff_depth_stream(symbol)
+        self._send_new_conn()
+
+    # Connect and send every subscription, also on reconnect
+    async def _connect(self):
+        # The listenKey expires 60 minutes after its last keepalive, ask for the current one after a drop;
+        if self._user_stream and self._ws_loop is not None:
+            listen_key = await asyncio.get_event_loop().run_in_executor(None, self.rest_client.post_user_listen_key)
+            self._user_stream_sub['params'] = [listen_key['listenKey']]
+
+        self.ws = await websockets.connect(self._ws_url)
+        for conn in self._conn:
+            await self.ws.send(json.dumps(conn))
+
+    # Exchange event time of a message in ms, spot bookTicker has none
+    @staticmethod
+    def _event_time(message):
+        return message.get('E') or message.get('T')
+
     # Uses callback function to handle messages
     async def receive_message(self):
         self.keep_running = True
-        self.ws = await websockets.connect(self._ws_url)
+        if not await connect(self):
+            return
+        self._ws_loop = asyncio.get_event_loop()
 
-        for conn in self._conn:
-            await self.ws.send(json.dumps(conn))
         while self.keep_running:
             try:
                 message = await self.ws.recv()
-                message = json.loads(message)
+                message = loads(message)
+                self.monitor.on_message(self._event_time(message))
                 # print(message)
                 if 'id' not in message:
                     self._callback(message)
 
             except Exception as e:
-                if not self.ws.open:
-                    print(f'ERROR: Reconnected {e}')
-                    self.ws = await websockets.connect(self._ws_url)
-                    for conn in self._conn:
-                        await self.ws.send(json.dumps(conn))
+                if self.keep_running and not self.ws.open:
+                    await connect(self, e)
         else:
             await self.ws.close()
 
@@ -157,7 +223,9 @@ class BinanceWSManager(threading.Thread):
     # Run the thread!
     def run(self):
         async def _create_jobs():
-            jobs = [self.receive_message(), self.put_listen_key_n_minutes()]
+            jobs = [self.receive_message()]
+            if self._user_stream:
+                jobs.append(self.put_listen_key_n_minutes())
             return await asyncio.gather(*jobs)
 
         asyncio.run(_create_jobs())
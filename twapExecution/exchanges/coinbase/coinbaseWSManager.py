@@ -11,6 +11,10 @@ import websockets
 from twapExecution.exchanges.coinbase.coinbasePublicClient import PublicClient
 from twapExecution.exchanges.coinbase.coinbaseAuthClient import AuthenticatedClient
 from twapExecution.exchanges.env import env_vars
+from twapExecution.exchanges.executionMethods.fillEvent import iso_to_ms
+from twapExecution.exchanges.utils.jsonDecoder import loads
+from twapExecution.exchanges.utils.wsMonitor import StreamMonitor
+from twapExecution.exchanges.utils.wsReconnect import Backoff, connect
 
 
 class CoinbaseWSManager(threading.Thread):
@@ -24,17 +28,15 @@ class CoinbaseWSManager(threading.Thread):
                                                env_vars['COINBASE_SECRET_KEY'],
                                                env_vars['COINBASE_PW'],
                                                self._base_url)
-        self.public_client = PublicClient()
+        self.public_client = PublicClient(env_vars.get('COINBASE_PUBLIC_URL', 'https://api.pro.coinbase.com'))
         self._conn = []
         self.cur_id = 0
+        self._ws_loop = None
 
-        timestamp = str(time.time())
-        msg = timestamp + 'GET' + '/users/self/verify'
-        self._auth_headers = self._get_auth_headers(timestamp,
-                                                    msg,
-                                                    env_vars['COINBASE_API_KEY'],
-                                                    env_vars['COINBASE_SECRET_KEY'],
-                                                    env_vars['COINBASE_PW'])
+        self._backoff = Backoff()
+        self.monitor = StreamMonitor('COINBASE SPOT')
+        # Called off the event loop after a reconnect, e.g. UserStreamMultiplexer.recover;
+        self.on_reconnect = None
 
     def _get_auth_headers(self, timestamp, message, api_key, secret_key, passphrase):
         message = message.encode('ascii')
@@ -56,43 +58,90 @@ class CoinbaseWSManager(threading.Thread):
         sub['product_ids'] = symbol
         sub['channels'] = ['user']
 
-        sub['signature'] = self._auth_headers['CB-ACCESS-SIGN']
-        sub['key'] = self._auth_headers['CB-ACCESS-KEY']
-        sub['passphrase'] = self._auth_headers['CB-ACCESS-PASSPHRASE']
-        sub['timestamp'] = self._auth_headers['CB-ACCESS-TIMESTAMP']
-
+        self._sign(sub)
         self._add_conn(sub)
 
+    # Signed when sent, the signature of a symbol added later or of a reconnect would be expired otherwise;
+    def _sign(self, sub):
+        timestamp = str(time.time())
+        msg = timestamp + 'GET' + '/users/self/verify'
+        auth_headers = self._get_auth_headers(timestamp,
+                                              msg,
+                                              env_vars['COINBASE_API_KEY'],
+                                              env_vars['COINBASE_SECRET_KEY'],
+                                              env_vars['COINBASE_PW'])
+
+        sub['signature'] = auth_headers['CB-ACCESS-SIGN']
+        sub['key'] = auth_headers['CB-ACCESS-KEY']
+        sub['passphrase'] = auth_headers['CB-ACCESS-PASSPHRASE']
+        sub['timestamp'] = auth_headers['CB-ACCESS-TIMESTAMP']
+
+    def _add_ticker_stream(self, symbols):
+        self._add_conn({'type': 'subscribe',
+                        'product_ids': symbols,
+                        'channels': ['ticker', 'matches']})
+
     def _add_conn(self, sub):
         self._conn.append(sub)
         self.cur_id += 1
 
+    # Send the latest subscription on the running connection, it is sent on connect otherwise;
+    def _send_new_conn(self):
+        if self._ws_loop is not None:
+            asyncio.run_coroutine_threadsafe(self.ws.send(json.dumps(self._conn[-1])), self._ws_loop)
+
     def start_user_stream(self, symbol, callback):
         self._add_user_stream(symbol)
         self._callback = callback
         self.start()
 
-    async def receive_message(self):
-        self.keep_running = True
+    # Add a symbol to a running user Stream without reconnecting
+    def add_user_stream(self, symbol):
+        self._add_user_stream([symbol])
+        self._send_new_conn()
+
+    # Start ticker and trade Stream, used by the price cache
+    def start_ticker_stream(self, symbols, callback):
+        self._add_ticker_stream(symbols)
+        self._callback = callback
+        self.start()
+
+    # Add a symbol to a running ticker Stream without reconnecting
+    def add_ticker_stream(self, symbol):
+        self._add_ticker_stream([symbol])
+        self._send_new_conn()
+
+    # Connect and send every subscription, the user ones signed again, also on reconnect
+    async def _connect(self):
         self.ws = await websockets.connect(self._ws_url)
 
         for conn in self._conn:
+            if 'signature' in conn:
+                self._sign(conn)
             await self.ws.send(json.dumps(conn))
 
+    # Exchange event time of a message in ms, None on subscription replies
+    @staticmethod
+    def _event_time(message):
+        return iso_to_ms(message['time']) if 'time' in message else None
+
+    async def receive_message(self):
+        self.keep_running = True
+        if not await connect(self):
+            return
+        self._ws_loop = asyncio.get_event_loop()
+
         while self.keep_running:
             try:
                 message = await self.ws.recv()
-                message = json.loads(message)
+                message = loads(message)
+                self.monitor.on_message(self._event_time(message))
                 if 'id' not in message:
                     self._callback(message)
 
             except Exception as e:
-
-                if not self.ws.open:
-                    print(f'ERROR: Reconnected {e}')
-                    self.ws = await websockets.connect(self._ws_url)
-                    for conn in self._conn:
-                        await self.ws.send(json.dumps(conn))
+                if self.keep_running and not self.ws.open:
+                    await connect(self, e)
         else:
             await self.ws.close()
 
@@ -1,8 +1,51 @@
 import pathlib
 import sqlite3
+import threading
 from sqlite3 import Error
+from time import monotonic
 import os
 
+SQL_CREATE_EXECUTIONS_TABLE = """ CREATE TABLE IF NOT EXISTS execution (
+                                    id integer PRIMARY KEY,
+                                    exchange varchar,
+                                    market varchar,
+                                    order_id integer,
+                                    time date NOT NULL,
+                                    symbol varchar,
+                                    price float,
+                                    side varchar,
+                                    qty float,
+                                    executed_qty float,
+                                    average_price float,
+                                    remaining_qty float,
+                                    complete_flag boolean
+                                ); """
+
+SQL_CREATE_EXECUTION_STATE_TABLE = """ CREATE TABLE IF NOT EXISTS execution_state (
+                                        exchange varchar NOT NULL,
+                                        market varchar NOT NULL,
+                                        symbol varchar NOT NULL,
+                                        execution_id integer,
+                                        order_id integer,
+                                        time date,
+                                        side varchar,
+                                        executed_qty float,
+                                        average_price float,
+                                        remaining_qty float,
+                                        complete_flag boolean,
+                                        PRIMARY KEY (exchange, market, symbol)
+                                    ); """
+
+SQL_UPSERT_EXECUTION_STATE = ''' INSERT OR REPLACE INTO execution_state (exchange, market, symbol, execution_id, order_id, 
+                time, side, executed_qty, average_price, remaining_qty, complete_flag) VALUES(?,?,?,?,?,?,?,?,?,?,?) '''
+
+SQL_SELECT_EXECUTION_STATE = ''' SELECT * FROM execution_state WHERE exchange=? AND market=? AND symbol=? '''
+
+SQL_SELECT_LAST_EXECUTION = ''' SELECT * FROM execution ORDER BY id DESC LIMIT 1 '''
+
+SQL_INSERT_EXECUTION = ''' INSERT INTO execution (exchange, market, order_id, time, symbol, price, side, qty, executed_qty, 
+                average_price, remaining_qty, complete_flag) VALUES(?,?,?,?,?,?,?,?,?,?,?,?) '''
+
 
 def create_connection(db_file):
     """
@@ -40,10 +83,8 @@ def create_execution(conn, project):
     :param project:
     :return: project id
     """
-    sql = ''' INSERT INTO execution (exchange, market, order_id, time, symbol, price, side, qty, executed_qty, 
-                average_price, remaining_qty, complete_flag) VALUES(?,?,?,?,?,?,?,?,?,?,?,?) '''
     cur = conn.cursor()
-    cur.execute(sql, project)
+    cur.execute(SQL_INSERT_EXECUTION, project)
     conn.commit()
     return cur.lastrowid
 
@@ -72,28 +113,13 @@ def execute(db_name, exchange, market, order_id, symbol, time, price, side, qty,
     # connects to the sqlite file
     database = os.path.join(pathlib.Path().absolute(), f'{db_name}.db')
 
-    sql_create_executions_table = """ CREATE TABLE IF NOT EXISTS execution (
-                                        id integer PRIMARY KEY,
-                                        exchange varchar,
-                                        market varchar,
-                                        order_id integer,
-                                        time date NOT NULL,
-                                        symbol varchar,
-                                        price float,
-                                        side varchar,
-                                        qty float,
-                                        executed_qty float,
-                                        average_price float,
-                                        remaining_qty float,
-                                        complete_flag boolean
-                                    ); """
-
     # create a database connection
     conn = create_connection(database)
 
     if conn is not None:
-        # create execution table
-        create_table(conn, sql_create_executions_table)
+        # create execution and execution state tables
+        create_table(conn, SQL_CREATE_EXECUTIONS_TABLE)
+        create_table(conn, SQL_CREATE_EXECUTION_STATE_TABLE)
 
     else:
         print("Error! cannot create the database connection.")
@@ -103,4 +129,142 @@ def execute(db_name, exchange, market, order_id, symbol, time, price, side, qty,
         project = (
             exchange, market, order_id, time, symbol, price, side, qty, executed_qty, overall_average, remaining_qty,
             complete_flag)
-        create_execution(conn, project)
+        execution_id = create_execution(conn, project)
+        conn.execute(SQL_UPSERT_EXECUTION_STATE, (exchange, market, symbol, execution_id, order_id, time, side,
+                                                  executed_qty, overall_average, remaining_qty, complete_flag))
+
+
+def load_checkpoint(db_name, exchange, market, symbol):
+    """
+    Returns the latest state of an execution in a single indexed lookup
+    :param db_name: named as in execute(), without the .db suffix
+    :param exchange: binance, okex, etc
+    :param market: spot or futures
+    :param symbol: symbol as written by the journal
+    :return: dict keyed by column name, or None if nothing has been recorded yet
+    """
+    database = os.path.join(pathlib.Path().absolute(), f'{db_name}.db')
+    if not os.path.exists(database):
+        return None
+
+    conn = create_connection(database)
+    if conn is None:
+        return None
+
+    try:
+        try:
+            cur = conn.execute(SQL_SELECT_EXECUTION_STATE, (exchange, market, symbol))
+            row = cur.fetchone()
+        except Error:
+            row = None
+
+        # Databases written before execution_state existed: last row by primary key;
+        if row is None:
+            try:
+                cur = conn.execute(SQL_SELECT_LAST_EXECUTION)
+                row = cur.fetchone()
+            except Error:
+                return None
+
+        if row is None:
+            return None
+
+        return dict(zip([col[0] for col in cur.description], row))
+
+    finally:
+        conn.close()
+
+
+class ExecutionJournal:
+    """
+    Long-lived writer for the execution table, owned by a single TWAP instance.
+
+    Keeps one connection open in WAL mode and re-uses the same INSERT statement (sqlite3 caches the
+    prepared statement per connection). Each fill also upserts the execution_state row of its symbol in the
+    same transaction, which is what load_checkpoint() reads on resume. Rows are committed in groups, either every commit_rows rows or
+    every commit_interval seconds, whichever comes first; a completed execution is committed at once.
+    close() performs a durable flush (commit followed by a truncating WAL checkpoint, which fsyncs the db file).
+    """
+
+    def __init__(self, db_name, commit_interval=1.0, commit_rows=50):
+        """
+        :param db_name: named as in execute(), without the .db suffix
+        :param commit_interval: max seconds a written row may stay uncommitted
+        :param commit_rows: number of pending rows that forces a commit
+        """
+        self._database = os.path.join(pathlib.Path().absolute(), f'{db_name}.db')
+        self._commit_interval = commit_interval
+        self._commit_rows = commit_rows
+
+        self._conn = sqlite3.connect(self._database, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        create_table(self._conn, SQL_CREATE_EXECUTIONS_TABLE)
+        create_table(self._conn, SQL_CREATE_EXECUTION_STATE_TABLE)
+        self._conn.commit()
+        self._cursor = self._conn.cursor()
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._last_commit = monotonic()
+
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+
+    def record(self, exchange, market, order_id, symbol, time, price, side, qty, overall_average, remaining_qty,
+               executed_qty, complete_flag):
+        """
+        Same fields as execute(); the row becomes durable with the next group commit
+        """
+        project = (
+            exchange, market, order_id, time, symbol, price, side, qty, executed_qty, overall_average, remaining_qty,
+            complete_flag)
+
+        with self._lock:
+            if self._closed.is_set():
+                print('Error! journal already closed, row dropped.')
+                return
+            self._cursor.execute(SQL_INSERT_EXECUTION, project)
+            self._cursor.execute(SQL_UPSERT_EXECUTION_STATE, (exchange, market, symbol, self._cursor.lastrowid,
+                                                              order_id, time, side, executed_qty, overall_average,
+                                                              remaining_qty, complete_flag))
+            self._pending += 1
+
+            if complete_flag or \
+                    self._pending >= self._commit_rows or \
+                    monotonic() - self._last_commit >= self._commit_interval:
+                self._commit()
+
+    def flush(self):
+        with self._lock:
+            if not self._closed.is_set():
+                self._commit()
+
+    def close(self):
+        """
+        Durable flush on stop: commits pending rows and checkpoints the WAL into the database file
+        """
+        self._closed.set()
+        self._flusher.join()
+
+        with self._lock:
+            try:
+                self._commit()
+                self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            except Error as e:
+                print(e)
+            finally:
+                self._conn.close()
+
+    def _commit(self):
+        if self._pending:
+            self._conn.commit()
+            self._pending = 0
+        self._last_commit = monotonic()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self._commit_interval):
+            with self._lock:
+                if not self._closed.is_set() and monotonic() - self._last_commit >= self._commit_interval:
+                    self._commit()
@@ -203,6 +203,16 @@ class DeribitClient(object):
         self.json["params"] = options
         return self.loop(self.private_api, self.json)
 
+    def get_user_trades_by_instrument_and_time(self, instrument_name, start_timestamp, end_timestamp, count=1000):
+        options = {"instrument_name": instrument_name,
+                   "start_timestamp": start_timestamp,
+                   "end_timestamp": end_timestamp,
+                   "count": count,
+                   "sorting": "asc"}
+        self.json["method"] = "private/get_user_trades_by_instrument_and_time"
+        self.json["params"] = options
+        return self.loop(self.private_api, self.json)
+
     def public_trades(self):
         options = {"channels": ["trades.BTC-PERPETUAL.raw"]}
         self.json["method"] = "public/subscribe"
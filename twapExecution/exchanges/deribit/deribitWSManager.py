@@ -7,6 +7,9 @@ import websockets
 
 from twapExecution.exchanges.deribit.deribitClient import DeribitClient
 from twapExecution.exchanges.env import env_vars
+from twapExecution.exchanges.utils.jsonDecoder import loads
+from twapExecution.exchanges.utils.wsMonitor import StreamMonitor
+from twapExecution.exchanges.utils.wsReconnect import Backoff, connect
 
 """
 This is a Binance WS Manager, which connects to Binance WS as a client, and starts different streamings;
@@ -36,6 +39,12 @@ class DeribitWSManager(threading.Thread):
 
         self._conn = []
         self.cur_id = 0
+        self._ws_loop = None
+
+        self._backoff = Backoff()
+        self.monitor = StreamMonitor(f'DERIBIT {self._account}')
+        # Called off the event loop after a reconnect, e.g. UserStreamMultiplexer.recover;
+        self.on_reconnect = None
 
     def _add_user_stream(self, symbol):
         options = {"channels": [f"user.trades.{symbol.upper()}.raw"]}
@@ -47,19 +56,50 @@ class DeribitWSManager(threading.Thread):
             "params": options}
         )
 
+    def _add_ticker_stream(self, symbol):
+        options = {"channels": [f"ticker.{symbol.upper()}.100ms", f"trades.{symbol.upper()}.100ms"]}
+
+        self._add_conn({
+            "jsonrpc": "2.0",
+            "id": 200,
+            "method": 'public/subscribe',
+            "params": options}
+        )
+
     def _add_conn(self, sub):
         self._conn.append(sub)
         self.cur_id += 1
 
+    # Send the latest subscription on the running connection, it is sent on connect otherwise;
+    def _send_new_conn(self):
+        if self._ws_loop is not None:
+            asyncio.run_coroutine_threadsafe(self.ws.send(json.dumps(self._conn[-1])), self._ws_loop)
+
     # Start user Stream
     def start_user_stream(self, symbol, callback):
         self._add_user_stream(symbol)
         self._callback = callback
         self.start()
 
-    # Uses callback function to handle messages
-    async def receive_message(self):
-        self.keep_running = True
+    # Add a symbol to a running user Stream without reconnecting
+    def add_user_stream(self, symbol):
+        self._add_user_stream(symbol)
+        self._send_new_conn()
+
+    # Start ticker and trade Stream, used by the price cache
+    def start_ticker_stream(self, symbols, callback):
+        for symbol in symbols:
+            self._add_ticker_stream(symbol)
+        self._callback = callback
+        self.start()
+
+    # Add a symbol to a running ticker Stream without reconnecting
+    def add_ticker_stream(self, symbol):
+        self._add_ticker_stream(symbol)
+        self._send_new_conn()
+
+    # Connect, authenticate and send every subscription, also on reconnect
+    async def _connect(self):
         self.ws = await websockets.connect(self._ws_url)
 
         j = {
@@ -79,20 +119,32 @@ class DeribitWSManager(threading.Thread):
         for conn in self._conn:
             await self.ws.send(json.dumps(conn))
 
+    # Exchange event time of a message in ms, user trades come as a list, None on replies
+    @staticmethod
+    def _event_time(message):
+        data = message.get('params', {}).get('data')
+        if isinstance(data, list):
+            data = data[0] if data else None
+        return data.get('timestamp') if data else None
+
+    # Uses callback function to handle messages
+    async def receive_message(self):
+        self.keep_running = True
+        if not await connect(self):
+            return
+        self._ws_loop = asyncio.get_event_loop()
+
         while self.keep_running:
             try:
                 message = await self.ws.recv()
-                message = json.loads(message)
+                message = loads(message)
+                self.monitor.on_message(self._event_time(message))
                 if 'id' not in message:
                     self._callback(message)
 
             except Exception as e:
-
-                if not self.ws.open:
-                    print(f'ERROR: Reconnected {e}')
-                    self.ws = await websockets.connect(self._ws_url)
-                    for conn in self._conn:
-                        await self.ws.send(json.dumps(conn))
+                if self.keep_running and not self.ws.open:
+                    await connect(self, e)
         else:
             await self.ws.close()
 
@@ -103,7 +155,7 @@ class DeribitWSManager(threading.Thread):
     async def _close_conn(self):
         self.keep_running = False
         for conn in self._conn:
-            conn["method"] = 'private/unsubscribe'
+            conn["method"] = conn["method"].replace('subscribe', 'unsubscribe')
             await self.ws.send(json.dumps(conn))
 
     # Close the connection!
@@ -1,20 +1,30 @@
 import argparse
+import asyncio
 import calendar
-import sqlite3
+import os
 import time
 
-from telegram import ParseMode
 from datetime import datetime
-from twapExecution.exchanges.binance.binanceWSManager import BinanceWSManager
-from twapExecution.exchanges.coinbase.coinbaseWSManager import CoinbaseWSManager
-from twapExecution.exchanges.database.databaseTWAP import execute
-from twapExecution.exchanges.deribit.deribitWSManager import DeribitWSManager
+from twapExecution.exchanges.database.databaseTWAP import ExecutionJournal, load_checkpoint
 from twapExecution.exchanges.env import env_vars
+from twapExecution.exchanges.executionMethods.controlChannel import ControlChannel, control_socket_path
+from twapExecution.exchanges.executionMethods.executionSchedule import IS_RISK_AVERSION, POV_PARTICIPATION, \
+    ImplementationShortfallSchedule, POVSchedule, VWAPSchedule
+from twapExecution.exchanges.executionMethods.fillEvent import format_fill_time
+from twapExecution.exchanges.marketData.localOrderBook import OrderBookFeed
+from twapExecution.exchanges.marketData.priceCache import MarketDataFeed
+from twapExecution.exchanges.marketData.volumeProfile import get_volatility, get_volume_profile
 from twapExecution.exchanges.executionMethods.orderManager import OrderManager
+from twapExecution.exchanges.executionMethods.passiveSlice import PassiveSlice
 from twapExecution.exchanges.executionMethods.preprocessMsg import PreprocessMsg
-from twapExecution.exchanges.okex.okexWSManager import OkexWSManager
-from twapExecution.exchanges.utils.utils import compute_rolling_average_price_and_qty, compute_precision
-from twapExecution.tgBot.tgBotAPI import TgBotAPI
+from twapExecution.exchanges.executionMethods.sliceScheduler import SliceScheduler
+from twapExecution.exchanges.executionMethods.userStreamMultiplexer import UserStreamMultiplexer
+from twapExecution.exchanges.utils.symbolRules import get_symbol_rule
+from twapExecution.exchanges.utils.utils import compute_rolling_average_price_and_qty
+from twapExecution.tgBot.tgNotifier import get_notifier
+
+# Share of the depth within depth_bps a slice may take;
+DEPTH_SHARE = 0.2
 
 
 class TWAP:
@@ -29,7 +39,26 @@ class TWAP:
                  execution_freq_per_minute,
                  cont,
                  leverage=1,
-                 account='SUB1'):
+                 account='SUB1',
+                 journal_commit_interval=1.0,
+                 journal_commit_rows=50,
+                 ws=None,
+                 client_order_prefix=None,
+                 market_data=None,
+                 price_max_age=5.0,
+                 symbol_rule=None,
+                 notifier=None,
+                 clock=None,
+                 db_name=None,
+                 passive=False,
+                 passive_sweep=True,
+                 passive_fraction=0.8,
+                 schedule=None,
+                 risk_aversion=IS_RISK_AVERSION,
+                 participation=POV_PARTICIPATION,
+                 order_book=None,
+                 depth_bps=None,
+                 depth_share=DEPTH_SHARE):
         self._exchange = exchange.upper()
         self._market = market.upper()
         self._coin = coin.upper()
@@ -44,13 +73,22 @@ class TWAP:
         self._leverage = leverage
         self._account = account.upper()
         self._output_account = f' {self._account} ' if self._exchange == 'DERIBIT' else ' '
+        self._db_name = db_name or f"TWAP_{self._exchange}_{self._input_coin_name}_{self._market}_{self._output_account}"
+        # Slice clock, None is the event loop clock; the backtest passes a simulated one;
+        self._clock = clock
 
         self._output_string = ''
 
         self.fee_modification = 'DENOMINATOR'
 
+        # A ws manager passed in is shared (TWAPEngine) and its fills are routed to handle_fill by the owner,
+        # otherwise fills come through an own UserStreamMultiplexer, de-duplicated and recovered after reconnects;
+        self._owns_ws = ws is None
+        self._user_stream = UserStreamMultiplexer(self._exchange, self._market, self._account) \
+            if self._owns_ws else None
+        self.ws = self._user_stream.ws if self._owns_ws else ws
+
         if self._exchange == 'BINANCE':
-            self.ws = BinanceWSManager(self._market)
 
             name = self._coin.split('-')
 
@@ -94,10 +132,7 @@ class TWAP:
                 self.ws.rest_client.post_change_initial_margin(self._coin, self._leverage)
                 print(self.ws.rest_client.post_position_mode('true'))
 
-            self.ws.start_user_stream(self._handle_message)
-
         elif self._exchange == 'OKEX':
-            self.ws = OkexWSManager(self._market)
             name = self._coin.split('-')
 
             if 'SPOT' in self._market:
@@ -120,18 +155,12 @@ class TWAP:
 
             self._commission = self.ws.rest_client.get_commission_rate(self._coin)
 
-            self.ws.start_user_stream(symbol=self._coin, callback=self._handle_message)
-
         elif self._exchange == 'COINBASE':
-            self.ws = CoinbaseWSManager()
             name = self._coin.split('-')
             self._price_name = name[0] + '-USD'
             self._commission = self.ws.rest_client.get_commission_rate(self._coin)
 
-            self.ws.start_user_stream(symbol=[self._coin], callback=self._handle_message)
-
         elif self._exchange == 'DERIBIT':
-            self.ws = DeribitWSManager(self._account)
             self._qty = float(self._qty) * 10
             if 'PERP' in self._coin:
                 self._coin = self._coin + 'ETUAL'
@@ -144,15 +173,33 @@ class TWAP:
             self._price_name = self._coin
             self._commission = self.ws.main_client.get_commission_rate(self._coin)
             # self._commission = 0.01
-            self.ws.start_user_stream(symbol=self._coin, callback=self._handle_message)
-
-        # Compute Precision
-        print('COMPUTE PERCISION')
-        self._precision = compute_precision(exchange=self._exchange,
-                                            market=self._market,
-                                            coin=self._coin,
-                                            client=self.ws.public_client if self._exchange == 'COINBASE'
-                                            else self.ws.rest_client)
+
+        # Slices read the price from the WS fed cache, REST is only the fallback for a stale or missing price;
+        self._owns_market_data = market_data is None
+        self._market_data = MarketDataFeed(self._exchange, self._market, self._account) \
+            if self._owns_market_data else market_data
+        self._market_data.subscribe(self._price_name)
+        self._price_max_age = price_max_age
+
+        # With depth_bps, slices are capped to depth_share of the depth within depth_bps of the touch, read from a
+        # local order book (Binance diff depth stream);
+        self._depth_bps = depth_bps
+        self._depth_share = depth_share
+        self._owns_order_book = depth_bps is not None and order_book is None
+        if depth_bps is not None:
+            self._order_book_feed = OrderBookFeed(self._exchange, self._market) if self._owns_order_book \
+                else order_book
+            self._order_book = self._order_book_feed.subscribe(self._coin)
+        else:
+            self._order_book = None
+
+        # Symbol rules (precision, lot size, min notional) come from the persisted per exchange/market cache;
+        self._symbol_rule = symbol_rule or get_symbol_rule(exchange=self._exchange,
+                                                           market=self._market,
+                                                           symbol=self._coin,
+                                                           client=self.ws.public_client if self._exchange == 'COINBASE'
+                                                           else self.ws.rest_client)
+        self._precision = self._symbol_rule['precision']
         print(f'PRECISION: {self._precision}')
 
         self._order_manager = OrderManager(self._exchange,
@@ -162,64 +209,129 @@ class TWAP:
                                            self._side,
                                            self._execution_minutes,
                                            self._execution_freq_per_minute,
-                                           self._precision)
+                                           self._precision,
+                                           client_order_prefix=client_order_prefix,
+                                           symbol_rule=self._symbol_rule,
+                                           schedule=self._make_schedule(schedule, risk_aversion,
+                                                                               participation))
+
+        # Passive mode rests a post only limit order for passive_fraction of every slice, see passiveSlice; it is
+        # priced off the traded symbol's book, the price may come from another one;
+        if passive:
+            self._market_data.subscribe(self._coin)
+        self._passive = PassiveSlice(self._exchange,
+                                     self._market,
+                                     self._coin,
+                                     self.ws.rest_client,
+                                     self._order_manager,
+                                     self._market_data,
+                                     self._symbol_rule['tick_size'],
+                                     self._precision,
+                                     sweep=passive_sweep,
+                                     book_max_age=self._price_max_age,
+                                     clock=self._clock) if passive else None
+        self._passive_fraction = passive_fraction
 
         self._chat_id = env_vars['TELEGRAM_CHAT_ID']
-        self._tg_bot = TgBotAPI(env_vars['TELEGRAM_LOOP_BOT'])
+        # Telegram sends/edits are queued, never made from the WS callback or the slice loop;
+        self._notifier = notifier or get_notifier(env_vars['TELEGRAM_LOOP_BOT'])
+        self._progress_key = (id(self), 'progress')
+        self._threshold_key = (id(self), 'threshold')
+        # /stop, /pause, /resume and /modify from twapBot are pushed here, see controlChannel;
+        self.control = ControlChannel()
+        self._control_path = control_socket_path(self._exchange, self._market, self._input_coin_name, self._account,
+                                                 client_order_prefix or os.getpid())
 
         self._preprocessor = PreprocessMsg(exchange=self._exchange,
                                            market=self._market)
 
         # Check previous DB;
         self._check_db()
-        self._sent_message = None
-        self._sent_message2 = None
+        self._journal = ExecutionJournal(db_name=self._db_name,
+                                         commit_interval=journal_commit_interval,
+                                         commit_rows=journal_commit_rows)
         self._number_of_executions = 0
         self._repeated_n_times = 0
 
+        if self._owns_ws:
+            self._user_stream.subscribe(self._coin, self.handle_fill)
+
+    def _make_schedule(self, schedule, risk_aversion, participation):
+        """
+        Resolves a schedule name ('TWAP', 'VWAP', 'IS', 'POV') to an ExecutionSchedule, an ExecutionSchedule passes as is;
+        None (TWAP) keeps the uniform slices of OrderManager
+        """
+        if schedule is None or not isinstance(schedule, str):
+            return schedule
+
+        schedule = schedule.upper()
+        if schedule == 'TWAP':
+            return None
+        elif schedule == 'VWAP':
+            profile = get_volume_profile(self._exchange, self._market, self._coin, self.ws.rest_client)
+            return VWAPSchedule(profile, self._execution_minutes, self._execution_freq_per_minute)
+        elif schedule == 'IS':
+            volatility = get_volatility(self._exchange, self._market, self._coin, self.ws.rest_client)
+            print(f'IS SCHEDULE: 1M VOLATILITY {volatility:.2f}BPS, RISK AVERSION {risk_aversion}')
+            return ImplementationShortfallSchedule(volatility, self._side, self._execution_minutes,
+                                                   self._execution_freq_per_minute, risk_aversion=risk_aversion)
+        elif schedule == 'POV':
+            # The traded symbol's volume, the price may come from another one;
+            self._market_data.subscribe(self._coin)
+            print(f'POV SCHEDULE: {participation * 100:.1f}% OF THE {self._coin} VOLUME')
+            return POVSchedule(self._market_data.volume_counter(self._coin), self._execution_minutes,
+                               self._execution_freq_per_minute, participation=participation)
+        raise Exception(f'Unknown schedule {schedule}!')
+
     def _check_db(self):
-        try:
-            connect = sqlite3.connect(f"TWAP_{self._exchange}_{self._input_coin_name}_{self._market}_{self._output_account}.db")
-            c = connect.cursor()
-            select = c.execute("SELECT * from execution")
-            cols = list(map(lambda x: x[0], select.description))
-
-            last_row = None
-            for row in select:
-                last_row = row
-            connect.close()
-
-            last_data = {}
-            for i in range(len(last_row)):
-                last_data[cols[i]] = last_row[i]
-
-            if not self._cont or \
-                    last_data['complete_flag'] or \
-                    self._side != last_data['side'] or \
-                    self._market != last_data['market']:
-                self._executed_qty = 0
-                self._avg_price = 0
-                self._complete_flag = False
-            else:
-                print('CONTINUE LAST EXECUTION!!!')
-                self._executed_qty = last_data['executed_qty']
-                self._avg_price = last_data['average_price']
-                self._complete_flag = False
+        last_data = load_checkpoint(db_name=self._db_name,
+                                    exchange=self._exchange,
+                                    market=self._market,
+                                    symbol=self._coin)
 
-        except sqlite3.OperationalError as e:
+        if last_data is None:
             print('NO PREVIOUS DATABASE! START!')
             self._executed_qty = 0
             self._avg_price = 0
             self._complete_flag = False
 
+        elif not self._cont or \
+                last_data['complete_flag'] or \
+                self._side != last_data['side'] or \
+                self._market != last_data['market']:
+            self._executed_qty = 0
+            self._avg_price = 0
+            self._complete_flag = False
+        else:
+            print('CONTINUE LAST EXECUTION!!!')
+            self._executed_qty = last_data['executed_qty']
+            self._avg_price = last_data['average_price']
+            self._complete_flag = False
+
+    @property
+    def symbol(self):
+        return self._coin
+
+    @property
+    def account(self):
+        return self._account
+
     def _handle_message(self, message):
-        msg = self._preprocessor.handle_msg(message)
+        self.handle_fill(self._preprocessor.handle_msg(message))
+
+    def handle_fill(self, msg):
+        if msg is None:
+            return
+
         # L AND l = LAST EXECUTED PRICE AND LAST EXECUTED QTY;
-        if msg['price'] is not None and msg['symbol'] == self._coin:
+        if msg.price is not None and msg.symbol == self._coin:
+            if self._passive is not None:
+                self._passive.on_fill(msg)
+
             self._avg_price, self._executed_qty = compute_rolling_average_price_and_qty(self._avg_price,
                                                                                         self._executed_qty,
-                                                                                        msg['qty'],
-                                                                                        msg['price'])
+                                                                                        msg.qty,
+                                                                                        msg.price)
 
             self._output_string = "{:.2f}/{:.2f} @ {:.8f}".format(self._executed_qty,
                                                                   self._qty,
@@ -228,130 +340,191 @@ class TWAP:
             if round((self._qty - self._executed_qty), 8) == 0:
                 self._complete_flag = True
 
-            execute(db_name=f"TWAP_{self._exchange}_{self._input_coin_name}_{self._market}_{self._output_account}",
-                    exchange=self._exchange,
-                    market=self._market,
-                    order_id=msg['order_id'],
-                    symbol=msg['symbol'],
-                    time=msg['time'],
-                    price=msg['price'],
-                    side=self._side,
-                    qty=msg['qty'],
-                    overall_average=self._avg_price,
-                    remaining_qty=self._qty - self._executed_qty,
-                    executed_qty=self._executed_qty,
-                    complete_flag=self._complete_flag)
-
-        if msg['last']:
+            self._journal.record(exchange=self._exchange,
+                                 market=self._market,
+                                 order_id=msg.order_id,
+                                 symbol=msg.symbol,
+                                 time=format_fill_time(msg.time),
+                                 price=msg.price,
+                                 side=self._side,
+                                 qty=msg.qty,
+                                 overall_average=self._avg_price,
+                                 remaining_qty=self._qty - self._executed_qty,
+                                 executed_qty=self._executed_qty,
+                                 complete_flag=self._complete_flag)
+
+        if msg.last:
             if self._number_of_executions % 10 == 0 or round(self._executed_qty, 3) >= self._qty:
-                if self._sent_message:
-                    self._tg_bot.edit_message(
-                        chat_id=self._sent_message['result']['chat']['id'],
-                        message_id=self._sent_message['result']['message_id'],
-                        message='<code>' + f"{self._side.capitalize()} " + f"{self._exchange.capitalize()} {self._market.capitalize()}{self._output_account.capitalize()}executed {self._number_of_executions} trades\n"
-                                + f"{self._coin}: " + self._output_string + '</code>',
-                        parse_mode=ParseMode.HTML)
-                else:
-                    self._sent_message = self._tg_bot.send_message(self._chat_id,
-                                                                   message='<code>' + f"{self._side.capitalize()} " + f"{self._exchange.capitalize()} {self._market.capitalize()}{self._output_account.capitalize()}executed {self._number_of_executions} trades\n" + f"{self._coin}: " + self._output_string + '</code>',
-                                                                   parse_mode=ParseMode.HTML)
+                self._notify_progress()
+
+    def _apply_modifications(self):
+        for field, value in self.control.pop_modifications():
+            if field == 'price_threshold':
+                self._price_threshold = value
+            elif field == 'qty':
+                if value < self._executed_qty:
+                    print(f'CANNOT MODIFY QTY TO {value}, ALREADY EXECUTED {self._executed_qty}!')
+                    continue
+                self._qty = value
+                self._order_manager.set_qty(value)
+
+            print(f'MODIFIED {field.upper()} TO {value}')
+            self._notifier.send(self._chat_id, '<code>' + f"{self._exchange.capitalize()} {self._market.capitalize()}"
+                                                          f"{self._output_account}{self._coin}: {field} -> {value}"
+                                + '</code>')
+
+    def _get_current_price(self):
+        # Entries of a lagging or silent stream look fresh by their local time, check the stream first;
+        stale = self._market_data.stale_reason()
+        if stale is None:
+            price = self._market_data.cache.get_price(self._price_name, max_age=self._price_max_age)
+            if price is not None:
+                return price
+            print(f'NO FRESH PRICE FOR {self._price_name} IN CACHE, USE REST!')
+        else:
+            print(f'STALE MARKET DATA STREAM ({stale}), USE REST!')
 
-    def run(self):
-        self.execution_interval = 60 / self._execution_freq_per_minute
+        if self._exchange == 'BINANCE':
+            price_info = self.ws.rest_client.get_symbol_price_ticker(self._price_name)
+            price_info = price_info if isinstance(price_info, dict) else price_info[0]
+            return float(price_info['price'])
+        elif self._exchange == 'OKEX':
+            return float(self.ws.rest_client.get_symbol_price_ticker(self._price_name)['last'])
+        elif self._exchange == 'COINBASE':
+            return float(self.ws.public_client.get_product_ticker(self._price_name)['price'])
+        elif self._exchange == 'DERIBIT':
+            return float(self.ws.rest_client.ticker(self._price_name)['result']['mark_price'])
+
+    def _cap_to_depth(self):
+        """
+        Caps the order size to depth_share of the depth within depth_bps, returns True if it was lowered
+        """
+        if self._order_book is None:
+            return False
+
+        available = self._order_book.available(self._side, self._depth_bps)
+        if available is None:
+            print(f'ORDER BOOK {self._coin} NOT SYNCED, NO DEPTH CAP!')
+            return False
+        if self._order_manager.cap_order_size(self._depth_share * available):
+            print(f'DEPTH CAP: {available} WITHIN {self._depth_bps}BPS, ORDER SIZE {self._order_manager.order_size}')
+            return True
+        return False
+
+    def _progress_message(self):
+        return '<code>' + f"{self._side.capitalize()} " + f"{self._exchange.capitalize()} {self._market.capitalize()}{self._output_account.capitalize()}executed {self._number_of_executions} trades\n" + f"{self._coin}: " + self._output_string + '</code>'
+
+    def _threshold_message(self, output):
+        return '<code>' + f"{self._side.capitalize()} " + f"{self._exchange.capitalize()} {self._market.capitalize()}{self._output_account.capitalize()}repeated {self._repeated_n_times} times\n" + f"{self._coin}: " + self._output_string + '\n' + output + '</code>'
+
+    def _notify_progress(self):
+        self._notifier.send(self._chat_id, self._progress_message(), key=self._progress_key)
+
+    async def _run_slice(self, n, jitter):
+        if self._executed_qty >= self._qty:
+            return False
+
+        loop = asyncio.get_event_loop()
+
+        print(f'**********Current Time 1: {datetime.now()}')
+        print(f'Executed Qty: {self._executed_qty}, Qty: {self._qty}')
+
+        # Stop/pause/modify arrive through the control channel, checking them is a local read;
+        if self.control.stop_requested:
+            print('STOP REQUESTED!')
+            return False
+        self._apply_modifications()
+        if self.control.paused:
+            print('PAUSED, SKIP SLICE!')
+            return True
+
+        # Fills of a dropped user stream only arrive once it reconnects, a slice sized meanwhile could overshoot;
+        if self.ws.monitor.dropped:
+            print('USER STREAM DOWN, SKIP SLICE!')
+            return True
 
-        while self._executed_qty < self._qty:
-            next_time = time.time() + self.execution_interval
-
-            print(f'**********Current Time 1: {datetime.now()}')
-            print(f'Executed Qty: {self._executed_qty}, Qty: {self._qty}')
-            # get the first id;
-            id = self._tg_bot.get_updates()['result'][-1]['update_id']
-            # offset it by the id, to remove old updates
-            update = self._tg_bot.get_updates(id)['result'][0]
-
-            try:
-                if update['message']['text'] == f'/stop {self._exchange.lower()} {self._market.lower()}':
-                    break
-
-            except KeyError:
-                print('No update yet!')
-            except IndexError:
-                print('No update yet!')
-
-            try:
-                if self._exchange == 'BINANCE':
-                    price_info = self.ws.rest_client.get_symbol_price_ticker(self._price_name)
-                    price_info = price_info if isinstance(price_info, dict) else price_info[0]
-                    self._cur_price = float(price_info['price'])
-                elif self._exchange == 'OKEX':
-                    self._cur_price = float(self.ws.rest_client.get_symbol_price_ticker(self._price_name)['last'])
-                elif self._exchange == 'COINBASE':
-                    self._cur_price = float(self.ws.public_client.get_product_ticker(self._price_name)['price'])
-                elif self._exchange == 'DERIBIT':
-                    self._cur_price = float(self.ws.rest_client.ticker(self._price_name)['result']['mark_price'])
-                    print(self._cur_price)
-
-                enter = self._cur_price < self._price_threshold if 'BUY' in self._side else self._cur_price > self._price_threshold
-
-                if enter:
-                    self._order_manager.set_order_size(executed_qty=self._executed_qty, current_price=self._cur_price)
-                    print(self._order_manager.order_size)
-
-                    if self._order_manager.order_size > 0:
-                        print('ENTER!')
-                        self._number_of_executions += 1
-                        order = self.ws.rest_client.place_market_order(**self._order_manager.market_order_kwargs())
+        try:
+            self._cur_price = await loop.run_in_executor(None, self._get_current_price)
+
+            enter = self._cur_price < self._price_threshold if 'BUY' in self._side else self._cur_price > self._price_threshold
+
+            if enter:
+                self._order_manager.set_order_size(executed_qty=self._executed_qty, current_price=self._cur_price,
+                                                   n=n)
+                depth_capped = self._cap_to_depth()
+                print(self._order_manager.order_size)
+
+                if self._order_manager.order_size > 0:
+                    print('ENTER!')
+                    self._number_of_executions += 1
+                    if self._passive is not None:
+                        try:
+                            await self._passive.run(self._order_manager.order_size,
+                                                    self.execution_interval * self._passive_fraction)
+                        except Exception as e:
+                            print(f'PASSIVE SLICE FAILED: {e}')
+                            self._number_of_executions -= 1
+                            self._notify_progress()
+                            return False
+                    else:
+                        order_kwargs = self._order_manager.market_order_kwargs()
+                        order = await loop.run_in_executor(None, lambda: self.ws.rest_client.place_market_order(**order_kwargs))
                         print(order)
                         #
                         if self._order_manager.error_or_not(order):
                             self._number_of_executions -= 1
-                            if self._sent_message:
-                                self._tg_bot.edit_message(
-                                    chat_id=self._sent_message['result']['chat']['id'],
-                                    message_id=self._sent_message['result']['message_id'],
-                                    message='<code>' + f"{self._side.capitalize()} " +
-                                            f"{self._exchange.capitalize()} {self._market.capitalize()}{self._output_account.capitalize()}executed {self._number_of_executions} trades\n" + f"{self._coin}: " + self._output_string + '</code>',
-                                    parse_mode=ParseMode.HTML)
-                            # self._tg_bot.send_message(chat_id=self._chat_id, message='<code>' + str(order) + '</code>',
-                            #                           parse_mode=ParseMode.HTML)
-                            break
-                    else:
-                        break
+                            self._notify_progress()
+                            return False
+                elif depth_capped:
+                    print(f'NO DEPTH WITHIN {self._depth_bps}BPS, SKIP SLICE!')
+                elif self._order_manager.schedule is not None and self._order_manager.schedule.target(n) < 1:
+                    # Ahead of the schedule's curve (POV: no volume to follow), nothing is due in this slice;
+                    print('AHEAD OF SCHEDULE, SKIP SLICE!')
                 else:
-                    print('NOT WITHIN THRESHOLD, WAIT!')
+                    return False
+            else:
+                print('NOT WITHIN THRESHOLD, WAIT!')
 
-                    if 'BUY' in self._side:
-                        output = f"Current price {self._cur_price} &#62; {self._price_threshold}"
-                    else:
-                        output = f"Current price {self._cur_price} &#60; {self._price_threshold}"
-                    self._repeated_n_times += 1
-
-                    if self._sent_message2:
-                        self._tg_bot.edit_message(
-                            chat_id=self._sent_message2['result']['chat']['id'],
-                            message_id=self._sent_message2['result']['message_id'],
-                            message='<code>' + f"{self._side.capitalize()} " + f"{self._exchange.capitalize()} {self._market.capitalize()}{self._output_account.capitalize()}repeated {self._repeated_n_times} times\n"
-                                    + f"{self._coin}: " + self._output_string + '\n' + output + '</code>',
-                            parse_mode=ParseMode.HTML)
-                    else:
-                        print('SEND MSG!')
-                        # print('<code>' + f"{self._side.capitalize()} " + f"{self._exchange.capitalize()} {self._market.capitalize()}{self._output_account.capitalize()}repeated {self._repeated_n_times} trades\n" + f"{self._coin}: " + output + '</code>')
-                        self._sent_message2 = self._tg_bot.send_message(self._chat_id,
-                                                                        message='<code>' + f"{self._side.capitalize()} " + f"{self._exchange.capitalize()} {self._market.capitalize()}{self._output_account.capitalize()}repeated {self._repeated_n_times} trades\n" + f"{self._coin}: " + self._output_string + '\n' + output + '</code>',
-                                                                        parse_mode=ParseMode.HTML)
-                        print(self._sent_message2)
-
-                time_diff = next_time - time.time() if next_time - time.time() > 0 else 0
-                print(f'**********Current Time 2: {datetime.now()}')
-                print(f'SLEEP FOR {time_diff} seconds')
-                time.sleep(time_diff)
-
-            except Exception as e:
-                print(f'CANNOT PLACE AN ORDER! ERROR: {e}')
-                self._tg_bot.send_message(chat_id=self._chat_id, message='<code>' + str(e) + '</code>',
-                                          parse_mode=ParseMode.HTML)
-                break
+                if 'BUY' in self._side:
+                    output = f"Current price {self._cur_price} &#62; {self._price_threshold}"
+                else:
+                    output = f"Current price {self._cur_price} &#60; {self._price_threshold}"
+                self._repeated_n_times += 1
+
+                self._notifier.send(self._chat_id, self._threshold_message(output), key=self._threshold_key)
 
+            print(f'**********Current Time 2: {datetime.now()}')
+            return True
+
+        except Exception as e:
+            print(f'CANNOT PLACE AN ORDER! ERROR: {e}')
+            self._notifier.send(self._chat_id, '<code>' + str(e) + '</code>')
+            return False
+
+    async def async_run(self):
+        """
+        Runs the execution on a SliceScheduler; price fetch, order and notifications do not shift the slice grid
+        """
+        self.execution_interval = 60 / self._execution_freq_per_minute
+
+        if self._order_manager.schedule is not None:
+            self._order_manager.schedule.start(self._clock.time() if self._clock is not None else time.time(),
+                                               executed_qty=self._executed_qty)
+
+        await self.control.start_server(self._control_path)
+        try:
+            self._scheduler = SliceScheduler(self.execution_interval, clock=self._clock)
+            await self._scheduler.run(self._run_slice)
+        finally:
+            await self.control.close()
+        print(f'SLICE JITTER: {self._scheduler.jitter_stats()}')
+
+        await asyncio.get_event_loop().run_in_executor(None, self._finish)
+
+    def run(self):
+        asyncio.run(self.async_run())
+
+    def _finish(self):
         # DONE TWAP! STOPPED! PRINT LAST MESSAGE
 
         if self.fee_modification == 'NUMERATOR':
@@ -365,26 +538,54 @@ class TWAP:
                                                                           1 + self._commission) if 'BUY' in self._side else self._avg_price * (
                                                                           1 - self._commission))
 
-        self._tg_bot.send_message(self._chat_id,
-                                  message='<code>' +
-                                          f"-------------------------\nTWAP Stopped\n-------------------------\n" +
-                                          f"{self._side.capitalize()} " +
-                                          f"{self._exchange.capitalize()} "
-                                          f"{self._market.capitalize()}"
-                                          f"{self._output_account.capitalize()}"
-                                          f"executed "
-                                          f"{self._number_of_executions} trades\n" +
-                                          f"{self._coin}: " +
-                                          self._output_string +
-                                          '</code>',
-                                  parse_mode=ParseMode.HTML)
-
-        self.ws.close()
+        self._notifier.send(self._chat_id,
+                            message='<code>' +
+                                    f"-------------------------\nTWAP Stopped\n-------------------------\n" +
+                                    f"{self._side.capitalize()} " +
+                                    f"{self._exchange.capitalize()} "
+                                    f"{self._market.capitalize()}"
+                                    f"{self._output_account.capitalize()}"
+                                    f"executed "
+                                    f"{self._number_of_executions} trades\n" +
+                                    f"{self._coin}: " +
+                                    self._output_string +
+                                    '</code>')
+        # Deliver everything queued before the process may exit, then free the edited messages;
+        self._notifier.flush(timeout=60)
+        self._notifier.forget(self._progress_key)
+        self._notifier.forget(self._threshold_key)
+
+        self.close()
+
+    def close(self):
+        """
+        Closes the streams and feeds the TWAP opened itself, then its journal
+        """
+        if self._owns_ws:
+            self._user_stream.close()
+        if self._owns_market_data:
+            self._market_data.close()
+        if self._owns_order_book:
+            self._order_book_feed.close()
+        self._journal.close()
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='----TWAP EXECUTION----')
     parser.add_argument('--args', nargs='+', help='')
+    parser.add_argument('--passive', action='store_true', help='post only limit orders at the touch (Binance, Coinbase)')
+    parser.add_argument('--no-sweep', action='store_true', help='passive: leave unfilled qty to the next slices')
+    parser.add_argument('--schedule', default=None,
+                        help='TWAP (uniform slices, default), VWAP or IS (implementation shortfall), both Binance, '
+                             'or POV (participation of volume)')
+    parser.add_argument('--risk-aversion', type=float, default=IS_RISK_AVERSION,
+                        help='IS: higher front-loads more, 0 is TWAP unless the price drifts')
+    parser.add_argument('--participation', type=float, default=POV_PARTICIPATION,
+                        help='POV: share of the market volume, e.g. 0.1')
+    parser.add_argument('--depth-bps', type=float, default=None,
+                        help='cap slices by the order book depth within this many bps of the touch (Binance)')
+    parser.add_argument('--depth-share', type=float, default=DEPTH_SHARE,
+                        help='share of that depth a slice may take')
 
     args = parser.parse_args()
 
@@ -392,7 +593,9 @@ if __name__ == '__main__':
 
     list_of_args = args.args
 
-    twap = TWAP(*list_of_args)
+    twap = TWAP(*list_of_args, passive=args.passive, passive_sweep=not args.no_sweep, schedule=args.schedule,
+                risk_aversion=args.risk_aversion, participation=args.participation,
+                depth_bps=args.depth_bps, depth_share=args.depth_share)
 
     # temp solve 'USDT' problem.
     if 'USDT' not in list_of_args[2].upper():
@@ -403,6 +606,6 @@ if __name__ == '__main__':
         #     print(e)
         #     twap.ws.close()
     else:
-        twap.ws.close()
+        twap.close()
 
     print('DONE!!!!!')
\ No newline at end of file
@@ -0,0 +1,343 @@
+import argparse
+import asyncio
+import json
+import os
+
+from twapExecution.exchanges.env import env_vars
+from twapExecution.exchanges.executionMethods.baseTWAP import TWAP
+from twapExecution.exchanges.executionMethods.controlChannel import ControlChannel, control_socket_path
+from twapExecution.exchanges.executionMethods.sliceScheduler import SliceScheduler
+from twapExecution.exchanges.executionMethods.userStreamMultiplexer import UserStreamMultiplexer
+from twapExecution.exchanges.marketData.priceCache import MarketDataFeed
+from twapExecution.tgBot.tgNotifier import get_notifier
+
+"""
+This is a Basket TWAP, which executes weighted orders across many symbols as one parent order;
+
+Every leg is a TWAP (symbol, qty, side, limit) that never runs its own slice loop: the basket slices all legs on one
+SliceScheduler. Legs on the same exchange/market/account share one UserStreamMultiplexer and one MarketDataFeed, so
+a basket of 30 coins holds one user stream and one price cache per venue; the orders of a slice go out together,
+through batchOrders on Binance, one concurrent request per leg elsewhere.
+
+Legs are kept in step by notional: the basket completion is the notional weighted completion of its legs, and a leg
+more than max_imbalance ahead of it skips the slice. A leg held back by its limit slows the others down instead of
+leaving half of a rebalance done. A leg whose order is rejected fails: it is named on Telegram, left out of the
+completion and never sliced again, the other legs carry on. Progress of all legs is one Telegram message, edited in
+place.
+"""
+
+# A leg more than this share of its qty ahead of the basket completion waits;
+MAX_IMBALANCE = 0.1
+
+
+class BasketLeg(TWAP):
+    def __init__(self, basket, *args, **kwargs):
+        """
+        A TWAP sliced by its BasketTWAP; fills still come through handle_fill and the leg's own journal
+
+        Parameters
+        ----------
+        basket BasketTWAP; gets the progress notifications of the leg
+        args, kwargs; as TWAP
+        """
+        self._basket = basket
+        self._cur_price = None
+        self.waiting = False
+        # Set when an order of the leg is rejected, the basket stops slicing it;
+        self.failed = False
+        super().__init__(*args, **kwargs)
+
+    def _notify_progress(self):
+        self._basket.notify_progress()
+
+    @property
+    def done(self):
+        return round(self._qty - self._executed_qty, 8) <= 0
+
+    def completion(self):
+        return min(self._executed_qty / self._qty, 1.)
+
+    def notional(self):
+        """
+        Qty at the last price, the leg's weight in the basket; None before the first price
+        """
+        return self._qty * self._cur_price if self._cur_price is not None else None
+
+    def update_price(self):
+        self._cur_price = self._get_current_price()
+        self.waiting = not (self._cur_price < self._price_threshold if 'BUY' in self._side
+                            else self._cur_price > self._price_threshold)
+
+    def next_order(self, n):
+        """
+        Market order kwargs of slice n, None when nothing is due
+        """
+        self._order_manager.set_order_size(executed_qty=self._executed_qty, current_price=self._cur_price, n=n)
+        if self._order_manager.order_size <= 0:
+            return None
+        self._number_of_executions += 1
+        return self._order_manager.market_order_kwargs()
+
+    def place(self, order_kwargs):
+        return self.ws.rest_client.place_market_order(**order_kwargs)
+
+    def rejected(self, order):
+        if self._order_manager.error_or_not(order):
+            self._number_of_executions -= 1
+            return True
+        return False
+
+    def progress_line(self):
+        return f"{self._side.capitalize()} {self._coin}: " + \
+               "{:.2f}/{:.2f} @ {:.8f}".format(self._executed_qty, self._qty, self._avg_price) + \
+               (' (failed)' if self.failed else ' (limit)' if self.waiting and not self.done else '')
+
+
+class BasketTWAP:
+    def __init__(self, legs, execution_minutes, execution_freq_per_minute, cont='false', name='BASKET',
+                 max_imbalance=MAX_IMBALANCE, notifier=None, clock=None):
+        """
+
+        Parameters
+        ----------
+        legs list; dict per leg with exchange, market, coin, qty, side, price_threshold as the baseTWAP arguments,
+            optionally leverage and account
+        execution_minutes float; shared by every leg
+        execution_freq_per_minute float;
+        cont string; 'true' continues every leg from its journal
+        name string; names the journals and the control sockets, /stop [exchange] [market] [name] on any venue of
+            the legs
+        max_imbalance float; share of its qty a leg may run ahead of the basket completion
+        """
+        self._name = name.upper()
+        self._execution_minutes = float(execution_minutes)
+        self._execution_freq_per_minute = float(execution_freq_per_minute)
+        self._max_imbalance = max_imbalance
+        self._clock = clock
+
+        self._chat_id = env_vars['TELEGRAM_CHAT_ID']
+        self._notifier = notifier or get_notifier(env_vars['TELEGRAM_LOOP_BOT'])
+        self._progress_key = (id(self), 'progress')
+
+        # (exchange, market, account) -> UserStreamMultiplexer / MarketDataFeed, one per venue;
+        self._user_streams = {}
+        self._market_data = {}
+        self._legs = []
+        self._keys = []
+        self._db_names = set()
+        self._completion = 0.
+        self._number_of_slices = 0
+
+        try:
+            for i, leg in enumerate(legs):
+                self._add_leg(i, leg, cont)
+        except Exception:
+            self._close_streams()
+            raise
+
+        # One socket per venue of the legs, a /stop on any of them stops the whole basket;
+        self.control = ControlChannel()
+        self._control_paths = [control_socket_path(exchange, market, self._name, account, os.getpid())
+                               for exchange, market, account in self._user_streams]
+
+    def _add_leg(self, i, leg, cont):
+        exchange, market = leg['exchange'].upper(), leg['market'].upper()
+        account = leg.get('account', 'SUB1').upper()
+        key = (exchange, market, account)
+        if key not in self._user_streams:
+            self._user_streams[key] = UserStreamMultiplexer(exchange, market, account)
+            self._market_data[key] = MarketDataFeed(exchange, market, account)
+        user_stream = self._user_streams[key]
+        db_name = f'{self._name}_{exchange}_{leg["coin"]}_{market}'.upper()
+        if db_name in self._db_names:
+            raise Exception(f'{exchange} {market} {leg["coin"].upper()} is twice in the basket.')
+        self._db_names.add(db_name)
+
+        prefix = f'basket{os.getpid()}x{i}'
+        twap = BasketLeg(self, exchange, market, leg['coin'], leg['qty'], leg['price_threshold'], leg['side'],
+                         self._execution_minutes, self._execution_freq_per_minute, cont,
+                         leverage=leg.get('leverage', 1),
+                         account=account,
+                         ws=user_stream.ws,
+                         client_order_prefix=prefix,
+                         market_data=self._market_data[key],
+                         notifier=self._notifier,
+                         clock=self._clock,
+                         db_name=db_name)
+        # Raises for a second leg on a symbol of a venue that does not echo client order ids;
+        user_stream.subscribe(twap.symbol, twap.handle_fill, client_order_prefix=prefix)
+        self._legs.append(twap)
+        self._keys.append(key)
+
+    @property
+    def legs(self):
+        return self._legs
+
+    def _active_legs(self):
+        return [(leg, key) for leg, key in zip(self._legs, self._keys) if not leg.done and not leg.failed]
+
+    def _update_prices(self):
+        for leg, _ in self._active_legs():
+            leg.update_price()
+
+    def _update_completion(self):
+        # A failed leg would hold the others back at its completion forever;
+        weights = [(leg.notional(), leg.completion()) for leg in self._legs
+                   if leg.notional() is not None and not leg.failed]
+        total = sum(weight for weight, _ in weights)
+        self._completion = sum(weight * completion for weight, completion in weights) / total if total > 0 else 0.
+
+    async def _place(self, key, orders):
+        """
+        Places the orders of one venue, returns the responses in the same order
+        """
+        loop = asyncio.get_event_loop()
+        if key[0] == 'BINANCE':
+            rest_client = self._user_streams[key].ws.rest_client
+            return await loop.run_in_executor(None, rest_client.place_batch_orders, [kwargs for _, kwargs in orders])
+        # Only the Binance client batches, the legs of the other venues go out concurrently, one request each;
+        return await asyncio.gather(*[loop.run_in_executor(None, leg.place, kwargs) for leg, kwargs in orders])
+
+    def _progress_string(self):
+        self._update_completion()
+        done = sum(leg.done for leg in self._legs)
+        failed = sum(leg.failed for leg in self._legs)
+        return f"Basket {self._name}: {done}/{len(self._legs)} legs" + (f", {failed} failed" if failed else '') + \
+               f", {self._completion * 100:.1f}% by notional, {self._number_of_slices} slices\n" + '\n'.join(leg.progress_line() for leg in self._legs)
+
+    def notify_progress(self):
+        # Keyed, so the notifier edits one message however many legs fill;
+        self._notifier.send(self._chat_id, '<code>' + self._progress_string() + '</code>', key=self._progress_key)
+
+    async def _run_slice(self, n, jitter):
+        if not self._active_legs():
+            return False
+
+        if self.control.stop_requested:
+            print('STOP REQUESTED!')
+            return False
+        for field, value in self.control.pop_modifications():
+            print(f'CANNOT MODIFY {field.upper()} OF A BASKET, STOP AND START IT AGAIN!')
+        if self.control.paused:
+            print('PAUSED, SKIP SLICE!')
+            return True
+
+        # Fills of a dropped user stream only arrive once it reconnects, a slice sized meanwhile could overshoot;
+        dropped = [key for key, user_stream in self._user_streams.items() if user_stream.ws.monitor.dropped]
+        if dropped:
+            print(f'USER STREAM {dropped} DOWN, SKIP SLICE!')
+            return True
+
+        loop = asyncio.get_event_loop()
+        try:
+            await loop.run_in_executor(None, self._update_prices)
+            self._update_completion()
+
+            orders = {}
+            for leg, key in self._active_legs():
+                if leg.waiting:
+                    print(f'{leg.symbol} NOT WITHIN THRESHOLD, WAIT!')
+                    continue
+                if leg.completion() > self._completion + self._max_imbalance:
+                    print(f'{leg.symbol} AHEAD OF THE BASKET ({leg.completion():.2f} > {self._completion:.2f}), WAIT!')
+                    continue
+                order_kwargs = leg.next_order(n)
+                if order_kwargs is not None:
+                    orders.setdefault(key, []).append((leg, order_kwargs))
+
+            if orders:
+                print(f'ENTER {sum(len(legs) for legs in orders.values())} LEG(S)!')
+                self._number_of_slices += 1
+                keys = list(orders)
+                responses = await asyncio.gather(*[self._place(key, orders[key]) for key in keys])
+                for key, venue_responses in zip(keys, responses):
+                    for (leg, _), order in zip(orders[key], venue_responses):
+                        print(order)
+                        if leg.rejected(order):
+                            leg.failed = True
+                            print(f'{leg.symbol} REJECTED, THE LEG STOPS: {order}')
+                            self._notifier.send(self._chat_id, f'<code>Basket {self._name} {" ".join(key[:2])} '
+                                                               f'{leg.symbol} rejected, the leg stops, the others '
+                                                               f'go on: {order}</code>')
+
+            self.notify_progress()
+            return True
+
+        except Exception as e:
+            print(f'CANNOT PLACE THE BASKET ORDERS! ERROR: {e}')
+            self._notifier.send(self._chat_id, '<code>' + str(e) + '</code>')
+            return False
+
+    async def async_run(self):
+        try:
+            for path in self._control_paths:
+                await self.control.start_server(path)
+            self._scheduler = SliceScheduler(60 / self._execution_freq_per_minute, clock=self._clock)
+            await self._scheduler.run(self._run_slice)
+        finally:
+            await self.control.close()
+        print(f'SLICE JITTER: {self._scheduler.jitter_stats()}')
+
+        await asyncio.get_event_loop().run_in_executor(None, self._finish)
+
+    def run(self):
+        asyncio.run(self.async_run())
+
+    def _finish(self):
+        self._notifier.send(self._chat_id,
+                            message='<code>' + f"-------------------------\nBasket Stopped\n-------------------------\n"
+                                    + self._progress_string() + '</code>')
+        # Deliver everything queued before the process may exit, then free the edited message;
+        self._notifier.flush(timeout=60)
+        self._notifier.forget(self._progress_key)
+
+        for leg in self._legs:
+            leg.close()
+        self._close_streams()
+
+    def _close_streams(self):
+        for user_stream in self._user_streams.values():
+            user_stream.close()
+        for market_data in self._market_data.values():
+            market_data.close()
+
+
+def parse_legs(args, exchange, market, account='SUB1'):
+    """
+    Legs from the command line, four words each: pair qty side limit
+
+    Returns
+    -------
+    legs list; as BasketTWAP
+    """
+    if len(args) % 4 != 0:
+        raise Exception('Every leg is [pair] [qty] [side] [limit]!')
+    return [{'exchange': exchange, 'market': market, 'account': account, 'coin': args[i], 'qty': float(args[i + 1]),
+             'side': args[i + 2], 'price_threshold': float(args[i + 3])} for i in range(0, len(args), 4)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='----BASKET TWAP EXECUTION----')
+    parser.add_argument('--args', nargs='+', help='exchange market mins trades/min cont')
+    parser.add_argument('--legs', nargs='+', default=[], help='pair qty side limit, repeated for every leg')
+    parser.add_argument('--basket', default=None,
+                        help='.json list of legs instead of --legs, each with its own exchange/market/account')
+    parser.add_argument('--name', default='BASKET')
+    parser.add_argument('--account', default='SUB1')
+    parser.add_argument('--max-imbalance', type=float, default=MAX_IMBALANCE,
+                        help='share of its qty a leg may run ahead of the basket')
+
+    args = parser.parse_args()
+
+    exchange, market, minutes, freq, cont = args.args
+    if args.basket is not None:
+        with open(args.basket) as f:
+            legs = [dict({'exchange': exchange, 'market': market, 'account': args.account}, **leg)
+                    for leg in json.load(f)]
+    else:
+        legs = parse_legs(args.legs, exchange, market, args.account)
+
+    basket = BasketTWAP(legs, minutes, freq, cont=cont, name=args.name, max_imbalance=args.max_imbalance)
+    basket.run()
+
+    print('DONE!!!!!')
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import os
+import socket
+import tempfile
+
+from twapExecution.exchanges.utils.wsMonitor import all_metrics
+
+"""
+This is a Control Channel, which carries stop/pause/resume/modify commands to running executions;
+
+Every running execution owns a ControlChannel and listens on a unix socket named after its execution key in
+CONTROL_DIR, a basket on one socket per venue of its legs. The Telegram bot receives a command once and pushes it to the matching sockets with
+send_control_command, so checking for a stop inside a slice is a plain attribute read instead of Telegram polling.
+The metrics action is answered on the spot with the WS metrics of the execution's process instead.
+"""
+
+CONTROL_DIR = os.path.join(tempfile.gettempdir(), 'twap_control')
+
+CONTROL_ACTIONS = ('stop', 'pause', 'resume', 'modify', 'metrics')
+
+# Fields /modify may change while an execution runs;
+MODIFIABLE_FIELDS = ('price_threshold', 'qty')
+
+
+def control_socket_path(exchange, market, coin, account, tag):
+    """
+    Socket of one execution; tag keeps executions of the same coin in one engine process apart
+    """
+    return os.path.join(CONTROL_DIR, f'{exchange}_{market}_{coin}_{account}'.upper() + f'_{tag}.sock')
+
+
+class ControlChannel:
+    def __init__(self):
+        self.stop_requested = False
+        self.paused = False
+        self._modifications = []
+        # One server per socket, start_server is called once per execution key;
+        self._servers = []
+        self._paths = []
+
+    def push(self, action, args=None):
+        """
+        Applies a command to the mailbox; the execution picks it up on its next slice
+
+        Parameters
+        ----------
+        action string; one of CONTROL_ACTIONS
+        args list; modify only, [field, value]
+        """
+        if action == 'stop':
+            self.stop_requested = True
+        elif action == 'pause':
+            self.paused = True
+        elif action == 'resume':
+            self.paused = False
+        elif action == 'modify':
+            if not args or len(args) != 2 or args[0] not in MODIFIABLE_FIELDS:
+                raise Exception(f'Usage: modify [{"|".join(MODIFIABLE_FIELDS)}] [value]')
+            self._modifications.append((args[0], float(args[1])))
+        else:
+            raise Exception(f'Unknown control action {action}')
+
+    def pop_modifications(self):
+        modifications, self._modifications = self._modifications, []
+        return modifications
+
+    async def _handle_client(self, reader, writer):
+        try:
+            command = json.loads((await reader.readline()).decode('utf-8'))
+            try:
+                if command['action'] == 'metrics':
+                    response = {'ok': True, 'streams': all_metrics()}
+                else:
+                    self.push(command['action'], command.get('args'))
+                    response = {'ok': True}
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            writer.write((json.dumps(response) + '\n').encode('utf-8'))
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def start_server(self, path):
+        os.makedirs(CONTROL_DIR, exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
+        self._paths.append(path)
+        self._servers.append(await asyncio.start_unix_server(self._handle_client, path=path))
+        print(f'CONTROL CHANNEL LISTENING ON {path}')
+
+    async def close(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        for path in self._paths:
+            if os.path.exists(path):
+                os.remove(path)
+        self._paths = []
+
+
+def send_control_command(exchange, market, action, coin=None, args=None, timeout=5):
+    """
+    Pushes a command to every running execution on exchange/market (and coin, if given)
+
+    Parameters
+    ----------
+    exchange string;
+    market string;
+    action string; one of CONTROL_ACTIONS
+    coin string; None targets every coin
+    args list; modify only, [field, value]
+    timeout float; seconds per execution
+
+    Returns
+    -------
+    responses: dict; socket name -> response of the execution
+    """
+    if action not in CONTROL_ACTIONS:
+        raise Exception(f'Unknown control action {action}')
+    if not os.path.isdir(CONTROL_DIR):
+        return {}
+
+    prefix = f'{exchange}_{market}_'.upper() + (f'{coin}_'.upper() if coin else '')
+    responses = {}
+
+    for name in sorted(os.listdir(CONTROL_DIR)):
+        if not name.startswith(prefix) or not name.endswith('.sock'):
+            continue
+
+        path = os.path.join(CONTROL_DIR, name)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout)
+                sock.connect(path)
+                sock.sendall((json.dumps({'action': action, 'args': args}) + '\n').encode('utf-8'))
+
+                data = b''
+                while not data.endswith(b'\n'):
+                    chunk = sock.recv(4096)
+                    if not chunk:
+                        break
+                    data += chunk
+            responses[name[:-len('.sock')]] = json.loads(data.decode('utf-8'))
+        except ConnectionRefusedError:
+            # Left behind by an execution that died, nobody listens on it anymore;
+            os.remove(path)
+        except OSError as e:
+            responses[name[:-len('.sock')]] = {'ok': False, 'error': str(e)}
+
+    return responses
@@ -0,0 +1,246 @@
+import numpy as np
+
+from twapExecution.exchanges.marketData.volumeProfile import MINUTES_PER_DAY
+
+"""
+This is an Execution Schedule, which says how much of the parent order should be done by the end of every slice;
+
+A schedule turns slice weights into a cumulative target curve when the execution starts. OrderManager sizes each
+slice as the target minus what is executed, so a slice after a missed or partly filled one catches up, capped at
+MAX_CATCH_UP planned slices, and a slice ahead of the curve sends nothing. Without a schedule OrderManager keeps
+the uniform qty / minutes / freq slices.
+
+Subclasses implement _weights(start_time); a schedule that reacts to the market (ImplementationShortfallSchedule,
+POVSchedule) also overrides slice_qty, which gets the current price of every slice.
+"""
+
+# A slice catching up sends at most this many of its planned slice qty;
+MAX_CATCH_UP = 3.
+# Implementation shortfall defaults: risk aversion per bps of cost and temporary impact in bps of trading at the
+# uniform TWAP pace;
+IS_RISK_AVERSION = 0.01
+IS_IMPACT_BPS = 10.
+POV_PARTICIPATION = 0.1
+
+
+class ExecutionSchedule:
+    def __init__(self, execution_minutes, execution_freq_per_minute, max_catch_up=MAX_CATCH_UP):
+        """
+
+        Parameters
+        ----------
+        execution_minutes float;
+        execution_freq_per_minute float;
+        max_catch_up float; cap of a slice in planned slice qty
+        """
+        self._interval = 60 / execution_freq_per_minute
+        self._n_slices = max(int(round(execution_minutes * execution_freq_per_minute)), 1)
+        self._max_catch_up = max_catch_up
+
+        self._targets = None
+        self._start_qty = 0.
+
+    def _weights(self, start_time):
+        """
+        Returns np.array of _n_slices non negative weights, the share of the parent each slice should take
+        """
+        raise NotImplementedError
+
+    def start(self, start_time, executed_qty=0.):
+        """
+        Fixes the target curve, called when the execution starts
+
+        Parameters
+        ----------
+        start_time float; epoch seconds of the first slice
+        executed_qty float; qty done by a previous run (cont), only the rest is scheduled
+        """
+        weights = np.asarray(self._weights(start_time), dtype=np.float64)
+        if weights.sum() <= 0:
+            weights = np.ones(self._n_slices)
+        self._targets = np.cumsum(weights) / weights.sum()
+        self._start_qty = executed_qty
+
+    def target(self, n):
+        """
+        Share of the scheduled qty due by the end of slice n, 1 past the last slice
+        """
+        return 1. if n >= self._n_slices else float(self._targets[n])
+
+    def slice_qty(self, qty, executed_qty, n, price=None):
+        """
+        Qty of slice n, before rounding; 0 when the execution is ahead of the curve
+
+        Parameters
+        ----------
+        qty float; parent qty, may have been modified since the start
+        executed_qty float;
+        n int; slice number
+        price float; current price
+        """
+        scheduled_qty = qty - self._start_qty
+        due = self._start_qty + self.target(n) * scheduled_qty - executed_qty
+        return max(min(due, self._max_catch_up * self._planned(n) * scheduled_qty), 0.)
+
+    def _planned(self, n):
+        """
+        Share of the scheduled qty planned for slice n, the last slice's past the end; at least the uniform share,
+        a slice planned near 0 can still catch up
+        """
+        last = min(n, self._n_slices - 1)
+        return max(self.target(last) - (self.target(last - 1) if last > 0 else 0.), 1. / self._n_slices)
+
+    def curve(self):
+        """
+        Target share after every slice, e.g. to print the plan
+        """
+        return self._targets.copy()
+
+
+class VWAPSchedule(ExecutionSchedule):
+    def __init__(self, profile, execution_minutes, execution_freq_per_minute, max_catch_up=MAX_CATCH_UP):
+        """
+
+        Parameters
+        ----------
+        profile np.array; MINUTES_PER_DAY shares of the daily volume per UTC minute, see volumeProfile
+        """
+        super().__init__(execution_minutes, execution_freq_per_minute, max_catch_up)
+        self._profile = np.asarray(profile, dtype=np.float64)
+
+    def _weights(self, start_time):
+        # Expected volume inside every slice: the cumulative profile at the slice edges, interpolated within a
+        # minute and continued over midnight;
+        cumulative = np.concatenate(([0.], np.cumsum(self._profile)))
+        edges = (start_time % 86400) / 60 + np.arange(self._n_slices + 1) * self._interval / 60
+        day, minute = np.divmod(edges, MINUTES_PER_DAY)
+        volume = day * cumulative[-1] + np.interp(minute, np.arange(MINUTES_PER_DAY + 1), cumulative)
+        return np.diff(volume)
+
+
+def _sinh_ratio(kappa, m, n):
+    """
+    sinh(kappa * m) / sinh(kappa * n) for m <= n without overflow, m may be an array
+    """
+    return np.exp(-kappa * (n - m)) * -np.expm1(-2 * kappa * m) / -np.expm1(-2 * kappa * n)
+
+
+class ImplementationShortfallSchedule(ExecutionSchedule):
+    def __init__(self, volatility_bps, side, execution_minutes, execution_freq_per_minute,
+                 risk_aversion=IS_RISK_AVERSION, impact_bps=IS_IMPACT_BPS, max_catch_up=MAX_CATCH_UP):
+        """
+        Almgren-Chriss trajectory against the arrival price, solved again at every slice for the qty and slices left
+
+        Costs are in bps of the parent notional. Every slice costs impact * v ** 2 for trading a share v of the parent
+        (impact_bps on the notional when v is the uniform 1 / n_slices), risk_aversion * sigma ** 2 * x ** 2 for
+        holding a share x through the slice and drift * x for the adverse drift. Risk aversion front-loads, a drift
+        against the order front-loads more, a drift for it back-loads; 0 risk aversion without drift is the uniform
+        TWAP. The drift is the move since the arrival price spread over the slices done plus the whole horizon, an
+        early move is mostly noise and bends the trajectory little.
+
+        Parameters
+        ----------
+        volatility_bps float; std of 1m returns, see volumeProfile.get_volatility
+        side string; as passed to TWAP, e.g. 'BUY', 'LONG-SELL'
+        risk_aversion float; per bps of cost
+        impact_bps float; temporary impact of trading at the uniform pace
+        """
+        super().__init__(execution_minutes, execution_freq_per_minute, max_catch_up)
+        self._sign = 1 if 'BUY' in side.upper() else -1
+        self._variance = volatility_bps ** 2 * self._interval / 60
+        self._risk_aversion = risk_aversion
+        self._impact = impact_bps * self._n_slices
+        self._arrival_price = None
+
+    def trajectory(self, remaining, n_slices, drift=0.):
+        """
+        Optimal holdings before every slice, x[0] = remaining ... x[n_slices] = 0
+
+        Parameters
+        ----------
+        remaining float; share of the parent still to trade
+        n_slices int; slices left
+        drift float; adverse price drift per slice in bps, negative when the price moves for the order
+        """
+        j = np.arange(n_slices + 1, dtype=np.float64)
+        risk = self._risk_aversion * self._variance
+
+        if risk <= 0:
+            # Impact and drift only: straight line bent by the drift;
+            holdings = remaining * (1 - j / n_slices) + drift / (4 * self._impact) * j * (j - n_slices)
+        else:
+            # x[j+1] - 2 x[j] + x[j-1] = risk / impact * x[j] + drift / (2 impact), around the level the drift
+            # alone would hold;
+            kappa = np.arccosh(1 + risk / (2 * self._impact))
+            level = -drift / (2 * risk)
+            holdings = level + (remaining - level) * _sinh_ratio(kappa, n_slices - j, n_slices) \
+                - level * _sinh_ratio(kappa, j, n_slices)
+
+        # Never buy back what was sold (or the other way round), never hold more than is left;
+        return np.minimum.accumulate(np.clip(holdings, 0, remaining))
+
+    def _weights(self, start_time):
+        return -np.diff(self.trajectory(1., self._n_slices))
+
+    def drift(self, price, n):
+        """
+        Adverse drift per slice in bps since the arrival price
+        """
+        if price is None or self._arrival_price is None:
+            return 0.
+        return self._sign * (price / self._arrival_price - 1) * 1e4 / (n + self._n_slices)
+
+    def slice_qty(self, qty, executed_qty, n, price=None):
+        if self._arrival_price is None:
+            self._arrival_price = price
+
+        if n >= self._n_slices:
+            return super().slice_qty(qty, executed_qty, n, price)
+
+        scheduled_qty = qty - self._start_qty
+        remaining = max(qty - executed_qty, 0.) / scheduled_qty
+        if remaining <= 0:
+            return 0.
+        holdings = self.trajectory(remaining, self._n_slices - n, self.drift(price, n))
+        # The drift may bend the plan made at arrival, not more than max_catch_up times its slice;
+        return min((remaining - holdings[1]) * scheduled_qty, self._max_catch_up * self._planned(n) * scheduled_qty)
+
+
+class POVSchedule(ExecutionSchedule):
+    def __init__(self, volume_counter, execution_minutes, execution_freq_per_minute, participation=POV_PARTICIPATION,
+                 max_catch_up=MAX_CATCH_UP):
+        """
+        Participation of volume: the execution keeps up with participation of the market volume (own fills
+        included) traded since the start, so it follows liquidity instead of the clock and runs until the qty is done
+
+        A slice takes what is owed, at most participation of the volume of the last max_catch_up slice intervals;
+        after a pause or slices too small to send the execution catches up at that pace, it does not dump at once.
+
+        Parameters
+        ----------
+        volume_counter VolumeCounter; trades of the symbol, see priceCache
+        execution_minutes float; only sets the slice count of the curve, POV ends with the qty
+        execution_freq_per_minute float; slice interval
+        participation float; share of the market volume, e.g. 0.1
+        """
+        super().__init__(execution_minutes, execution_freq_per_minute, max_catch_up)
+        self._volume_counter = volume_counter
+        self._participation = participation
+        self._start_volume = None
+
+    def _weights(self, start_time):
+        return np.ones(self._n_slices)
+
+    def start(self, start_time, executed_qty=0.):
+        super().start(start_time, executed_qty)
+        self._start_volume = self._volume_counter.total
+
+    def target(self, n):
+        # No curve to be ahead of, a slice without volume waits for the next one;
+        return 0.
+
+    def slice_qty(self, qty, executed_qty, n, price=None):
+        owed = self._participation * (self._volume_counter.total - self._start_volume) - \
+            (executed_qty - self._start_qty)
+        pace = self._participation * self._volume_counter.recent(self._max_catch_up * self._interval)
+        return max(min(owed, pace, qty - executed_qty), 0.)
@@ -0,0 +1,73 @@
+from datetime import datetime
+
+"""
+This is a Fill Event, which PreprocessMsg turns every fill of a user stream into;
+
+Fields are typed and the time stays epoch milliseconds all the way through routing, averaging and the journal, it is
+only formatted into a string where it leaves the process (format_fill_time, for the database and Telegram).
+"""
+
+FILL_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class FillEvent:
+    __slots__ = ('exchange', 'market', 'symbol', 'price', 'qty', 'side', 'order_id', 'time', 'last',
+                 'client_order_id', 'trade_id', 'trade_ids')
+
+    def __init__(self, exchange, market, symbol, price, qty, side, order_id, time, last, client_order_id=None,
+                 trade_id=None, trade_ids=None):
+        """
+
+        Parameters
+        ----------
+        exchange string;
+        market string;
+        symbol string;
+        price float; None on a bare completion (Coinbase done)
+        qty float; None on a bare completion
+        side string; 'BUY', 'SELL' or OKEx futures 'LONG-BUY' etc.
+        order_id int or string; exchange order id
+        time int; epoch milliseconds of the fill
+        last bool; True when the order is completely filled
+        client_order_id string; echoed back by exchanges that support it, None otherwise
+        trade_id int or string; identifies the fill when it is seen twice (stream and REST recovery): the exchange
+                                trade id, the first trade of the notification on Deribit, the order id on OKEx which
+                                pushes whole orders, None on a bare completion
+        trade_ids list; every trade id the event covers, Deribit notifies the trades of one match together;
+                        defaults to [trade_id]
+        """
+        self.exchange = exchange
+        self.market = market
+        self.symbol = symbol
+        self.price = price
+        self.qty = qty
+        self.side = side
+        self.order_id = order_id
+        self.time = time
+        self.last = last
+        self.client_order_id = client_order_id
+        self.trade_id = trade_id
+        self.trade_ids = trade_ids if trade_ids is not None else [] if trade_id is None else [trade_id]
+
+    def __repr__(self):
+        return 'FillEvent(' + ', '.join(f'{field}={getattr(self, field)!r}' for field in self.__slots__) + ')'
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+def iso_to_ms(timestamp):
+    """
+    '2021-03-29T06:40:00.123Z' (UTC) -> epoch milliseconds
+    """
+    # fromisoformat is several times faster than strptime, it only needs the Z spelled as an offset;
+    return int(datetime.fromisoformat(timestamp[:-1] + '+00:00').timestamp() * 1e3)
+
+
+def format_fill_time(ms):
+    """
+    Epoch milliseconds -> local time string as stored in the journal, None stays None
+    """
+    if ms is None:
+        return None
+    return datetime.fromtimestamp(ms / 1e3).strftime(FILL_TIME_FORMAT)
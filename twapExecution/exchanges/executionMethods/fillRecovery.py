@@ -0,0 +1,142 @@
+import time
+
+from twapExecution.exchanges.executionMethods.fillEvent import FillEvent, iso_to_ms
+from twapExecution.exchanges.executionMethods.preprocessMsg import PreprocessMsg
+
+"""
+This is a Fill Recovery, which asks REST for the fills a user stream may have missed while it was reconnecting;
+
+fetch(symbol, since_ms, seen) returns the FillEvents of symbol at or after since_ms as the stream would have
+delivered them, trade_id included, so the caller can drop the ones the stream did deliver. Deribit groups the trades
+of an order into one event, there the trades seen(symbol, trade_id) are dropped before grouping. OKEx and Deribit
+REST return orders and trades in the stream format and go through the PreprocessMsg normalizers, Binance and
+Coinbase are built here.
+"""
+
+
+class FillRecovery:
+    # (exchange, SPOT or FUTURES) -> fetcher, resolved once in __init__ like PreprocessMsg.NORMALIZERS;
+    FETCHERS = {('BINANCE', 'SPOT'): '_binance',
+                ('BINANCE', 'FUTURES'): '_binance',
+                ('COINBASE', 'SPOT'): '_coinbase',
+                ('OKEX', 'SPOT'): '_okex',
+                ('OKEX', 'FUTURES'): '_okex',
+                ('DERIBIT', 'FUTURES'): '_deribit'}
+
+    def __init__(self, exchange, market, rest_client, preprocessor=None):
+        self._exchange = exchange.upper()
+        self._market = market.upper()
+        self._rest_client = rest_client
+        self._preprocessor = preprocessor or PreprocessMsg(exchange=self._exchange, market=self._market)
+
+        self._market_type = 'SPOT' if 'SPOT' in self._market else 'FUTURES' if 'FUTURES' in self._market else None
+
+        # fetch(symbol, since_ms, seen=None) -> list of FillEvents, oldest first;
+        self.fetch = getattr(self, self.FETCHERS.get((self._exchange, self._market_type), '_nothing'))
+
+    @staticmethod
+    def _nothing(symbol, since_ms, seen=None):
+        return []
+
+    def _fill(self, **kwargs):
+        return FillEvent(exchange=self._exchange, market=self._market, **kwargs)
+
+    def _binance(self, symbol, since_ms, seen=None):
+        # Trades do not carry the client order id nor the order status, the orders of the same window do;
+        orders = {order['orderId']: order for order in self._rest_client.get_all_orders(symbol, startTime=since_ms)}
+        trades = sorted(self._rest_client.get_account_trade_history(symbol, startTime=since_ms),
+                        key=lambda trade: trade['id'])
+
+        last_trade_ids = {}
+        for trade in trades:
+            last_trade_ids[trade['orderId']] = trade['id']
+
+        fills = []
+        for trade in trades:
+            order = orders.get(trade['orderId'])
+            if order is None:
+                # Created before the window, e.g. a resting limit order;
+                order = orders[trade['orderId']] = self._rest_client.get_order_status(symbol, trade['orderId'])
+            if order['clientOrderId'].startswith('web'):
+                continue
+
+            last = order['status'] == 'FILLED' and last_trade_ids[trade['orderId']] == trade['id']
+            if 'side' in trade:
+                side = trade['side']
+            else:  # Spot
+                side = 'BUY' if trade['isBuyer'] else 'SELL'
+
+            fills.append(self._fill(symbol=trade['symbol'],
+                                    price=float(trade['price']),
+                                    qty=float(trade['qty']),
+                                    side=side.upper(),
+                                    order_id=trade['orderId'],
+                                    time=int(trade['time']),
+                                    last=last,
+                                    client_order_id=order['clientOrderId'],
+                                    trade_id=trade['id']))
+        return fills
+
+    def _coinbase(self, symbol, since_ms, seen=None):
+        # Newest first, pages are fetched while iterating;
+        fills = []
+        for fill in self._rest_client.get_fills(product_id=symbol):
+            fill_ms = iso_to_ms(fill['created_at'])
+            if fill_ms < since_ms:
+                break
+            fills.append(self._fill(symbol=fill['product_id'],
+                                    price=float(fill['price']),
+                                    qty=float(fill['size']),
+                                    side=fill['side'].upper(),
+                                    order_id=fill['order_id'],
+                                    time=fill_ms,
+                                    last=False,
+                                    trade_id=fill['trade_id']))
+        fills.reverse()
+
+        # The done message is not in the fills, the last fill of a done order stands in for it;
+        last_fills = {fill.order_id: fill for fill in fills}
+        for order_id, fill in last_fills.items():
+            if self._rest_client.get_order(order_id).get('status') == 'done':
+                fill.last = True
+        return fills
+
+    def _okex(self, symbol, since_ms, seen=None):
+        table = f'{self._market_type.lower()}/order'
+
+        fills = []
+        for order in self._rest_client.get_orders(symbol, '2'):
+            if iso_to_ms(order['timestamp']) < since_ms:
+                continue
+            msg = self._preprocessor.handle_msg({'table': table, 'data': [order]})
+            if msg is not None:
+                fills.append(msg)
+        fills.sort(key=lambda msg: msg.time)
+        return fills
+
+    def _deribit(self, symbol, since_ms, seen=None):
+        """
+        Parameters
+        ----------
+        seen function; (symbol, trade_id) -> True when the stream delivered that trade
+        """
+        trades = self._rest_client.get_user_trades_by_instrument_and_time(symbol, since_ms,
+                                                                          int(time.time() * 1e3))['result']['trades']
+
+        # The stream notifies the trades of one order match together, group them the same way; the trades it did
+        # deliver go first, a group mixing seen and missed trades would be dropped or counted twice as a whole;
+        orders = {}
+        for trade in trades:
+            if seen is not None and seen(symbol, trade['trade_id']):
+                continue
+            orders.setdefault(trade['order_id'], []).append(trade)
+
+        fills = []
+        for order_trades in orders.values():
+            msg = self._preprocessor.handle_msg({'method': 'subscription',
+                                                 'params': {'channel': f'user.trades.{symbol}.raw',
+                                                            'data': order_trades}})
+            if msg is not None:
+                fills.append(msg)
+        fills.sort(key=lambda msg: msg.time)
+        return fills
@@ -2,10 +2,16 @@ import time
 import numpy as np
 import math
 
+from twapExecution.exchanges.utils.symbolRules import min_notional
+
+
+def _decimals(increment):
+    return len(f'{increment:.10f}'.rstrip('0').split('.')[1])
+
 
 class OrderManager:
     def __init__(self, exchange, market, coin, qty, side, execution_minutes, execution_freq_per_minute,
-                 precision):
+                 precision, client_order_prefix=None, symbol_rule=None, schedule=None):
         self._exchange = exchange
         self._market = market
         self._coin = coin
@@ -16,15 +22,48 @@ class OrderManager:
         self._precision = precision
         self._number_of_executions = self._execution_minutes * self._execution_freq_per_minute
 
+        # Lot size / min notional (USD, as current_price) of the symbol, see utils.symbolRules;
+        self._symbol_rule = symbol_rule
+        self._min_notional = min_notional(self._exchange, self._market, symbol_rule)
+
+        # Tags child orders so fills on a shared user stream can be routed back to this parent;
+        self._client_order_prefix = client_order_prefix
+        self._n_client_orders = 0
+
+        # ExecutionSchedule sizing the slices along its curve, None keeps uniform slices;
+        self.schedule = schedule
+
         self.order_sizes = []
 
+    def next_client_order_id(self):
+        if self._client_order_prefix is None:
+            return None
+        self._n_client_orders += 1
+        return f'{self._client_order_prefix}_{self._n_client_orders}'
+
+    def set_qty(self, qty):
+        self._qty = qty
+
     def order_delay(self):
         time.sleep((60 / self._execution_freq_per_minute))
 
-    def set_order_size(self, executed_qty, current_price):
+    def _slice_size(self, executed_qty, current_price, n):
+        if self.schedule is None or n is None:
+            return (self._qty / self._execution_minutes) / self._execution_freq_per_minute
+        return self.schedule.slice_qty(self._qty, executed_qty, n, current_price)
+
+    def set_order_size(self, executed_qty, current_price, n=None):
+        """
+
+        Parameters
+        ----------
+        executed_qty float;
+        current_price float; for the min notional of the remaining qty and the schedule
+        n int; slice number, the schedule sizes slice n from its curve; uniform slices without schedule or n
+        """
         if self._exchange == 'BINANCE':
             print('COMPUTING BINANCE ORDER SIZE')
-            self.order_size = (self._qty / self._execution_minutes) / self._execution_freq_per_minute
+            self.order_size = self._slice_size(executed_qty, current_price, n)
             self.order_size = round(np.random.uniform(self.order_size * 0.9, self.order_size * 1.1), self._precision)
             print('order size:', self.order_size)
 
@@ -33,9 +72,7 @@ class OrderManager:
             if self._market == 'SPOT' or self._market == 'USDT-FUTURES':
                 remaining_qty = self._qty - qty_after
 
-                threshold = 10 if 'SPOT' in self._market else 5
-
-                if remaining_qty * current_price < threshold:
+                if remaining_qty * current_price < self._min_notional:
                     print(f'REMAINING: {remaining_qty}, Too little, executed all!')
                     self.order_size = round(self._qty - executed_qty, self._precision)
             else:
@@ -43,20 +80,18 @@ class OrderManager:
                     self.order_size = round(self._qty - executed_qty, self._precision)
 
         elif self._exchange == 'COINBASE':
-            self.order_size = (self._qty / self._execution_minutes) / self._execution_freq_per_minute
+            self.order_size = self._slice_size(executed_qty, current_price, n)
             self.order_size = round(np.random.uniform(self.order_size * 0.9, self.order_size * 1.1), self._precision)
 
             qty_after = executed_qty + self.order_size
             remaining_qty = self._qty - qty_after
 
-            threshold = 10
-
-            if remaining_qty * current_price < threshold:
+            if remaining_qty * current_price < self._min_notional:
                 print(f'REMAINING: {remaining_qty}, Too little, executed all!')
                 self.order_size = round(self._qty - executed_qty, self._precision)
 
         elif self._exchange == 'DERIBIT':
-            self.order_size = (self._qty / self._execution_minutes) / self._execution_freq_per_minute
+            self.order_size = self._slice_size(executed_qty, current_price, n)
             # multiple of 10
             self.order_size = self.order_size - self.order_size % 10
 
@@ -66,7 +101,7 @@ class OrderManager:
                 self.order_size = round(self._qty - executed_qty, self._precision)
 
         elif self._exchange == 'OKEX':
-            self.order_size = (self._qty / self._execution_minutes) / self._execution_freq_per_minute
+            self.order_size = self._slice_size(executed_qty, current_price, n)
             self.order_size = round(np.random.uniform(self.order_size * 0.9, self.order_size * 1.1), self._precision)
             print(f'ORDER SIZE: {self.order_size}')
 
@@ -75,9 +110,7 @@ class OrderManager:
             if self._market == 'SPOT':
                 remaining_qty = self._qty - qty_after
 
-                threshold = 10
-
-                if remaining_qty * current_price < threshold:
+                if remaining_qty * current_price < self._min_notional:
                     print(f'REMAINING: {remaining_qty}, Too little, executed all!')
                     self.order_size = round(self._qty - executed_qty, self._precision)
                     print(f'NEW ORDER SIZE: {self.order_size}')
@@ -87,22 +120,46 @@ class OrderManager:
                     # self.order_size = math.floor((self._qty - executed_qty) * 1e8) / 1e8
                     self.order_size = round(self._qty - executed_qty, self._precision)
 
-    def market_order_kwargs(self):
+        # A schedule keeps what it did not send as owed, a slice below the min notional waits for the next ones;
+        if self.schedule is not None and self._min_notional and \
+                0 < self.order_size * current_price < self._min_notional and \
+                self.order_size < round(self._qty - executed_qty, self._precision):
+            print(f'ORDER SIZE {self.order_size} BELOW MIN NOTIONAL {self._min_notional}, WAIT!')
+            self.order_size = 0
+
+    def cap_order_size(self, max_qty):
+        """
+        Lowers order_size to max_qty rounded down to the precision, returns True if it did
+        """
+        max_qty = math.floor(max_qty * 10 ** self._precision) / 10 ** self._precision
+        if self.order_size <= max_qty:
+            return False
+        self.order_size = max_qty
+        return True
+
+    def market_order_kwargs(self, quantity=None):
+        """
+        Market order of quantity, the current order_size if None
+        """
+        quantity = self.order_size if quantity is None else quantity
+
         if self._exchange == 'BINANCE':
             if 'SPOT' in self._market:
                 order_kwargs = {
                     'symbol': self._coin,
                     'side': self._side,
-                    'quantity': self.order_size,
-                    'positionSide': None
+                    'quantity': quantity,
+                    'positionSide': None,
+                    'newClientOrderId': self.next_client_order_id()
                 }
             elif 'FUTURES' in self._market:
                 position_side, side = self._side.split('-')
                 order_kwargs = {
                     'symbol': self._coin,
                     'side': side,
-                    'quantity': self.order_size,
-                    'positionSide': position_side
+                    'quantity': quantity,
+                    'positionSide': position_side,
+                    'newClientOrderId': self.next_client_order_id()
                 }
             return order_kwargs
 
@@ -111,24 +168,74 @@ class OrderManager:
                 return {
                     'product_id': self._coin,
                     'side': self._side.lower(),
-                    'size': self.order_size
+                    'size': quantity
                 }
         elif self._exchange == 'DERIBIT':
             if self._market == 'FUTURES':
                 return {
                     'instrument_name': self._coin,
                     'side': self._side.lower(),
-                    'amount': self.order_size
+                    'amount': quantity
                 }
         elif self._exchange == 'OKEX':
             return {
                 'symbol': self._coin,
                 'side': self._side.lower(),
-                'quantity': self.order_size
+                'quantity': quantity
+            }
+
+    def limit_order_kwargs(self, price, quantity):
+        """
+        Post only limit order of quantity at price, for the venues PassiveSlice works on
+        """
+        if self._exchange == 'BINANCE':
+            if 'SPOT' in self._market:
+                position_side, side = None, self._side
+                # Spot has no GTX, a LIMIT_MAKER order that would take is rejected instead;
+                order_type, time_in_force = 'LIMIT_MAKER', None
+            else:
+                position_side, side = self._side.split('-')
+                order_type, time_in_force = 'LIMIT', 'GTX'
+            return {
+                'symbol': self._coin,
+                'side': side,
+                'price': price,
+                'quantity': quantity,
+                'positionSide': position_side,
+                'timeInForce': time_in_force,
+                'orderType': order_type,
+                'newClientOrderId': self.next_client_order_id()
+            }
+
+        elif self._exchange == 'COINBASE':
+            return {
+                'product_id': self._coin,
+                'side': self._side.lower(),
+                'price': price,
+                'size': quantity,
+                'post_only': True
             }
 
-    def limit_order_kwargs(self):
-        pass
+    def passive_price(self, bid, ask, tick_size, inside=True):
+        """
+        Price at the touch of our side, one tick inside it when the spread leaves room without crossing
+
+        Parameters
+        ----------
+        bid float; best bid
+        ask float; best ask
+        tick_size float; price increment of the symbol
+        inside bool; improve the touch by one tick when the spread is wider than one tick
+        """
+        # Round to the tick grid first, float prices are one ulp off it;
+        bid_ticks, ask_ticks = round(bid / tick_size), round(ask / tick_size)
+        room = inside and ask_ticks - bid_ticks > 1
+
+        if 'BUY' in self._side:
+            ticks = bid_ticks + 1 if room else bid_ticks
+        else:
+            ticks = ask_ticks - 1 if room else ask_ticks
+        return round(ticks * tick_size, _decimals(tick_size))
 
     def error_or_not(self, order):
         error = False
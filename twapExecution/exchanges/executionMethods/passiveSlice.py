@@ -0,0 +1,179 @@
+import asyncio
+
+"""
+This is a Passive Slice, which works the qty of one TWAP slice with a post only limit order instead of a market order;
+
+The order rests at the touch of our side, one tick inside when the spread leaves room (OrderManager.passive_price),
+and is cancelled and posted again at the new price whenever the top of book in the PriceCache moves. When the slice
+time is up the order is cancelled; the qty that did not fill is swept with a market order if sweep is set, otherwise
+it is left to the next slices. Fills reach on_fill from the user stream, the cancel response is what counts for the
+sweep, it also covers fills still on their way.
+
+Only venues with limit and cancel REST calls are supported (PLACERS), the TWAP keeps market orders elsewhere.
+"""
+
+# Seconds between two looks at the book, also the shortest life of an order;
+REPRICE_INTERVAL = 0.5
+
+# Binance error code -> part of the message, of a post only order that would have taken: futures GTX is rejected with
+# -5022, spot LIMIT_MAKER with -2010, which also covers any other rejected new order (e.g. insufficient balance);
+POST_ONLY_REJECTED = {-5022: '', -2010: 'immediately match'}
+
+
+class PassiveSlice:
+    # exchange -> (place, cancel), resolved once in __init__;
+    PLACERS = {'BINANCE': ('_binance_place', '_binance_cancel'),
+               'COINBASE': ('_coinbase_place', '_coinbase_cancel')}
+
+    def __init__(self, exchange, market, symbol, rest_client, order_manager, market_data, tick_size, precision,
+                 inside=True, sweep=True, reprice_interval=REPRICE_INTERVAL, book_max_age=5.0, clock=None):
+        """
+
+        Parameters
+        ----------
+        exchange string;
+        market string;
+        symbol string; exchange symbol the orders are placed on, its book has to be subscribed in market_data
+        rest_client; the user stream's rest client
+        order_manager OrderManager; builds the order kwargs and the passive price
+        market_data MarketDataFeed; its cache gives the top of book
+        tick_size float; price increment of the symbol
+        precision int; qty decimals
+        inside bool; post one tick inside the touch when the spread leaves room
+        sweep bool; market order for what did not fill when the slice time is up
+        reprice_interval float; seconds
+        book_max_age float; seconds, an older book is not posted on
+        clock; time() and async sleep(delay), the event loop clock if None
+        """
+        if exchange not in self.PLACERS:
+            raise Exception(f'No passive execution on {exchange}.')
+
+        self._exchange = exchange
+        self._market = market
+        self._symbol = symbol
+        self._rest_client = rest_client
+        self._order_manager = order_manager
+        self._market_data = market_data
+        self._tick_size = tick_size
+        self._precision = precision
+        self._inside = inside
+        self._sweep = sweep
+        self._reprice_interval = reprice_interval
+        self._book_max_age = book_max_age
+        self._clock = clock
+
+        place, cancel = self.PLACERS[exchange]
+        self._place = getattr(self, place)
+        self._cancel = getattr(self, cancel)
+
+        # order id of the live order -> qty filled so far, written by on_fill from the WS thread;
+        self._filled = {}
+
+    def on_fill(self, msg):
+        if msg.order_id in self._filled:
+            self._filled[msg.order_id] += msg.qty
+
+    def _binance_place(self, price, qty):
+        order = self._rest_client.post_new_limit_order(**self._order_manager.limit_order_kwargs(price, qty))
+        # A post only order that would have taken liquidity is rejected (older futures responses expire it), the book
+        # moved under us;
+        if order.get('code') in POST_ONLY_REJECTED and POST_ONLY_REJECTED[order['code']] in order.get('msg', '') \
+                or order.get('status') == 'EXPIRED':
+            return None
+        if self._order_manager.error_or_not(order):
+            raise Exception(order)
+        return order['orderId']
+
+    def _binance_cancel(self, order_id):
+        response = self._rest_client.delete_a_open_order(self._symbol, order_id)
+        if 'code' in response:
+            # Filled before the cancel got there;
+            response = self._rest_client.get_order_status(self._symbol, order_id)
+        return float(response['executedQty'])
+
+    def _coinbase_place(self, price, qty):
+        order = self._rest_client.place_limit_order(**self._order_manager.limit_order_kwargs(price, qty))
+        if self._order_manager.error_or_not(order):
+            raise Exception(order)
+        # post_only would have taken liquidity;
+        if order.get('status') == 'rejected':
+            return None
+        return order['id']
+
+    def _coinbase_cancel(self, order_id):
+        self._rest_client.cancel_order(order_id)
+        # Cancelled orders without a match are purged, the 404 says NotFound;
+        return float(self._rest_client.get_order(order_id).get('filled_size', 0))
+
+    def _target_price(self):
+        if self._market_data.stale_reason() is not None:
+            return None
+        # The book of the traded symbol, not the TWAP's USD price name: ETHBTC is posted at ETHBTC prices;
+        book = self._market_data.cache.get_top_of_book(self._symbol, max_age=self._book_max_age)
+        if book is None or book[0] is None or book[1] is None:
+            return None
+        return self._order_manager.passive_price(book[0], book[1], self._tick_size, self._inside)
+
+    async def run(self, qty, duration):
+        """
+        Works qty passively for duration seconds, then cancels and sweeps
+
+        Parameters
+        ----------
+        qty float; slice qty
+        duration float; seconds the order may rest
+
+        Returns
+        -------
+        result: dict; passive_qty filled by limit orders, swept_qty sent as market order, orders posted
+        """
+        loop = asyncio.get_event_loop()
+        now = self._clock.time if self._clock is not None else loop.time
+        sleep = self._clock.sleep if self._clock is not None else asyncio.sleep
+
+        deadline = now() + duration
+        passive_qty = 0.
+        orders = 0
+        order_id, order_price = None, None
+
+        try:
+            while passive_qty < qty and now() < deadline:
+                price = self._target_price()
+
+                if order_id is not None:
+                    done = self._filled[order_id] >= order_qty
+                    if done or price != order_price:
+                        # Book moved (or no trusted book any more), never rest on a price the market left;
+                        executed = order_qty if done else \
+                            await loop.run_in_executor(None, self._cancel, order_id)
+                        passive_qty += executed
+                        del self._filled[order_id]
+                        order_id = None
+                        continue
+
+                elif price is not None:
+                    order_qty = round(qty - passive_qty, self._precision)
+                    order_id = await loop.run_in_executor(None, self._place, price, order_qty)
+                    if order_id is not None:
+                        self._filled[order_id] = 0.
+                        order_price = price
+                        orders += 1
+
+                await sleep(min(self._reprice_interval, max(deadline - now(), 0)))
+        finally:
+            if order_id is not None:
+                passive_qty += await loop.run_in_executor(None, self._cancel, order_id)
+                del self._filled[order_id]
+
+        swept_qty = 0.
+        remaining = round(qty - passive_qty, self._precision)
+        if self._sweep and remaining > 0:
+            order_kwargs = self._order_manager.market_order_kwargs(remaining)
+            order = await loop.run_in_executor(None, lambda: self._rest_client.place_market_order(**order_kwargs))
+            if self._order_manager.error_or_not(order):
+                print(f'CANNOT SWEEP {remaining}: {order}')
+            else:
+                swept_qty = remaining
+
+        print(f'PASSIVE SLICE: {passive_qty} PASSIVE IN {orders} ORDER(S), {swept_qty} SWEPT')
+        return {'passive_qty': passive_qty, 'swept_qty': swept_qty, 'orders': orders}
@@ -1,7 +1,24 @@
-from datetime import datetime
+import logging
+
+from twapExecution.exchanges.executionMethods.fillEvent import FillEvent, iso_to_ms
+
+logger = logging.getLogger(__name__)
+
+# Binance futures user stream events that can carry a fill, the rest (ACCOUNT_UPDATE, MARGIN_CALL, ...) are dropped;
+BINANCE_FUTURES_FILL_EVENTS = ('ORDER_TRADE_UPDATE',)
+
+FILL_STATES = ('FILLED', 'PARTIALLY_FILLED')
 
 
 class PreprocessMsg:
+    # (exchange, SPOT or FUTURES) -> normalizer, resolved once in __init__;
+    NORMALIZERS = {('BINANCE', 'SPOT'): '_binance_spot',
+                   ('BINANCE', 'FUTURES'): '_binance_futures',
+                   ('COINBASE', 'SPOT'): '_coinbase_spot',
+                   ('OKEX', 'SPOT'): '_okex_spot',
+                   ('OKEX', 'FUTURES'): '_okex_futures',
+                   ('DERIBIT', 'FUTURES'): '_deribit_futures'}
+
     def __init__(self, exchange, market):
         self._exchange = exchange.upper()
         self._market = market.upper()
@@ -11,135 +28,152 @@ class PreprocessMsg:
                                     '3': 'long-sell',
                                     '4': 'short-buy'}
 
-    def handle_msg(self, message):
-        if self._exchange == 'BINANCE':
-            return self.binance(message)
-        elif self._exchange == 'COINBASE':
-            return self.coinbase(message)
-        elif self._exchange == 'DERIBIT':
-            return self.deribit(message)
-        elif self._exchange == 'OKEX':
-            return self.okex(message)
-
-    def _construct_new_msg(self, symbol, price, qty, side, order_id, time, last):
-        return dict(exchange=self._exchange,
-                    market=self._market,
-                    symbol=symbol,
-                    price=price,
-                    qty=qty,
-                    side=side,
-                    order_id=order_id,
-                    time=time,
-                    last=last)
-
-    def binance(self, message):
-        if 'SPOT' in self._market:
-            if message['e'] == 'executionReport':
-                if not message['c'].startswith('web'):
-                    if message['X'] == 'FILLED' or message['X'] == 'PARTIALLY_FILLED':
-                        return self._construct_new_msg(symbol=message['s'].upper(),
-                                                       price=float(message['L']),
-                                                       qty=float(message['l']),
-                                                       side=message['S'].upper(),
-                                                       order_id=message['i'],
-                                                       time=datetime.fromtimestamp(int(message['T']) / 1e3).strftime(
-                                                           '%Y-%m-%d %H:%M:%S'),
-                                                       last=True if message['X'] == 'FILLED' else False)
-
-        elif 'FUTURES' in self._market:
-            print(message)
-            if not message['o']['c'].startswith('web'):
-                if message['o']['X'] == 'FILLED' or message['o']['X'] == 'PARTIALLY_FILLED':
-                    return self._construct_new_msg(symbol=message['o']['s'].upper(),
-                                                   price=float(message['o']['L']),
-                                                   qty=float(message['o']['l']),
-                                                   side=message['o']['S'].upper(),
-                                                   order_id=message['o']['i'],
-                                                   time=datetime.fromtimestamp(int(message['T']) / 1e3).strftime(
-                                                       '%Y-%m-%d %H:%M:%S'),
-                                                   last=True if message['o']['X'] == 'FILLED' else False
-                                                   )
-
-    def coinbase(self, message):
-        if 'SPOT' in self._market:
-            if 'type' in message:
-                print(message)
-                if message['type'] == 'match':
-                    msg = self._construct_new_msg(symbol=message['product_id'],
-                                                  price=float(message['price']),
-                                                  qty=float(message['size']),
-                                                  side='BUY' if message['side'].upper() == 'SELL' else 'SELL',
-                                                  order_id=message['taker_order_id'],
-                                                  time=datetime.strptime(message['time'],
-                                                                         "%Y-%m-%dT%H:%M:%S.%fZ").strftime(
-                                                      '%Y-%m-%d %H:%M:%S'),
-                                                  last=False)
-                    print(msg)
-                    return msg
-                elif message['type'] == 'done':
-                    if float(message['remaining_size']) == 0:
-                        msg = self._construct_new_msg(symbol=None,
-                                                      price=None,
-                                                      qty=None,
-                                                      side=None,
-                                                      order_id=None,
-                                                      time=None,
-                                                      last=True)
-                        print(msg)
-                        return msg
-
-    def okex(self, message):
-        if 'SPOT' in self._market:
-            if 'data' in message:
-                data = message['data'][0]
-                if data['state'] == '2':
-                    return self._construct_new_msg(symbol=data['instrument_id'],
-                                                   price=float(data['filled_notional']) / float(
-                                                       data['filled_size']),
-                                                   qty=float(data['filled_size']),
-                                                   side=data['side'].upper(),
-                                                   order_id=data['order_id'],
-                                                   time=datetime.strptime(data['timestamp'],
-                                                                          "%Y-%m-%dT%H:%M:%S.%fZ").strftime(
-                                                       '%Y-%m-%d %H:%M:%S'),
-                                                   last=True)
-
-        elif 'FUTURES' in self._market:
-            if 'data' in message:
-                data = message['data'][0]
-                if data['state'] == '2':
-                    return self._construct_new_msg(symbol=data['instrument_id'],
-                                                   price=float(data['price_avg']),
-                                                   qty=float(data['filled_qty']),
-                                                   side=self.okex_futures_params[data['type']].upper(),
-                                                   order_id=data['order_id'],
-                                                   time=datetime.strptime(data['timestamp'],
-                                                                          "%Y-%m-%dT%H:%M:%S.%fZ").strftime(
-                                                       '%Y-%m-%d %H:%M:%S'),
-                                                   last=True)
-
-    def deribit(self, message):
-        print(message)
-        m = {}
-        if 'FUTURES' in self._market:
-            if message.get('method') == 'subscription':
-                for i, msg in enumerate(message['params']['data']):
-                    if msg['state'] == 'filled':
-                        if not m:
-                            m = self._construct_new_msg(symbol=msg['instrument_name'],
-                                                        price=float(msg['price']),
-                                                        qty=float(msg['amount']),
-                                                        side=msg['direction'].upper(),
-                                                        order_id=msg['order_id'],
-                                                        time=datetime.fromtimestamp(msg['timestamp'] / 1e3).strftime(
-                                                            '%Y-%m-%d %H:%M:%S'),
-                                                        last=True)
-                            # TODO: Limit order needs to redo last=True;
-                        else:
-                            original_price = m['price']
-                            original_qty = m['qty']
-
-                            m['qty'] = original_qty + float(msg['amount'])
-                            m['price'] = ((original_price * original_qty) + (float(msg['amount'])*float(msg['price'])))/m['qty']
-
-                return m
+        market_type = 'SPOT' if 'SPOT' in self._market else 'FUTURES' if 'FUTURES' in self._market else None
+
+        # handle_msg(message) -> FillEvent or None, no exchange/market branching per message;
+        self.handle_msg = getattr(self, self.NORMALIZERS.get((self._exchange, market_type), '_ignore'))
+
+    def _construct_new_msg(self, symbol, price, qty, side, order_id, time, last, client_order_id=None,
+                           trade_id=None):
+        return FillEvent(exchange=self._exchange,
+                         market=self._market,
+                         symbol=symbol,
+                         price=price,
+                         qty=qty,
+                         side=side,
+                         order_id=order_id,
+                         time=time,
+                         last=last,
+                         client_order_id=client_order_id,
+                         trade_id=trade_id)
+
+    @staticmethod
+    def _ignore(message):
+        return None
+
+    def _binance_spot(self, message):
+        if message.get('e') != 'executionReport' or message['X'] not in FILL_STATES or message['c'].startswith('web'):
+            return None
+
+        return self._construct_new_msg(symbol=message['s'].upper(),
+                                       price=float(message['L']),
+                                       qty=float(message['l']),
+                                       side=message['S'].upper(),
+                                       order_id=message['i'],
+                                       time=int(message['T']),
+                                       last=message['X'] == 'FILLED',
+                                       client_order_id=message['c'],
+                                       trade_id=message['t'])
+
+    def _binance_futures(self, message):
+        if message.get('e') not in BINANCE_FUTURES_FILL_EVENTS:
+            return None
+
+        logger.debug('%s', message)
+        order = message['o']
+        if order['X'] not in FILL_STATES or order['c'].startswith('web'):
+            return None
+
+        return self._construct_new_msg(symbol=order['s'].upper(),
+                                       price=float(order['L']),
+                                       qty=float(order['l']),
+                                       side=order['S'].upper(),
+                                       order_id=order['i'],
+                                       time=int(message['T']),
+                                       last=order['X'] == 'FILLED',
+                                       client_order_id=order['c'],
+                                       trade_id=order['t'])
+
+    def _coinbase_spot(self, message):
+        message_type = message.get('type')
+        if message_type != 'match' and message_type != 'done':
+            return None
+
+        logger.debug('%s', message)
+        if message_type == 'match':
+            # side is the maker's, authenticated matches name our profile on the side we were on;
+            maker = 'maker_profile_id' in message
+            msg = self._construct_new_msg(symbol=message['product_id'],
+                                          price=float(message['price']),
+                                          qty=float(message['size']),
+                                          side=message['side'].upper() if maker else
+                                          'BUY' if message['side'].upper() == 'SELL' else 'SELL',
+                                          order_id=message['maker_order_id'] if maker else message['taker_order_id'],
+                                          time=iso_to_ms(message['time']),
+                                          last=False,
+                                          trade_id=message['trade_id'])
+        elif float(message['remaining_size']) == 0:
+            msg = self._construct_new_msg(symbol=message['product_id'],
+                                          price=None,
+                                          qty=None,
+                                          side=None,
+                                          order_id=None,
+                                          time=None,
+                                          last=True)
+        else:
+            return None
+
+        logger.debug('%s', msg)
+        return msg
+
+    def _okex_spot(self, message):
+        if 'data' not in message:
+            return None
+
+        data = message['data'][0]
+        if data['state'] != '2':
+            return None
+
+        return self._construct_new_msg(symbol=data['instrument_id'],
+                                       price=float(data['filled_notional']) / float(data['filled_size']),
+                                       qty=float(data['filled_size']),
+                                       side=data['side'].upper(),
+                                       order_id=data['order_id'],
+                                       time=iso_to_ms(data['timestamp']),
+                                       last=True,
+                                       trade_id=data['order_id'])
+
+    def _okex_futures(self, message):
+        if 'data' not in message:
+            return None
+
+        data = message['data'][0]
+        if data['state'] != '2':
+            return None
+
+        return self._construct_new_msg(symbol=data['instrument_id'],
+                                       price=float(data['price_avg']),
+                                       qty=float(data['filled_qty']),
+                                       side=self.okex_futures_params[data['type']].upper(),
+                                       order_id=data['order_id'],
+                                       time=iso_to_ms(data['timestamp']),
+                                       last=True,
+                                       trade_id=data['order_id'])
+
+    def _deribit_futures(self, message):
+        if message.get('method') != 'subscription' or not message['params']['channel'].startswith('user.trades'):
+            return None
+
+        logger.debug('%s', message)
+        m = None
+        for msg in message['params']['data']:
+            if msg['state'] == 'filled':
+                if m is None:
+                    m = self._construct_new_msg(symbol=msg['instrument_name'],
+                                                price=float(msg['price']),
+                                                qty=float(msg['amount']),
+                                                side=msg['direction'].upper(),
+                                                order_id=msg['order_id'],
+                                                time=int(msg['timestamp']),
+                                                last=True,
+                                                trade_id=msg['trade_id'])
+                    # TODO: Limit order needs to redo last=True;
+                else:
+                    original_price = m.price
+                    original_qty = m.qty
+
+                    m.qty = original_qty + float(msg['amount'])
+                    m.price = ((original_price * original_qty) + (float(msg['amount'])*float(msg['price'])))/m.qty
+                    m.trade_ids.append(msg['trade_id'])
+
+        return m
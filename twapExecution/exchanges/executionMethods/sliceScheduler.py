@@ -0,0 +1,62 @@
+import asyncio
+import math
+
+import numpy as np
+
+
+class SliceScheduler:
+    """
+    Fires slices on a fixed grid of the event loop's monotonic clock: slice n is due at start + n * interval,
+    no matter how long the previous slices took. A slice that overruns whole intervals skips the missed grid
+    points instead of firing them back to back.
+
+    The scheduled-vs-actual lag of every slice is kept in self.jitters (seconds).
+
+    A clock with time() and an async sleep(delay) can replace the loop clock, e.g. the simulated clock of a backtest.
+    """
+
+    def __init__(self, interval, clock=None):
+        self._interval = float(interval)
+        self._clock = clock
+        self.jitters = []
+
+    async def run(self, slice_fn):
+        """
+        Parameters
+        ----------
+        slice_fn: coroutine function; slice_fn(n, jitter) -> bool, returns False to stop the schedule
+        """
+        now = self._clock.time if self._clock is not None else asyncio.get_event_loop().time
+        sleep = self._clock.sleep if self._clock is not None else asyncio.sleep
+        start = now()
+        n = 0
+
+        while True:
+            scheduled = start + n * self._interval
+            delay = scheduled - now()
+            if delay > 0:
+                await sleep(delay)
+
+            jitter = now() - scheduled
+            self.jitters.append(jitter)
+            print(f'SLICE {n} JITTER {jitter * 1e3:.2f}ms')
+
+            if not await slice_fn(n, jitter):
+                break
+
+            n = max(n + 1, math.ceil((now() - start) / self._interval))
+
+    def jitter_stats(self):
+        """
+        Returns
+        -------
+        stats: dict; number of slices and p50/p99/max jitter in milliseconds
+        """
+        if not self.jitters:
+            return {'slices': 0, 'p50_ms': None, 'p99_ms': None, 'max_ms': None}
+
+        jitters = np.array(self.jitters) * 1e3
+        return {'slices': len(jitters),
+                'p50_ms': float(np.percentile(jitters, 50)),
+                'p99_ms': float(np.percentile(jitters, 99)),
+                'max_ms': float(jitters.max())}
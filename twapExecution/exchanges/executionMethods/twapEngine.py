@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+from twapExecution.exchanges.executionMethods.baseTWAP import DEPTH_SHARE, TWAP
+from twapExecution.exchanges.executionMethods.executionSchedule import IS_RISK_AVERSION, POV_PARTICIPATION
+from twapExecution.exchanges.executionMethods.userStreamMultiplexer import UserStreamMultiplexer
+from twapExecution.exchanges.marketData.localOrderBook import OrderBookFeed
+from twapExecution.exchanges.marketData.priceCache import MarketDataFeed
+from twapExecution.exchanges.utils.wsMonitor import all_metrics
+
+"""
+This is a TWAP Engine, which hosts many TWAP parent orders in one asyncio process;
+
+Parent orders on the same exchange/market/account share one UserStreamMultiplexer (so one user stream and one REST
+client), orders read prices and trade volumes from one public MarketDataFeed per exchange/market, each with its own
+PriceCache so the same symbol on two markets does not mix and every volume counter has one writer; the multiplexer routes fills back to their parent by client order id, or by symbol on venues that do not echo one.
+"""
+
+ENGINE_SOCKET = os.path.join(os.getcwd(), 'TWAP_ENGINE.sock')
+
+
+def send_engine_command(command, socket_path=ENGINE_SOCKET, timeout=30):
+    """
+    Sends one command to a running engine and returns its reply
+
+    Parameters
+    ----------
+    command: dict; e.g. {'cmd': 'start', 'args': ['binance', 'spot', 'btc-usd', ...], 'passive': False,
+                         'schedule': 'IS', 'risk_aversion': 1e-4, 'depth_bps': 10}
+    socket_path: string; engine unix socket
+    timeout: float; seconds
+
+    Returns
+    -------
+    response: dict;
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(command) + '\n').encode('utf-8'))
+
+        data = b''
+        while not data.endswith(b'\n'):
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+
+    return json.loads(data.decode('utf-8'))
+
+
+class TWAPEngine:
+    def __init__(self, socket_path=ENGINE_SOCKET, max_orders=64):
+        self._socket_path = socket_path
+        # Parent orders running or being started at once, a start beyond is refused;
+        self._max_orders = max_orders
+        self._starting = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_orders)
+
+        self._user_streams = {}
+        self._users = {}
+        # (exchange, market, account, coin) of the running orders routed by symbol, one at a time each;
+        self._symbol_orders = set()
+
+        self._market_data = {}
+        self._order_books = {}
+
+        self._orders = {}
+        self._next_order_id = 0
+
+    def _acquire_user_stream(self, key):
+        if key not in self._user_streams:
+            self._user_streams[key] = UserStreamMultiplexer(*key)
+            self._users[key] = 0
+
+        self._users[key] += 1
+        return self._user_streams[key]
+
+    def _get_market_data(self, exchange, market, account):
+        key = (exchange, market, account) if exchange == 'DERIBIT' else (exchange, market)
+        if key not in self._market_data:
+            self._market_data[key] = MarketDataFeed(exchange, market, account)
+        return self._market_data[key]
+
+    def _get_order_book(self, exchange, market):
+        key = (exchange, market)
+        if key not in self._order_books:
+            self._order_books[key] = OrderBookFeed(exchange, market)
+        return self._order_books[key]
+
+    async def _release_user_stream(self, key):
+        self._users[key] -= 1
+        if self._users[key] > 0:
+            return
+
+        user_stream = self._user_streams.pop(key)
+        del self._users[key]
+        # close() runs its own event loop, keep it off the engine loop;
+        await asyncio.get_event_loop().run_in_executor(self._executor, user_stream.close)
+
+    async def add_order(self, args, passive=False, schedule=None, risk_aversion=IS_RISK_AVERSION,
+                        participation=POV_PARTICIPATION, depth_bps=None, depth_share=DEPTH_SHARE):
+        """
+        Starts a parent order with the same arguments as the baseTWAP command line
+
+        Parameters
+        ----------
+        args: list; exchange, market, coin, qty, price_threshold, side, minutes, freq, cont, [leverage], [account]
+        passive: bool; post only limit orders at the touch, as baseTWAP --passive
+        schedule: string; 'TWAP', 'VWAP', 'IS' or 'POV', as baseTWAP --schedule
+        risk_aversion: float; IS only, as baseTWAP --risk-aversion
+        participation: float; POV only, as baseTWAP --participation
+        depth_bps: float; cap slices by the depth within depth_bps, as baseTWAP --depth-bps
+        depth_share: float; as baseTWAP --depth-share
+
+        Returns
+        -------
+        order_id: int;
+        """
+        exchange, market, coin = args[0].upper(), args[1].upper(), args[2].upper()
+        account = args[10].upper() if len(args) > 10 else 'SUB1'
+
+        # Temp solve 'USDT' problem, same as the stand alone script;
+        if 'USDT' in coin:
+            raise Exception(f'Cannot run TWAP on {coin}.')
+
+        key = (exchange, market, account)
+        symbol_order = (exchange, market, account, coin)
+        if symbol_order in self._symbol_orders:
+            raise Exception(f'{exchange} {market} {coin} is already running, fills could not be told apart.')
+        if len(self._orders) + self._starting >= self._max_orders:
+            raise Exception(f'{self._max_orders} orders are already running, stop one first.')
+
+        self._next_order_id += 1
+        order_id = self._next_order_id
+        prefix = f'twap{os.getpid()}x{order_id}'
+
+        user_stream = self._acquire_user_stream(key)
+        if not user_stream.routes_by_client_order_id:
+            self._symbol_orders.add(symbol_order)
+        market_data = self._get_market_data(exchange, market, account)
+        order_book = self._get_order_book(exchange, market) if depth_bps is not None else None
+        # Holds the slot while the TWAP is built off the loop, a concurrent start sees it;
+        self._starting += 1
+        try:
+            twap = await asyncio.get_event_loop().run_in_executor(
+                self._executor,
+                lambda: TWAP(*args, ws=user_stream.ws, client_order_prefix=prefix, market_data=market_data,
+                             passive=passive, schedule=schedule, risk_aversion=risk_aversion,
+                             participation=participation, order_book=order_book, depth_bps=depth_bps,
+                             depth_share=depth_share))
+            user_stream.subscribe(twap.symbol, twap.handle_fill, client_order_prefix=prefix)
+        except Exception:
+            self._symbol_orders.discard(symbol_order)
+            await self._release_user_stream(key)
+            raise
+        finally:
+            self._starting -= 1
+
+        self._orders[order_id] = {'args': args, 'twap': twap,
+                                  'task': asyncio.ensure_future(self._run_order(order_id, key, prefix, symbol_order,
+                                                                                twap))}
+        print(f'ENGINE STARTED ORDER {order_id}: {" ".join(args)}')
+        return order_id
+
+    async def _run_order(self, order_id, key, prefix, symbol_order, twap):
+        try:
+            await twap.async_run()
+        except Exception as e:
+            print(f'ENGINE ORDER {order_id} FAILED: {e}')
+        finally:
+            self._user_streams[key].unsubscribe(twap.symbol, client_order_prefix=prefix)
+            self._symbol_orders.discard(symbol_order)
+            await self._release_user_stream(key)
+            del self._orders[order_id]
+            print(f'ENGINE FINISHED ORDER {order_id}')
+
+    def list_orders(self):
+        return {order_id: ' '.join(order['args']) for order_id, order in self._orders.items()}
+
+    async def _handle_command(self, command):
+        if command.get('cmd') == 'start':
+            order_id = await self.add_order(command['args'], passive=command.get('passive', False),
+                                            schedule=command.get('schedule'),
+                                            risk_aversion=command.get('risk_aversion', IS_RISK_AVERSION),
+                                            participation=command.get('participation', POV_PARTICIPATION),
+                                            depth_bps=command.get('depth_bps'),
+                                            depth_share=command.get('depth_share', DEPTH_SHARE))
+            return {'ok': True, 'order_id': order_id}
+        elif command.get('cmd') == 'list':
+            return {'ok': True, 'orders': self.list_orders()}
+        elif command.get('cmd') == 'metrics':
+            return {'ok': True, 'streams': all_metrics()}
+        return {'ok': False, 'error': f'Unknown command {command.get("cmd")}'}
+
+    async def _handle_client(self, reader, writer):
+        try:
+            line = await reader.readline()
+            try:
+                response = await self._handle_command(json.loads(line.decode('utf-8')))
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            writer.write((json.dumps(response) + '\n').encode('utf-8'))
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self):
+        if os.path.exists(self._socket_path):
+            os.remove(self._socket_path)
+
+        server = await asyncio.start_unix_server(self._handle_client, path=self._socket_path)
+        print(f'TWAP ENGINE LISTENING ON {self._socket_path}')
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='----TWAP ENGINE----')
+    parser.add_argument('--socket', default=ENGINE_SOCKET, help='unix socket the engine listens on')
+    parser.add_argument('--max-orders', type=int, default=64, help='max parent orders running at once')
+
+    args = parser.parse_args()
+
+    engine = TWAPEngine(socket_path=args.socket, max_orders=args.max_orders)
+    asyncio.run(engine.serve())
@@ -0,0 +1,182 @@
+import collections
+import threading
+import time
+
+from twapExecution.exchanges.binance.binanceWSManager import BinanceWSManager
+from twapExecution.exchanges.coinbase.coinbaseWSManager import CoinbaseWSManager
+from twapExecution.exchanges.deribit.deribitWSManager import DeribitWSManager
+from twapExecution.exchanges.executionMethods.fillRecovery import FillRecovery
+from twapExecution.exchanges.executionMethods.preprocessMsg import PreprocessMsg
+from twapExecution.exchanges.okex.okexWSManager import OkexWSManager
+
+"""
+This is a User Stream Multiplexer, which holds one authenticated user stream per exchange/market/account;
+
+Every message is normalized once by PreprocessMsg and the FillEvent is fanned out to the subscribers: by client order
+id prefix on venues that echo it back, by symbol otherwise. Subscribers are added and removed while the stream runs,
+a new symbol on a symbol scoped venue is subscribed on the open connection, nothing reconnects.
+
+When the WS manager reconnects, the fills of every subscribed symbol since its last fill are fetched by FillRecovery
+and routed like stream fills; trade ids already seen are dropped, so a fill is counted once whichever way it came.
+"""
+
+# Venues whose user stream is account wide and echoes our client order id;
+CLIENT_ORDER_ID_EXCHANGES = ('BINANCE',)
+
+# Recovery looks back this much before the last fill, clocks of the venue and of this host differ;
+RECOVERY_OVERLAP_MS = 5000
+
+# Trade ids remembered for de-duplication;
+SEEN_TRADES = 10000
+
+
+class UserStreamMultiplexer:
+    def __init__(self, exchange, market, account='SUB1'):
+        self._exchange = exchange.upper()
+        self._market = market.upper()
+        self._account = account.upper()
+
+        if self._exchange == 'BINANCE':
+            self.ws = BinanceWSManager(self._market)
+        elif self._exchange == 'OKEX':
+            self.ws = OkexWSManager(self._market)
+        elif self._exchange == 'COINBASE':
+            self.ws = CoinbaseWSManager()
+        elif self._exchange == 'DERIBIT':
+            self.ws = DeribitWSManager(self._account)
+        else:
+            raise Exception(f'No user stream for {self._exchange}.')
+        self.ws.monitor.name = f'{self._exchange} {self._market} {self._account} USER'
+
+        self._preprocessor = PreprocessMsg(exchange=self._exchange, market=self._market)
+        self._recovery = FillRecovery(self._exchange, self._market, self.ws.rest_client, self._preprocessor)
+        self.ws.on_reconnect = self.recover
+
+        # Routes are replaced, never mutated, so the WS thread always reads a consistent one without the lock;
+        self._client_routes = {}
+        self._symbol_routes = {}
+        self._symbols = set()
+        self._lock = threading.Lock()
+
+        # symbol -> epoch ms of its last fill, recovery starts there;
+        self._last_fill_ms = {}
+        self._seen = set()
+        self._seen_order = collections.deque()
+        # Stream and recovery fills reach the subscribers one at a time;
+        self._dispatch_lock = threading.Lock()
+
+    @property
+    def routes_by_client_order_id(self):
+        return self._exchange in CLIENT_ORDER_ID_EXCHANGES
+
+    def subscribe(self, symbol, callback, client_order_prefix=None):
+        """
+        Routes the fills of symbol, or of the child orders of client_order_prefix, to callback
+
+        Parameters
+        ----------
+        symbol string; exchange symbol, e.g. 'BTCUSDT', 'BTC-USDT-210625', 'BTC-PERPETUAL'
+        callback function; takes one FillEvent
+        client_order_prefix string; prefix of the client order ids, only used where the venue echoes them
+        """
+        with self._lock:
+            if client_order_prefix is not None and self.routes_by_client_order_id:
+                if client_order_prefix in self._client_routes:
+                    raise Exception(f'{client_order_prefix} is already subscribed.')
+                self._client_routes = {**self._client_routes, client_order_prefix: callback}
+            else:
+                # Without a client order id, two subscribers on one symbol could not be told apart;
+                if symbol in self._symbol_routes:
+                    raise Exception(f'{self._exchange} {self._market} {symbol} is already subscribed, '
+                                    f'fills could not be told apart.')
+                self._symbol_routes = {**self._symbol_routes, symbol: callback}
+
+            self._subscribe_symbol(symbol)
+
+    def unsubscribe(self, symbol, client_order_prefix=None):
+        """
+        Stops routing fills to the subscriber of symbol / client_order_prefix, the stream keeps running
+        """
+        with self._lock:
+            if client_order_prefix is not None and client_order_prefix in self._client_routes:
+                self._client_routes = {prefix: callback for prefix, callback in self._client_routes.items()
+                                       if prefix != client_order_prefix}
+            elif symbol in self._symbol_routes:
+                self._symbol_routes = {s: callback for s, callback in self._symbol_routes.items() if s != symbol}
+
+    def _subscribe_symbol(self, symbol):
+        self._last_fill_ms.setdefault(symbol, int(time.time() * 1e3))
+
+        # Binance has one listenKey stream for the whole account, the other venues subscribe per symbol;
+        if self.ws.ident is None:
+            self._symbols.add(symbol)
+            if self._exchange == 'BINANCE':
+                self.ws.start_user_stream(self._route)
+            elif self._exchange == 'COINBASE':
+                self.ws.start_user_stream(symbol=[symbol], callback=self._route)
+            else:
+                self.ws.start_user_stream(symbol=symbol, callback=self._route)
+
+        elif symbol not in self._symbols:
+            self._symbols.add(symbol)
+            if self._exchange != 'BINANCE':
+                self.ws.add_user_stream(symbol)
+
+    def _route(self, message):
+        msg = self._preprocessor.handle_msg(message)
+        if msg is not None:
+            self._dispatch(msg)
+
+    def _dispatch(self, msg):
+        """
+        Routes msg to its subscriber unless its trade was routed already; returns True if it was new
+        """
+        with self._dispatch_lock:
+            keys = [(msg.symbol, trade_id) for trade_id in msg.trade_ids]
+            if any(key in self._seen for key in keys):
+                return False
+            for key in keys:
+                self._seen.add(key)
+                self._seen_order.append(key)
+                if len(self._seen_order) > SEEN_TRADES:
+                    self._seen.discard(self._seen_order.popleft())
+
+            if msg.time is not None and msg.time > self._last_fill_ms.get(msg.symbol, 0):
+                self._last_fill_ms[msg.symbol] = msg.time
+
+            callback = None
+            if msg.client_order_id is not None:
+                callback = self._client_routes.get(msg.client_order_id.rsplit('_', 1)[0])
+            if callback is None:
+                callback = self._symbol_routes.get(msg.symbol)
+            if callback is not None:
+                callback(msg)
+            return True
+
+    def _is_seen(self, symbol, trade_id):
+        with self._dispatch_lock:
+            return (symbol, trade_id) in self._seen
+
+    def recover(self):
+        """
+        Routes the fills REST knows of and the stream did not deliver, since the last fill of every symbol;
+        called by the WS manager after a reconnect, off its event loop
+        """
+        with self._lock:
+            symbols = list(self._symbols)
+
+        for symbol in symbols:
+            since_ms = self._last_fill_ms[symbol] - RECOVERY_OVERLAP_MS
+            try:
+                fills = self._recovery.fetch(symbol, since_ms, self._is_seen)
+            except Exception as e:
+                print(f'ERROR: Cannot recover {self._exchange} {self._market} {symbol} fills: {e}')
+                continue
+
+            recovered = sum(self._dispatch(msg) for msg in fills)
+            if recovered:
+                print(f'RECOVERED {recovered} {self._exchange} {self._market} {symbol} FILL(S) MISSED BY THE STREAM')
+
+    def close(self):
+        if self.ws.ident is not None:
+            self.ws.close()
@@ -7,6 +7,9 @@ import websockets
 import requests
 from twapExecution.exchanges.huobi.huobiSpotClient import HuobiSpotClient, UrlParamsBuilder
 from twapExecution.exchanges.env import env_vars
+from twapExecution.exchanges.utils.jsonDecoder import loads
+from twapExecution.exchanges.utils.wsMonitor import StreamMonitor
+from twapExecution.exchanges.utils.wsReconnect import Backoff, connect
 from urllib import parse
 import hmac
 import base64
@@ -70,6 +73,11 @@ class HuobiWSManager(threading.Thread):
         self._conn = []
         self.cur_id = 0
 
+        self._backoff = Backoff()
+        self.monitor = StreamMonitor(f'HUOBI {self.market.upper()}')
+        # Called off the event loop after a reconnect;
+        self.on_reconnect = None
+
     def _add_user_stream(self, symbol):
         self._add_conn({'action': "sub",
                         'ch': f"orders#{symbol}"})
@@ -84,9 +92,8 @@ class HuobiWSManager(threading.Thread):
         self._callback = callback
         self.start()
 
-    # Uses callback function to handle messages
-    async def receive_message(self):
-        self.keep_running = True
+    # Connect, authenticate and send every subscription, also on reconnect
+    async def _connect(self):
         self.ws = await websockets.connect(self._ws_url)
 
         builder = UrlParamsBuilder()
@@ -99,10 +106,26 @@ class HuobiWSManager(threading.Thread):
 
         for conn in self._conn:
             await self.ws.send(json.dumps(conn))
+
+    # Exchange event time of a message in ms, pings carry the server time
+    @staticmethod
+    def _event_time(message):
+        data = message.get('data')
+        if isinstance(data, dict):
+            return data.get('tradeTime') or data.get('ts')
+        return None
+
+    # Uses callback function to handle messages
+    async def receive_message(self):
+        self.keep_running = True
+        if not await connect(self):
+            return
+
         while self.keep_running:
             try:
                 message = await self.ws.recv()
-                message = json.loads(message)
+                message = loads(message)
+                self.monitor.on_message(self._event_time(message))
 
                 if message['action'] == 'push':
                     self._callback(message)
@@ -111,11 +134,8 @@ class HuobiWSManager(threading.Thread):
                     await self.ws.send(json.dumps({'action': 'pong', 'data': {'ts':message['data']['ts']}}))
 
             except Exception as e:
-                if not self.ws.open:
-                    print(f'ERROR: Reconnected {e}')
-                    self.ws = await websockets.connect(self._ws_url)
-                    for conn in self._conn:
-                        await self.ws.send(json.dumps(conn))
+                if self.keep_running and not self.ws.open:
+                    await connect(self, e)
         else:
             await self.ws.close()
 
@@ -0,0 +1,278 @@
+import collections
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from twapExecution.exchanges.binance.binanceWSManager import BinanceWSManager
+
+"""
+This is a Local Order Book, which keeps the depth of a Binance symbol in memory from the diff depth stream;
+
+Diffs are buffered while a REST snapshot is fetched on a side thread, then applied on top of it with Binance's
+sequence rules (spot: U == previous u + 1, futures: pu == previous u). A gap, e.g. after a reconnect, clears the book
+and syncs it again from a new snapshot; readers get None meanwhile.
+
+Price levels live in two array('d') per side, sorted so the best level comes first: a price is found by bisect in
+O(log n), a new or emptied level moves the contiguous doubles behind it, O(n). That is the deliberate trade-off over a
+tree: a side keeps at most the snapshot_limit levels next to the touch (levels beyond the snapshot were never synced,
+their qty is not known anyway), so a move is at most 1000 doubles, one memmove of 8KB, and reads stay plain slices.
+OrderBookFeed runs one diff stream per exchange/market for every subscribed symbol.
+"""
+
+SNAPSHOT_LIMIT = 1000
+# Diffs kept while the snapshot is on its way, a resync starts over when older ones are dropped;
+MAX_BUFFERED = 1000
+RESYNC_DELAY = 1.
+
+
+class BookSide:
+    def __init__(self, descending, max_levels=SNAPSHOT_LIMIT):
+        """
+
+        Parameters
+        ----------
+        descending bool; True for bids, the best level is the highest price
+        max_levels int; levels kept from the best one, the farther ones are dropped
+        """
+        self._sign = -1. if descending else 1.
+        self._max_levels = max_levels
+        # sign * price, ascending, and the qty of every level;
+        self._keys = array('d')
+        self._qtys = array('d')
+
+    def __len__(self):
+        return len(self._keys)
+
+    def clear(self):
+        del self._keys[:]
+        del self._qtys[:]
+
+    def update(self, price, qty):
+        """
+        Sets the qty of a price level, 0 removes it
+        """
+        key = self._sign * price
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            if qty == 0:
+                del self._keys[i]
+                del self._qtys[i]
+            else:
+                self._qtys[i] = qty
+        elif qty != 0 and i < self._max_levels:
+            self._keys.insert(i, key)
+            self._qtys.insert(i, qty)
+            # Bounds the O(n) insert/del, see the module docstring;
+            if len(self._keys) > self._max_levels:
+                del self._keys[-1]
+                del self._qtys[-1]
+
+    def best(self):
+        return self._sign * self._keys[0] if self._keys else None
+
+    def depth_within(self, limit_price):
+        """
+        Qty of every level from the best one up to limit_price included
+        """
+        return sum(self._qtys[:bisect_right(self._keys, self._sign * limit_price)])
+
+    def levels(self, n):
+        return [(self._sign * key, qty) for key, qty in zip(self._keys[:n], self._qtys[:n])]
+
+
+class LocalOrderBook:
+    def __init__(self, symbol, rest_client, futures, snapshot_limit=SNAPSHOT_LIMIT):
+        """
+
+        Parameters
+        ----------
+        symbol string; e.g. 'BTCUSDT'
+        rest_client BinanceClient; the snapshot is fetched with get_order_book
+        futures bool; futures diffs chain by pu, spot diffs by U
+        snapshot_limit int; levels of the snapshot
+        """
+        self.symbol = symbol
+        self._rest_client = rest_client
+        self._futures = futures
+        self._snapshot_limit = snapshot_limit
+
+        self.bids = BookSide(descending=True, max_levels=snapshot_limit)
+        self.asks = BookSide(descending=False, max_levels=snapshot_limit)
+
+        # Diffs and the resync thread write, slices read;
+        self._lock = threading.Lock()
+        # None while the book is not synced;
+        self._last_update_id = None
+        # False until the first diff after the snapshot is applied, it may straddle lastUpdateId;
+        self._applied = False
+        self._buffer = collections.deque(maxlen=MAX_BUFFERED)
+        self._resyncing = False
+        self._updated = None
+
+        self.resyncs = 0
+
+    @property
+    def synced(self):
+        return self._last_update_id is not None
+
+    def on_diff(self, message):
+        """
+        Applies a depthUpdate message, called from the WS thread
+        """
+        with self._lock:
+            if self._last_update_id is not None:
+                if self._apply(message):
+                    return
+                print(f'ORDER BOOK {self.symbol} GAP AT {message["U"]} AFTER {self._last_update_id}, RESYNC!')
+                self._last_update_id = None
+
+            self._buffer.append(message)
+            if not self._resyncing:
+                self._resyncing = True
+                threading.Thread(target=self._resync, daemon=True).start()
+
+    def _apply(self, message):
+        """
+        Returns False when the message does not follow the last applied one
+        """
+        first, last = message['U'], message['u']
+        if self._futures:
+            if last < self._last_update_id:
+                return True
+            in_sequence = message['pu'] == self._last_update_id if self._applied \
+                else first <= self._last_update_id <= last
+        else:
+            if last <= self._last_update_id:
+                return True
+            in_sequence = first == self._last_update_id + 1 if self._applied \
+                else first <= self._last_update_id + 1 <= last
+        if not in_sequence:
+            return False
+
+        for price, qty in message['b']:
+            self.bids.update(float(price), float(qty))
+        for price, qty in message['a']:
+            self.asks.update(float(price), float(qty))
+        self._last_update_id = last
+        self._applied = True
+        self._updated = time.monotonic()
+        return True
+
+    def _resync(self):
+        try:
+            snapshot = self._rest_client.get_order_book(self.symbol, self._snapshot_limit)
+            error = None if 'lastUpdateId' in snapshot else snapshot
+        except Exception as e:
+            snapshot, error = None, e
+
+        if error is not None:
+            print(f'CANNOT GET ORDER BOOK SNAPSHOT OF {self.symbol}: {error}')
+            # The next diff starts the next attempt;
+            time.sleep(RESYNC_DELAY)
+            with self._lock:
+                self._resyncing = False
+            return
+
+        with self._lock:
+            self._resyncing = False
+            self.bids.clear()
+            self.asks.clear()
+            for price, qty in snapshot['bids']:
+                self.bids.update(float(price), float(qty))
+            for price, qty in snapshot['asks']:
+                self.asks.update(float(price), float(qty))
+            self._last_update_id = snapshot['lastUpdateId']
+            self._applied = False
+            self._updated = time.monotonic()
+
+            buffered = list(self._buffer)
+            self._buffer.clear()
+            for message in buffered:
+                if not self._apply(message):
+                    # The snapshot is older than the buffered diffs, the next diff asks for a new one;
+                    print(f'ORDER BOOK {self.symbol} SNAPSHOT {snapshot["lastUpdateId"]} BEFORE THE DIFFS, RESYNC!')
+                    self._last_update_id = None
+                    return
+            self.resyncs += 1
+            print(f'ORDER BOOK {self.symbol} SYNCED AT {self._last_update_id}')
+
+    def top_of_book(self):
+        with self._lock:
+            if self._last_update_id is None:
+                return None
+            return self.bids.best(), self.asks.best()
+
+    def available(self, side, bps):
+        """
+        Qty an order of side could take within bps of the touch, None when the book is not synced
+
+        Parameters
+        ----------
+        side string; as passed to TWAP, a buy takes the asks
+        bps float;
+        """
+        with self._lock:
+            if self._last_update_id is None:
+                return None
+            if 'BUY' in side.upper():
+                best = self.asks.best()
+                return self.asks.depth_within(best * (1 + bps / 1e4)) if best is not None else 0.
+            best = self.bids.best()
+            return self.bids.depth_within(best * (1 - bps / 1e4)) if best is not None else 0.
+
+    def age(self):
+        """
+        Seconds since the last update, None if never synced
+        """
+        return time.monotonic() - self._updated if self._updated is not None else None
+
+
+class OrderBookFeed:
+    def __init__(self, exchange, market, snapshot_limit=SNAPSHOT_LIMIT):
+        self._exchange = exchange.upper()
+        self._market = market.upper()
+        self._snapshot_limit = snapshot_limit
+
+        if self._exchange != 'BINANCE':
+            raise Exception(f'No order book feed for {self._exchange}.')
+        self.ws = BinanceWSManager(self._market)
+        self.ws.monitor.name = f'{self._exchange} {self._market} ORDER BOOK'
+
+        self._books = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, symbol):
+        """
+        Returns the LocalOrderBook of symbol, adding it to the feed on first use
+        """
+        with self._lock:
+            if symbol in self._books:
+                return self._books[symbol]
+            book = LocalOrderBook(symbol, self.ws.rest_client, 'FUTURES' in self._market, self._snapshot_limit)
+            self._books[symbol] = book
+
+            if self.ws.ident is None:
+                self.ws.start_diff_depth_stream([symbol.lower()], self._on_message)
+            else:
+                self.ws.add_diff_depth_stream(symbol.lower())
+            return book
+
+    def get(self, symbol):
+        return self._books.get(symbol)
+
+    def stale_reason(self):
+        """
+        Why the diff stream cannot be trusted (see StreamMonitor.stale_reason), None when it can
+        """
+        return self.ws.monitor.stale_reason()
+
+    def close(self):
+        if self.ws.ident is not None:
+            self.ws.close()
+
+    def _on_message(self, message):
+        if message.get('e') == 'depthUpdate':
+            book = self._books.get(message['s'])
+            if book is not None:
+                book.on_diff(message)
@@ -0,0 +1,243 @@
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+
+from twapExecution.exchanges.binance.binanceWSManager import BinanceWSManager
+from twapExecution.exchanges.coinbase.coinbaseWSManager import CoinbaseWSManager
+from twapExecution.exchanges.deribit.deribitWSManager import DeribitWSManager
+from twapExecution.exchanges.okex.okexWSManager import OkexWSManager
+
+"""
+This is a Price Cache, which keeps the last price and top of book of every subscribed symbol in memory;
+
+The cache is fed by a MarketDataFeed, one public WS connection per exchange/market. Each entry carries the local
+monotonic time of its last price and book update so readers can refuse stale data; a fresh entry can still hold old
+data when the whole stream lags behind the exchange, MarketDataFeed.stale_reason tells.
+
+Trades on the stream are added up per symbol in a VolumeCounter, e.g. for POV slices. A counter is written by the
+one WS thread of its feed and read without a lock: a trade costs a float add and a bucket write, so bursts of
+thousands of trades per second do not hold the socket up.
+"""
+
+# Per second buckets of the rolling volume, the longest window VolumeCounter.recent covers;
+VOLUME_BUCKETS = 600
+
+
+class VolumeCounter:
+    def __init__(self, buckets=VOLUME_BUCKETS):
+        # Cumulative traded qty and number of trades since the counter exists;
+        self.total = 0.
+        self.trades = 0
+        # Ring of per second volumes, each bucket tagged with the second it holds;
+        self._volumes = array('d', bytes(8 * buckets))
+        self._seconds = array('q', bytes(8 * buckets))
+
+    def add(self, qty):
+        """
+        Called by the feed's WS thread only
+        """
+        second = int(time.monotonic())
+        i = second % len(self._seconds)
+        if self._seconds[i] != second:
+            self._volumes[i] = 0.
+            self._seconds[i] = second
+        self._volumes[i] += qty
+        self.total += qty
+        self.trades += 1
+
+    def recent(self, seconds):
+        """
+        Qty traded in the last seconds, whole seconds, at most VOLUME_BUCKETS of them
+        """
+        oldest = int(time.monotonic()) - min(int(seconds), len(self._seconds) - 1)
+        return sum(volume for volume, second in zip(self._volumes, self._seconds) if second >= oldest)
+
+
+class PriceCache:
+    def __init__(self):
+        # symbol -> entry dict; entries are replaced, never mutated, so readers always see a consistent one;
+        self._entries = {}
+        # symbol -> VolumeCounter;
+        self._volumes = {}
+
+    def update(self, symbol, price=None, bid=None, ask=None, exchange_time=None):
+        """
+        Parameters
+        ----------
+        symbol string; symbol as used by the exchange
+        price float; reference price (last trade, mark price on Deribit)
+        bid float; best bid
+        ask float; best ask
+        exchange_time int; exchange event time in ms
+        """
+        now = time.monotonic()
+        entry = dict(self._entries.get(symbol) or {'price': None, 'price_time': None,
+                                                    'bid': None, 'ask': None, 'book_time': None,
+                                                    'exchange_time': None})
+        if price is not None:
+            entry['price'] = price
+            entry['price_time'] = now
+        if bid is not None or ask is not None:
+            entry['bid'] = bid if bid is not None else entry['bid']
+            entry['ask'] = ask if ask is not None else entry['ask']
+            entry['book_time'] = now
+        if exchange_time is not None:
+            entry['exchange_time'] = exchange_time
+
+        self._entries[symbol] = entry
+
+    def get(self, symbol):
+        return self._entries.get(symbol)
+
+    def volume_counter(self, symbol):
+        """
+        Returns the VolumeCounter of symbol, created on first use; it only counts while a feed streams its trades
+        """
+        counter = self._volumes.get(symbol)
+        if counter is None:
+            counter = self._volumes.setdefault(symbol, VolumeCounter())
+        return counter
+
+    def add_volume(self, symbol, qty):
+        self.volume_counter(symbol).add(qty)
+
+    def get_price(self, symbol, max_age=None):
+        """
+        Returns the reference price, or the mid of a fresh book when no fresh price is there;
+        None when the symbol is missing or everything is older than max_age seconds
+        """
+        entry = self._entries.get(symbol)
+        if entry is None:
+            return None
+
+        now = time.monotonic()
+        if entry['price'] is not None and (max_age is None or now - entry['price_time'] <= max_age):
+            return entry['price']
+        if entry['bid'] is not None and entry['ask'] is not None and \
+                (max_age is None or now - entry['book_time'] <= max_age):
+            return (entry['bid'] + entry['ask']) / 2
+        return None
+
+    def get_top_of_book(self, symbol, max_age=None):
+        """
+        Returns (bid, ask), or None when missing or older than max_age seconds
+        """
+        entry = self._entries.get(symbol)
+        if entry is None or entry['book_time'] is None:
+            return None
+        if max_age is not None and time.monotonic() - entry['book_time'] > max_age:
+            return None
+        return entry['bid'], entry['ask']
+
+    def age(self, symbol):
+        """
+        Seconds since the last update of symbol, None if never updated
+        """
+        entry = self._entries.get(symbol)
+        if entry is None:
+            return None
+        times = [t for t in (entry['price_time'], entry['book_time']) if t is not None]
+        return time.monotonic() - max(times)
+
+
+class MarketDataFeed:
+    def __init__(self, exchange, market, account='SUB1', cache=None):
+        self._exchange = exchange.upper()
+        self._market = market.upper()
+        self._account = account.upper()
+        self.cache = cache if cache is not None else PriceCache()
+
+        if self._exchange == 'BINANCE':
+            self.ws = BinanceWSManager(self._market)
+            self._normalize = self._binance
+        elif self._exchange == 'OKEX':
+            self.ws = OkexWSManager(self._market)
+            self._normalize = self._okex
+        elif self._exchange == 'COINBASE':
+            self.ws = CoinbaseWSManager()
+            self._normalize = self._coinbase
+        elif self._exchange == 'DERIBIT':
+            self.ws = DeribitWSManager(self._account)
+            self._normalize = self._deribit
+        else:
+            raise Exception(f'No market data feed for {self._exchange}.')
+        self.ws.monitor.name = f'{self._exchange} {self._market} MARKET DATA'
+
+        self._symbols = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, symbol):
+        """
+        Adds symbol to the feed, the connection is opened with the first symbol
+        """
+        with self._lock:
+            if symbol in self._symbols:
+                return
+            self._symbols.add(symbol)
+
+            stream_symbol = symbol.lower() if self._exchange == 'BINANCE' else symbol
+            if self.ws.ident is None:
+                self.ws.start_ticker_stream([stream_symbol], self._normalize)
+            else:
+                self.ws.add_ticker_stream(stream_symbol)
+
+    def stale_reason(self):
+        """
+        Why the stream feeding the cache cannot be trusted (see StreamMonitor.stale_reason), None when it can
+        """
+        return self.ws.monitor.stale_reason()
+
+    def close(self):
+        if self.ws.ident is not None:
+            self.ws.close()
+
+    def volume_counter(self, symbol):
+        """
+        VolumeCounter of symbol, which has to be subscribed
+        """
+        return self.cache.volume_counter(symbol)
+
+    def _binance(self, message):
+        if 'b' in message and 'a' in message:  # bookTicker
+            self.cache.update(message['s'], bid=float(message['b']), ask=float(message['a']),
+                              exchange_time=message.get('T'))
+        elif message.get('e') == 'aggTrade':
+            self.cache.update(message['s'], price=float(message['p']), exchange_time=message['T'])
+            self.cache.add_volume(message['s'], float(message['q']))
+
+    def _okex(self, message):
+        if message.get('table', '').endswith('/trade'):
+            for data in message['data']:
+                # Spot trades carry size, futures trades qty (contracts);
+                self.cache.add_volume(data['instrument_id'], float(data.get('size', data.get('qty'))))
+        elif message.get('table', '').endswith('/ticker'):
+            for data in message['data']:
+                self.cache.update(data['instrument_id'],
+                                  price=float(data['last']),
+                                  bid=float(data['best_bid']),
+                                  ask=float(data['best_ask']),
+                                  exchange_time=int(datetime.strptime(data['timestamp'], "%Y-%m-%dT%H:%M:%S.%fZ").replace(
+                                      tzinfo=timezone.utc).timestamp() * 1e3))
+
+    def _coinbase(self, message):
+        # last_match on subscribing is history, not counted;
+        if message.get('type') == 'match':
+            self.cache.add_volume(message['product_id'], float(message['size']))
+        elif message.get('type') == 'ticker':
+            self.cache.update(message['product_id'],
+                              price=float(message['price']),
+                              bid=float(message['best_bid']),
+                              ask=float(message['best_ask']))
+
+    def _deribit(self, message):
+        if message.get('method') == 'subscription' and message['params']['channel'].startswith('trades.'):
+            for trade in message['params']['data']:
+                self.cache.add_volume(trade['instrument_name'], float(trade['amount']))
+        elif message.get('method') == 'subscription' and message['params']['channel'].startswith('ticker.'):
+            data = message['params']['data']
+            self.cache.update(data['instrument_name'],
+                              price=float(data['mark_price']),
+                              bid=float(data['best_bid_price']) if data.get('best_bid_price') else None,
+                              ask=float(data['best_ask_price']) if data.get('best_ask_price') else None,
+                              exchange_time=data['timestamp'])
@@ -0,0 +1,195 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+"""
+This is a Volume Profile cache, which keeps the expected intraday volume curve and the recent 1m volatility of every
+symbol a VWAP or IS schedule runs on;
+
+The profile is the share of a day's volume traded in each UTC minute, averaged over the last PROFILE_DAYS full days
+of 1m candles (every day weighs the same, one busy day does not shape the curve) and smoothed over SMOOTH_MINUTES.
+The volatility is the std of 1m log returns over the last VOLATILITY_DAYS of the same candles, in bps.
+Both are persisted to VOLUME_PROFILE_{exchange}_{market}_{symbol}.json next to the execution DBs and built again
+once older than VOLUME_PROFILE_TTL; only Binance has a candle download here.
+"""
+
+MINUTES_PER_DAY = 24 * 60
+PROFILE_DAYS = 7
+SMOOTH_MINUTES = 15
+# Share of the mean a minute keeps at least, a minute without trades in the history still gets a slice;
+MIN_SHARE = 0.1
+VOLATILITY_DAYS = 1
+VOLUME_PROFILE_TTL = 24 * 60 * 60
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def build_volume_profile(open_times, volumes, smooth_minutes=SMOOTH_MINUTES):
+    """
+    Parameters
+    ----------
+    open_times np.array; epoch ms of every candle (or trade)
+    volumes np.array; volume of every candle (or trade)
+    smooth_minutes int; width of the circular moving average
+
+    Returns
+    -------
+    profile np.array; MINUTES_PER_DAY shares of the daily volume, sums to 1
+    """
+    minutes = np.asarray(open_times, dtype=np.int64) // 60000
+    volumes = np.asarray(volumes, dtype=np.float64)
+    day, minute = np.divmod(minutes, MINUTES_PER_DAY)
+
+    daily_volume = pd.Series(volumes).groupby(day).transform('sum').to_numpy()
+    share = np.divide(volumes, daily_volume, out=np.zeros_like(volumes), where=daily_volume > 0)
+
+    n_days = max(len(np.unique(day)), 1)
+    profile = np.bincount(minute, weights=share, minlength=MINUTES_PER_DAY) / n_days
+
+    if smooth_minutes > 1:
+        # Wrap around midnight, 23:59 and 00:00 are neighbours;
+        padded = np.concatenate((profile[-smooth_minutes:], profile, profile[:smooth_minutes]))
+        profile = np.convolve(padded, np.ones(smooth_minutes) / smooth_minutes, mode='same')[
+                  smooth_minutes:-smooth_minutes]
+
+    if profile.sum() <= 0:
+        return np.full(MINUTES_PER_DAY, 1. / MINUTES_PER_DAY)
+    profile = np.maximum(profile, MIN_SHARE * profile.mean())
+    return profile / profile.sum()
+
+
+def build_volatility(times, prices):
+    """
+    Parameters
+    ----------
+    times np.array; epoch ms of every candle (or trade)
+    prices np.array; close (or trade) price
+
+    Returns
+    -------
+    volatility float; std of 1m log returns in bps, of the last price of every minute
+    """
+    closes = pd.Series(np.asarray(prices, dtype=np.float64)).groupby(
+        np.asarray(times, dtype=np.int64) // 60000).last().to_numpy()
+    if len(closes) < 3:
+        raise Exception('Too few minutes for a volatility!')
+    return float(np.std(np.diff(np.log(closes))) * 1e4)
+
+
+class VolumeProfile:
+    def __init__(self, exchange, market, symbol, client, days=PROFILE_DAYS, ttl=VOLUME_PROFILE_TTL, path=None):
+        """
+
+        Parameters
+        ----------
+        exchange string; e.g. 'BINANCE'
+        market string; e.g. 'SPOT', 'USDT-FUTURES'
+        symbol string; exchange symbol the candles are downloaded for
+        client object; REST client with get_candlestick_data
+        days int; full days of history
+        ttl float; seconds before the profile is built again
+        path string; json file the profile is persisted to
+        """
+        self._exchange = exchange.upper()
+        self._market = market.upper()
+        self._symbol = symbol
+        self._client = client
+        self._days = days
+        self._ttl = ttl
+        self._path = path or os.path.join(os.getcwd(),
+                                          f'VOLUME_PROFILE_{self._exchange}_{self._market}_{self._symbol}.json')
+
+        self._profile = None
+        self._volatility = None
+        self._updated = 0
+        self._refresh_lock = threading.Lock()
+
+        if self._exchange != 'BINANCE':
+            raise Exception(f'No volume profile for {self._exchange}, candles are only downloaded from Binance!')
+        self._load()
+
+    def get(self):
+        """
+        Returns the profile, built again first when it is older than the TTL (once a day by default)
+        """
+        self._refresh_if_old()
+        return self._profile
+
+    def volatility(self):
+        """
+        Returns the std of 1m log returns in bps, built again first when older than the TTL
+        """
+        self._refresh_if_old()
+        return self._volatility
+
+    def _refresh_if_old(self):
+        if time.time() - self._updated > self._ttl:
+            try:
+                self.refresh()
+            except Exception as e:
+                if self._profile is None:
+                    raise
+                print(f'VOLUME PROFILE REFRESH FAILED, USING CACHED {self._path}: {e}')
+
+    def refresh(self):
+        with self._refresh_lock:
+            end = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+            start = end - timedelta(days=self._days)
+            candles = self._client.get_candlestick_data(self._symbol, '1m', start.strftime('%Y%m%d'),
+                                                        end.strftime('%Y%m%d'))
+            if len(candles) == 0:
+                raise Exception(f'No candles for {self._symbol}!')
+
+            self._profile = build_volume_profile(candles['openTime'].to_numpy(), candles['volume'].to_numpy())
+            recent = candles[candles['openTime'] >= candles['openTime'].max() - VOLATILITY_DAYS * 86400 * 1e3]
+            self._volatility = build_volatility(recent['openTime'].to_numpy(), recent['close'].to_numpy())
+            self._updated = time.time()
+            self._save()
+            print(f'VOLUME PROFILE REFRESHED: {self._exchange} {self._market} {self._symbol} {len(candles)} candles')
+
+    def _load(self):
+        if not os.path.exists(self._path):
+            return
+        try:
+            with open(self._path) as f:
+                data = json.load(f)
+            self._profile = np.array(data['profile'])
+            self._volatility = data['volatility']
+            self._updated = data['updated']
+        except Exception as e:
+            print(f'CANNOT READ {self._path}: {e}')
+
+    def _save(self):
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'updated': self._updated, 'profile': self._profile.tolist(), 'volatility': self._volatility},
+                      f)
+        os.replace(tmp_path, self._path)
+
+
+def _get(exchange, market, symbol, client):
+    key = (exchange.upper(), market.upper(), symbol)
+    with _registry_lock:
+        if key not in _registry:
+            _registry[key] = VolumeProfile(exchange, market, symbol, client)
+        return _registry[key]
+
+
+def get_volume_profile(exchange, market, symbol, client):
+    """
+    Returns the volume profile of a symbol from the process wide cache, creating it on first use
+    """
+    return _get(exchange, market, symbol, client).get()
+
+
+def get_volatility(exchange, market, symbol, client):
+    """
+    Returns the recent 1m volatility (bps) of a symbol from the process wide cache, creating it on first use
+    """
+    return _get(exchange, market, symbol, client).volatility()
@@ -7,7 +7,8 @@ import json
 
 class Client(object):
 
-    def __init__(self, api_key, api_secret_key, passphrase, use_server_time=False, test=False, first=False):
+    def __init__(self, api_key, api_secret_key, passphrase, use_server_time=False, test=False, first=False,
+                 api_url=c.API_URL):
 
         self.API_KEY = api_key
         self.API_SECRET_KEY = api_secret_key
@@ -15,12 +16,13 @@ class Client(object):
         self.use_server_time = use_server_time
         self.first = first
         self.test = test
+        self.api_url = api_url
 
     def _request(self, method, request_path, params, cursor=False):
         if method == c.GET:
             request_path = request_path + utils.parse_params_to_str(params)
         # url
-        url = c.API_URL + request_path
+        url = self.api_url + request_path
 
         # 获取本地时间
         timestamp = utils.get_timestamp()
@@ -79,7 +81,7 @@ class Client(object):
         return self._request(method, request_path, params, cursor)
 
     def _get_timestamp(self):
-        url = c.API_URL + c.SERVER_TIMESTAMP_URL
+        url = self.api_url + c.SERVER_TIMESTAMP_URL
         response = requests.get(url)
         if response.status_code == 200:
             return response.json()['iso']
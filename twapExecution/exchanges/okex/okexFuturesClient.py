@@ -4,8 +4,9 @@ from twapExecution.exchanges.okex.consts import *
 
 class OkexFuturesClient(Client):
 
-    def __init__(self, api_key, api_secret_key, passphrase, use_server_time=False, test=False, first=False):
-        Client.__init__(self, api_key, api_secret_key, passphrase, use_server_time, test, first)
+    def __init__(self, api_key, api_secret_key, passphrase, use_server_time=False, test=False, first=False,
+                 api_url=API_URL):
+        Client.__init__(self, api_key, api_secret_key, passphrase, use_server_time, test, first, api_url)
 
     # query spot account info
     def get_account_info(self):
@@ -38,6 +39,10 @@ class OkexFuturesClient(Client):
 
         return self._request_with_params(POST, FUTURE_ORDER, params)
 
+    # state '2' is fully filled
+    def get_orders(self, symbol, state):
+        return self._request_with_params(GET, FUTURE_ORDERS_LIST + symbol, {'state': state})['order_info']
+
     def post_change_initial_margin(self, symbol, leverage):
         params = {'leverage': str(leverage)}
 
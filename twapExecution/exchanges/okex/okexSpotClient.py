@@ -4,8 +4,9 @@ from twapExecution.exchanges.okex.consts import *
 
 class OkexSpotClient(Client):
 
-    def __init__(self, api_key, api_secret_key, passphrase, use_server_time=False, test=False, first=False):
-        Client.__init__(self, api_key, api_secret_key, passphrase, use_server_time, test, first)
+    def __init__(self, api_key, api_secret_key, passphrase, use_server_time=False, test=False, first=False,
+                 api_url=API_URL):
+        Client.__init__(self, api_key, api_secret_key, passphrase, use_server_time, test, first, api_url)
 
     # query spot account info
     def get_account_info(self):
@@ -17,9 +18,13 @@ class OkexSpotClient(Client):
     def get_symbol_price_ticker(self, symbol):
         return self._request_without_params(GET, SPOT_SPECIFIC_TICKER + symbol + '/ticker')
 
+    # every trading pair with its size/tick increments
+    def get_instruments(self):
+        return self._request_without_params(GET, SPOT_DEPTH)
+
     def get_trading_pair_info(self, symbol):
 
-        for pair in self._request_without_params(GET, SPOT_DEPTH):
+        for pair in self.get_instruments():
             if pair['instrument_id'] == symbol:
                 return pair
 
@@ -36,6 +41,10 @@ class OkexSpotClient(Client):
 
         return self._request_with_params(POST, SPOT_ORDER, params)
 
+    # state '2' is fully filled
+    def get_orders(self, symbol, state):
+        return self._request_with_params(GET, SPOT_ORDERS_LIST, {'instrument_id': symbol, 'state': state})
+
     def get_commission_rate(self, symbol, taker=True):
         params = {'instrument_id': symbol}
 
@@ -8,6 +8,10 @@ from datetime import datetime
 from twapExecution.exchanges.okex.okexSpotClient import OkexSpotClient
 from twapExecution.exchanges.okex.okexFuturesClient import OkexFuturesClient
 from twapExecution.exchanges.env import env_vars
+from twapExecution.exchanges.executionMethods.fillEvent import iso_to_ms
+from twapExecution.exchanges.utils.jsonDecoder import loads
+from twapExecution.exchanges.utils.wsMonitor import StreamMonitor
+from twapExecution.exchanges.utils.wsReconnect import Backoff, connect
 import requests
 import dateutil.parser as dp
 import hmac
@@ -26,7 +30,7 @@ def get_timestamp():
 
 
 def get_server_time():
-    url = "https://www.okex.com/api/general/v3/time"
+    url = env_vars['OKEX_URL'] + "/api/general/v3/time"
     response = requests.get(url)
     if response.status_code == 200:
         return response.json()['iso']
@@ -75,38 +79,73 @@ class OkexWSManager(threading.Thread):
             self.rest_client = OkexSpotClient(env_vars['OKEX_API_KEY'],
                                               env_vars['OKEX_SECRET_KEY'],
                                               env_vars['OKEX_PASSPHRASE'],
-                                              self._base_url)
+                                              use_server_time=True,
+                                              api_url=self._base_url)
 
         elif 'FUTURES' in market.upper():
             self._market = 'futures'
             self.rest_client = OkexFuturesClient(env_vars['OKEX_API_KEY'],
                                                  env_vars['OKEX_SECRET_KEY'],
                                                  env_vars['OKEX_PASSPHRASE'],
-                                                 self._base_url)
+                                                 use_server_time=True,
+                                                 api_url=self._base_url)
 
         self._conn = []
         self.cur_id = 0
+        self._ws_loop = None
+
+        self._backoff = Backoff()
+        self.monitor = StreamMonitor(f'OKEX {self._market.upper()}')
+        # Called off the event loop after a reconnect, e.g. UserStreamMultiplexer.recover;
+        self.on_reconnect = None
 
     def _add_user_stream(self, symbol):
         self._add_conn({'op': "subscribe",
                         'args': [f'{self._market}/order:{symbol.upper()}']})
 
+    def _add_ticker_stream(self, symbol):
+        self._add_conn({'op': "subscribe",
+                        'args': [f'{self._market}/ticker:{symbol.upper()}',
+                                 f'{self._market}/trade:{symbol.upper()}']})
+
     def _add_conn(self, sub):
         self._conn.append(sub)
         self.cur_id += 1
 
+    # Send the latest subscription on the running connection, it is sent on connect otherwise;
+    def _send_new_conn(self):
+        if self._ws_loop is not None:
+            asyncio.run_coroutine_threadsafe(self.ws.send(json.dumps(self._conn[-1])), self._ws_loop)
+
     # Start user Stream
     def start_user_stream(self, symbol, callback):
         self._add_user_stream(symbol)
         self._callback = callback
         self.start()
 
-    # Uses callback function to handle messages
-    async def receive_message(self):
-        self.keep_running = True
+    # Add a symbol to a running user Stream without reconnecting
+    def add_user_stream(self, symbol):
+        self._add_user_stream(symbol)
+        self._send_new_conn()
+
+    # Start ticker and trade Stream, used by the price cache
+    def start_ticker_stream(self, symbols, callback):
+        for symbol in symbols:
+            self._add_ticker_stream(symbol)
+        self._callback = callback
+        self.start()
+
+    # Add a symbol to a running ticker Stream without reconnecting
+    def add_ticker_stream(self, symbol):
+        self._add_ticker_stream(symbol)
+        self._send_new_conn()
+
+    # Connect, log in and send every subscription, also on reconnect
+    async def _connect(self):
         self.ws = await websockets.connect(self._ws_url)
 
-        login_str = login_params(str(server_timestamp()),
+        timestamp = await asyncio.get_event_loop().run_in_executor(None, server_timestamp)
+        login_str = login_params(str(timestamp),
                                  env_vars['OKEX_API_KEY'],
                                  env_vars['OKEX_SECRET_KEY'],
                                  env_vars['OKEX_PASSPHRASE'])
@@ -119,21 +158,33 @@ class OkexWSManager(threading.Thread):
         for conn in self._conn:
             await self.ws.send(json.dumps(conn))
 
+    # Exchange event time of a message in ms, None on events
+    @staticmethod
+    def _event_time(message):
+        data = message.get('data')
+        if data and 'timestamp' in data[0]:
+            return iso_to_ms(data[0]['timestamp'])
+        return None
+
+    # Uses callback function to handle messages
+    async def receive_message(self):
+        self.keep_running = True
+        if not await connect(self):
+            return
+        self._ws_loop = asyncio.get_event_loop()
+
         while self.keep_running:
             try:
                 message = await self.ws.recv()
-                message = json.loads(inflate(message).decode('utf-8'))
+                message = loads(inflate(message))
+                self.monitor.on_message(self._event_time(message))
 
                 if 'event' not in message:
                     self._callback(message)
 
             except Exception as e:
-
-                if not self.ws.open:
-                    print(f'ERROR: Reconnected {e}')
-                    self.ws = await websockets.connect(self._ws_url)
-                    for conn in self._conn:
-                        await self.ws.send(json.dumps(conn))
+                if self.keep_running and not self.ws.open:
+                    await connect(self, e)
         else:
             await self.ws.close()
 
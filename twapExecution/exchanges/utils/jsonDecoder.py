@@ -0,0 +1,94 @@
+import json
+import os
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+"""
+This is a JSON Decoder, which every WS manager decodes its frames with;
+
+loads is the fastest installed backend: orjson, then msgspec, then the stdlib json module, unless TWAP_JSON_DECODER
+names one. All of them take str or bytes and return the same dicts and lists, so swapping the backend changes
+nothing downstream. get_typed_decoder decodes the known high rate schemas into slotted records instead of dicts,
+msgspec Structs when msgspec is installed.
+"""
+
+BACKENDS = ('orjson', 'msgspec', 'json')
+
+# name -> fields (name, type) of the schemas get_typed_decoder knows; fields missing in a message are None;
+SCHEMAS = {'BINANCE_BOOK_TICKER': (('e', str), ('E', int), ('T', int), ('u', int), ('s', str),
+                                   ('b', str), ('B', str), ('a', str), ('A', str)),
+           'BINANCE_AGG_TRADE': (('e', str), ('E', int), ('s', str), ('a', int), ('p', str), ('q', str),
+                                 ('f', int), ('l', int), ('T', int), ('m', bool))}
+
+
+def available_backends():
+    installed = {'orjson': orjson is not None, 'msgspec': msgspec is not None, 'json': True}
+    return [backend for backend in BACKENDS if installed[backend]]
+
+
+def get_decoder(backend=None):
+    """
+    Returns a loads(str or bytes) function
+
+    Parameters
+    ----------
+    backend string; one of BACKENDS, None picks the fastest installed one
+    """
+    backend = backend or available_backends()[0]
+
+    if backend == 'orjson' and orjson is not None:
+        return orjson.loads
+    elif backend == 'msgspec' and msgspec is not None:
+        return msgspec.json.decode
+    elif backend == 'json':
+        return json.loads
+
+    raise Exception(f'JSON decoder {backend} is not installed, available: {available_backends()}')
+
+
+def _record_class(name, fields):
+    names = tuple(field for field, _ in fields)
+
+    def __init__(self, message):
+        for field in names:
+            setattr(self, field, message.get(field))
+
+    def __repr__(self):
+        return f'{name}(' + ', '.join(f'{field}={getattr(self, field)!r}' for field in names) + ')'
+
+    return type(name, (), {'__slots__': names, '__init__': __init__, '__repr__': __repr__})
+
+
+def get_typed_decoder(schema, backend=None):
+    """
+    Returns a function decoding a frame of a known schema into a slotted record with attribute access,
+    e.g. get_typed_decoder('BINANCE_BOOK_TICKER')(frame).b
+
+    Parameters
+    ----------
+    schema string; one of SCHEMAS
+    backend string; 'msgspec' decodes straight into a Struct, any other backend decodes to a dict first
+    """
+    fields = SCHEMAS[schema]
+    name = ''.join(word.capitalize() for word in schema.split('_'))
+    backend = backend or available_backends()[0]
+
+    if backend == 'msgspec' and msgspec is not None:
+        struct = msgspec.defstruct(name, [(field, Optional[field_type], None) for field, field_type in fields])
+        return msgspec.json.Decoder(struct).decode
+
+    record = _record_class(name, fields)
+    decode = get_decoder(backend)
+    return lambda data: record(decode(data))
+
+
+loads = get_decoder(os.getenv('TWAP_JSON_DECODER'))
@@ -0,0 +1,229 @@
+import json
+import os
+import threading
+import time
+
+"""
+This is a Symbol Rules cache, which keeps lot size, tick size, min notional and quantity precision of every symbol
+of an exchange/market in a dict keyed by symbol;
+
+Rules are downloaded once per exchange/market and process, persisted to SYMBOL_RULES_{exchange}_{market}.json
+next to the execution DBs, reused from disk while younger than the TTL and refreshed by a background thread.
+Venues with static rules (Deribit, OKEx futures) never hit the network.
+"""
+
+SYMBOL_RULES_TTL = 24 * 60 * 60
+
+# Fallback min notional used when a venue does not publish one;
+DEFAULT_MIN_NOTIONAL = {('BINANCE', 'SPOT'): 10,
+                        ('BINANCE', 'USDT-FUTURES'): 5,
+                        ('COINBASE', 'SPOT'): 10,
+                        ('OKEX', 'SPOT'): 10}
+
+# Quotes whose min notional is in USD, as the slice prices (see baseTWAP _price_name);
+USD_QUOTES = ('USDT', 'BUSD', 'USDC', 'USD')
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _increment_precision(increment):
+    """
+    Number of decimals of an increment string, e.g. '0.001' -> 3, '1' -> 0
+    """
+    decimals = str(float(increment)).split('.')[-1]
+    return 0 if decimals == '0' else len(decimals)
+
+
+def _rule(symbol, precision, lot_size=None, min_qty=None, tick_size=None, min_notional=None):
+    return {'symbol': symbol,
+            'precision': precision,
+            'lot_size': lot_size,
+            'min_qty': min_qty,
+            'tick_size': tick_size,
+            'min_notional': min_notional}
+
+
+def _binance_rules(market, client):
+    rules = {}
+    for info in client.get_exchange_information()['symbols']:
+        filters = {f['filterType']: f for f in info.get('filters', [])}
+        lot_size = filters.get('LOT_SIZE', {})
+        price_filter = filters.get('PRICE_FILTER', {})
+        notional = filters.get('MIN_NOTIONAL') or filters.get('NOTIONAL') or {}
+        min_notional = notional.get('minNotional', notional.get('notional'))
+
+        if 'FUTURES' in market:
+            precision = int(info['quantityPrecision'])
+        else:
+            precision = _increment_precision(lot_size['minQty']) if 'minQty' in lot_size else 0
+
+        rules[info['symbol']] = _rule(info['symbol'], precision,
+                                      lot_size=float(lot_size['stepSize']) if 'stepSize' in lot_size else None,
+                                      min_qty=float(lot_size['minQty']) if 'minQty' in lot_size else None,
+                                      tick_size=float(price_filter['tickSize']) if 'tickSize' in price_filter else None,
+                                      min_notional=float(min_notional) if min_notional is not None else None)
+    return rules
+
+
+def _coinbase_rules(client):
+    rules = {}
+    for product in client.get_products():
+        min_funds = product.get('min_market_funds')
+        rules[product['id']] = _rule(product['id'],
+                                     len(product['base_increment'].split('.')[1].split('1')[0]) + 1,
+                                     lot_size=float(product['base_increment']),
+                                     min_qty=float(product['base_min_size']) if product.get('base_min_size') else None,
+                                     tick_size=float(product['quote_increment']),
+                                     min_notional=float(min_funds) if min_funds else None)
+    return rules
+
+
+def _okex_spot_rules(client):
+    rules = {}
+    for pair in client.get_instruments():
+        rules[pair['instrument_id']] = _rule(pair['instrument_id'],
+                                             len(pair['size_increment'].split('.')[1].split('1')[0]) + 1,
+                                             lot_size=float(pair['size_increment']),
+                                             min_qty=float(pair['min_size']),
+                                             tick_size=float(pair['tick_size']))
+    return rules
+
+
+class SymbolRules:
+    def __init__(self, exchange, market, client, ttl=SYMBOL_RULES_TTL, path=None):
+        """
+
+        Parameters
+        ----------
+        exchange string; e.g. 'BINANCE'
+        market string; e.g. 'SPOT', 'USDT-FUTURES'
+        client object; REST client the rules are downloaded with (Coinbase public client for Coinbase)
+        ttl float; seconds before persisted rules are downloaded again
+        path string; json file the rules are persisted to
+        """
+        self._exchange = exchange.upper()
+        self._market = market.upper()
+        self._client = client
+        self._ttl = ttl
+        self._path = path or os.path.join(os.getcwd(), f'SYMBOL_RULES_{self._exchange}_{self._market}.json')
+
+        # symbol -> rule dict; replaced as a whole on refresh, never mutated;
+        self._rules = {}
+        self._updated = 0
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread = None
+
+        if self.is_static:
+            return
+
+        self._load()
+        if time.time() - self._updated > self._ttl:
+            try:
+                self.refresh()
+            except Exception as e:
+                if not self._rules:
+                    raise
+                print(f'SYMBOL RULES REFRESH FAILED, USING CACHED {self._path}: {e}')
+
+        self.start_background_refresh()
+
+    @property
+    def is_static(self):
+        return self._exchange == 'DERIBIT' or (self._exchange == 'OKEX' and 'FUTURES' in self._market)
+
+    def get(self, symbol):
+        """
+        Returns the rule dict of a symbol, None when the symbol is unknown
+        """
+        if self.is_static:
+            # Deribit trades in contracts of 10 USD, OKEx futures in whole contracts;
+            return _rule(symbol, 0, lot_size=10 if self._exchange == 'DERIBIT' else 1)
+        return self._rules.get(symbol)
+
+    def refresh(self):
+        with self._refresh_lock:
+            if self._exchange == 'BINANCE':
+                rules = _binance_rules(self._market, self._client)
+            elif self._exchange == 'COINBASE':
+                rules = _coinbase_rules(self._client)
+            elif self._exchange == 'OKEX':
+                rules = _okex_spot_rules(self._client)
+            else:
+                raise Exception(f'Symbol rules are not supported for {self._exchange}!')
+
+            self._rules = rules
+            self._updated = time.time()
+            self._save()
+            print(f'SYMBOL RULES REFRESHED: {self._exchange} {self._market} {len(rules)} symbols')
+
+    def _load(self):
+        if not os.path.exists(self._path):
+            return
+        try:
+            with open(self._path) as f:
+                data = json.load(f)
+            self._rules = data['rules']
+            self._updated = data['updated']
+        except Exception as e:
+            print(f'CANNOT READ {self._path}: {e}')
+
+    def _save(self):
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'updated': self._updated, 'rules': self._rules}, f)
+        os.replace(tmp_path, self._path)
+
+    def start_background_refresh(self):
+        if self._refresh_thread is not None:
+            return
+        self._refresh_thread = threading.Thread(target=self._refresh_periodically, daemon=True)
+        self._refresh_thread.start()
+
+    def _refresh_periodically(self):
+        while True:
+            time.sleep(max(self._ttl - (time.time() - self._updated), 1))
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the last good rules, try again in a minute;
+                print(f'SYMBOL RULES REFRESH FAILED: {e}')
+                time.sleep(60)
+
+
+def get_symbol_rules(exchange, market, client):
+    """
+    Returns the process wide SymbolRules of an exchange/market, creating it on first use
+    """
+    key = (exchange.upper(), market.upper())
+    with _registry_lock:
+        if key not in _registry:
+            _registry[key] = SymbolRules(exchange, market, client)
+        return _registry[key]
+
+
+def get_symbol_rule(exchange, market, symbol, client):
+    """
+    Returns the rule dict of one symbol; downloads the rules again once when the symbol is missing (new listing)
+    """
+    rules = get_symbol_rules(exchange, market, client)
+    rule = rules.get(symbol)
+    if rule is None and not rules.is_static:
+        rules.refresh()
+        rule = rules.get(symbol)
+    if rule is None:
+        raise Exception(f'Cannot find coin {symbol} in {exchange.capitalize()}!')
+    return rule
+
+
+def min_notional(exchange, market, rule):
+    """
+    Returns the min notional of a symbol in USD, the venue default when the exchange does not publish one
+
+    The published one is in the quote of the pair (0.0001 BTC for ETHBTC) while slices are priced in USD(T), so it
+    is only used for USD(T) quoted pairs.
+    """
+    if rule is not None and rule.get('min_notional') and \
+            rule['symbol'].replace('-', '').upper().endswith(USD_QUOTES):
+        return rule['min_notional']
+    return DEFAULT_MIN_NOTIONAL.get((exchange.upper(), market.upper()))
@@ -0,0 +1,175 @@
+import asyncio
+import collections
+import time
+import weakref
+
+"""
+This is a WS Monitor, which keeps the health of one exchange WS connection;
+
+The WS manager reports every received message with the exchange event time it carries, the monitor keeps the lag
+between that time and the local clock (p50/p99 over the last LAG_SAMPLES), the message rate, the seconds since the
+last message and the ping round trip measured by heartbeat. Lags include the clock offset between the exchange and
+this host, compare them over time rather than to zero.
+
+stale_reason() says why a stream must not be traded on (disconnected, silent, or recent messages too old), None when
+it is healthy; all_metrics() returns the metrics of every monitor of the process, e.g. for the engine metrics command.
+"""
+
+LAG_SAMPLES = 1000
+# The last lags stale_reason looks at, p50 over all samples would hide a backlog that just started;
+RECENT_LAGS = 20
+RATE_INTERVAL = 1.
+PING_INTERVAL = 10.
+PING_TIMEOUT = 10.
+STALE_AFTER = 10.
+MAX_LAG_MS = 2000.
+
+_MONITORS = weakref.WeakSet()
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q / 100))]
+
+
+class StreamMonitor:
+    def __init__(self, name):
+        """
+
+        Parameters
+        ----------
+        name string; shown in the metrics, e.g. 'BINANCE USDT-FUTURES', owners append what they stream
+        """
+        self.name = name
+
+        self.connected = False
+        self.reconnects = 0
+        self.messages = 0
+        self.ping_rtt_ms = None
+
+        self._lags = collections.deque(maxlen=LAG_SAMPLES)
+        self._connected_at = None
+        self._last_message = None
+
+        self._rate = 0.
+        self._rate_start = time.monotonic()
+        self._rate_count = 0
+
+        _MONITORS.add(self)
+
+    @property
+    def dropped(self):
+        """
+        True while a connection that was up is down, False before the first connect
+        """
+        return not self.connected and self._connected_at is not None
+
+    def on_connect(self, reconnect=False):
+        self.connected = True
+        self._connected_at = time.monotonic()
+        if reconnect:
+            self.reconnects += 1
+
+    def on_disconnect(self):
+        self.connected = False
+        self.ping_rtt_ms = None
+
+    def on_message(self, exchange_time=None):
+        """
+        Called by the WS manager for every received message, keep it cheap
+
+        Parameters
+        ----------
+        exchange_time int; epoch ms the exchange stamped the event with, None if the message has none
+        """
+        now = time.monotonic()
+        self._last_message = now
+        self.messages += 1
+
+        self._rate_count += 1
+        if now - self._rate_start >= RATE_INTERVAL:
+            self._rate = self._rate_count / (now - self._rate_start)
+            self._rate_start = now
+            self._rate_count = 0
+
+        if exchange_time is not None:
+            self._lags.append(time.time() * 1e3 - exchange_time)
+
+    def silence(self):
+        """
+        Seconds since the last message, or since the connect if nothing came yet; None if never connected
+        """
+        last = self._last_message if self._last_message is not None else self._connected_at
+        if last is None:
+            return None
+        return time.monotonic() - last
+
+    def msg_rate(self):
+        elapsed = time.monotonic() - self._rate_start
+        # No message closed the interval, the last rate would stay up forever;
+        if elapsed >= 2 * RATE_INTERVAL:
+            return self._rate_count / elapsed
+        return self._rate
+
+    def stale_reason(self, stale_after=STALE_AFTER, max_lag_ms=MAX_LAG_MS):
+        """
+        Why the stream is stale, None when it is not
+
+        Parameters
+        ----------
+        stale_after float; seconds without any message
+        max_lag_ms float; median lag of the last RECENT_LAGS messages
+        """
+        if not self.connected:
+            return 'disconnected'
+
+        silence = self.silence()
+        if silence > stale_after:
+            return f'no message for {silence:.1f}s'
+
+        recent = sorted(list(self._lags)[-RECENT_LAGS:])
+        if recent and _percentile(recent, 50) > max_lag_ms:
+            return f'messages {_percentile(recent, 50):.0f}ms behind the exchange'
+        return None
+
+    def metrics(self):
+        lags = sorted(self._lags.copy())
+        lag_p50, lag_p99 = _percentile(lags, 50), _percentile(lags, 99)
+        silence = self.silence()
+        return {'name': self.name,
+                'connected': self.connected,
+                'reconnects': self.reconnects,
+                'messages': self.messages,
+                'msg_rate': round(self.msg_rate(), 2),
+                'lag_p50_ms': round(lag_p50, 3) if lag_p50 is not None else None,
+                'lag_p99_ms': round(lag_p99, 3) if lag_p99 is not None else None,
+                'ping_rtt_ms': self.ping_rtt_ms,
+                'silence': round(silence, 3) if silence is not None else None,
+                'stale': self.stale_reason()}
+
+    async def heartbeat(self, ws_manager, interval=PING_INTERVAL, timeout=PING_TIMEOUT):
+        """
+        Pings ws_manager.ws every interval seconds and keeps the round trip, runs on the manager's event loop
+        """
+        while ws_manager.keep_running:
+            await asyncio.sleep(interval)
+            if not ws_manager.ws.open:
+                continue
+
+            start = time.monotonic()
+            try:
+                pong = await ws_manager.ws.ping()
+                await asyncio.wait_for(pong, timeout)
+            except Exception:
+                # The connection dropped meanwhile or did not answer, receive_message reconnects;
+                self.ping_rtt_ms = None
+                continue
+            self.ping_rtt_ms = round((time.monotonic() - start) * 1e3, 3)
+
+
+def all_metrics():
+    """
+    Metrics of every WS connection of the process
+    """
+    return [monitor.metrics() for monitor in list(_MONITORS)]
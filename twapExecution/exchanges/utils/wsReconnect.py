@@ -0,0 +1,100 @@
+import asyncio
+import random
+import time
+
+"""
+This is a WS Reconnect, which (re)connects the WS managers;
+
+connect(ws_manager, error) calls the manager's _connect (connect, log in, send every subscription) until it succeeds
+or the manager is closed. After a drop every attempt waits first: delays grow exponentially from base to cap with
+full jitter, so the managers of one host do not hammer a venue in lockstep after it dropped all of them, and the
+attempts only start over once a connection stayed up for stable_after seconds. Once reconnected, the manager's
+on_reconnect hook runs off the event loop, e.g. UserStreamMultiplexer.recover fetching the fills missed meanwhile.
+
+The manager's StreamMonitor is told about every connect and drop, its heartbeat starts with the first connect.
+"""
+
+RECONNECT_BASE = 0.5
+RECONNECT_CAP = 30.
+RECONNECT_STABLE_AFTER = 60.
+
+
+class Backoff:
+    def __init__(self, base=RECONNECT_BASE, cap=RECONNECT_CAP, factor=2., stable_after=RECONNECT_STABLE_AFTER,
+                 rng=None):
+        """
+
+        Parameters
+        ----------
+        base float; seconds, upper bound of the first delay
+        cap float; seconds, upper bound of any delay
+        factor float; growth of the upper bound per failed attempt
+        stable_after float; seconds a connection has to stay up to reset the attempts
+        rng random.Random; jitter source
+        """
+        self._base = base
+        self._cap = cap
+        self._factor = factor
+        self._stable_after = stable_after
+        self._rng = rng or random.Random()
+
+        self.attempts = 0
+        self._connected_at = None
+
+    def next_delay(self):
+        """
+        Seconds to wait before the next attempt, uniform in [0, min(cap, base * factor ** attempts)]
+        """
+        if self._connected_at is not None and time.monotonic() - self._connected_at >= self._stable_after:
+            self.attempts = 0
+        self._connected_at = None
+
+        delay = self._rng.uniform(0, min(self._cap, self._base * self._factor ** self.attempts))
+        self.attempts += 1
+        return delay
+
+    def connected(self):
+        self._connected_at = time.monotonic()
+
+
+async def connect(ws_manager, error=None):
+    """
+    Connects ws_manager, retrying with backoff; returns True once connected, False if it was closed meanwhile
+
+    Parameters
+    ----------
+    ws_manager WS manager; with keep_running, _backoff, monitor, _connect() and on_reconnect
+    error Exception; what dropped the previous connection, None on the first connect
+    """
+    reconnecting = error is not None
+    name = type(ws_manager).__name__
+    if reconnecting:
+        ws_manager.monitor.on_disconnect()
+
+    # The backoff attempts only start over once a connection stayed up, count the ones of this reconnect here;
+    attempts = 0
+    while ws_manager.keep_running:
+        if error is not None:
+            delay = ws_manager._backoff.next_delay()
+            print(f'ERROR: {name} DISCONNECTED ({error}), RECONNECTING IN {delay:.2f}s')
+            await asyncio.sleep(delay)
+            if not ws_manager.keep_running:
+                break
+
+        attempts += 1
+        try:
+            await ws_manager._connect()
+        except Exception as e:
+            error = e
+            continue
+
+        ws_manager._backoff.connected()
+        ws_manager.monitor.on_connect(reconnecting)
+        if reconnecting:
+            print(f'{name} RECONNECTED AFTER {attempts} ATTEMPT(S)')
+            if ws_manager.on_reconnect is not None:
+                asyncio.get_event_loop().run_in_executor(None, ws_manager.on_reconnect)
+        else:
+            ws_manager._heartbeat = asyncio.ensure_future(ws_manager.monitor.heartbeat(ws_manager))
+        return True
+    return False
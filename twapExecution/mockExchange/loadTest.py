@@ -0,0 +1,147 @@
+import argparse
+import asyncio
+import os
+import threading
+import time
+
+# The clients read their urls from env_vars on import, point them at the mock exchange first;
+os.environ['TWAP_ENVIRONMENT'] = 'MOCK'
+
+from twapExecution.exchanges.binance.binanceWSManager import BinanceWSManager
+from twapExecution.exchanges.coinbase.coinbaseWSManager import CoinbaseWSManager
+from twapExecution.exchanges.deribit.deribitWSManager import DeribitWSManager
+from twapExecution.exchanges.huobi.huobiWSManager import HuobiWSManager
+from twapExecution.exchanges.okex.okexWSManager import OkexWSManager
+from twapExecution.mockExchange.mockServer import MockExchange
+
+"""
+This is a Mock Exchange Load Test, which drives the real WS managers against the mock exchange;
+
+Starts the mock server in a background thread, opens the ticker (or, with --user, the user) stream of every venue
+through its WS manager and counts what reaches the callbacks. Reports msgs/sec, the longest gap between two
+messages and the server side disconnects/connections, so the managers' reconnect path shows up as
+connections > streams and a max gap around the reconnect time.
+"""
+
+# venue -> (WS manager factory, ticker stream starter, user stream starter)
+STREAMS = {'BINANCE_SPOT': (lambda: BinanceWSManager('spot'),
+                            lambda ws, cb: ws.start_ticker_stream(['btcusdt'], cb),
+                            lambda ws, cb: ws.start_user_stream(cb)),
+           'BINANCE_USDT_FUTURES': (lambda: BinanceWSManager('usdt-futures'),
+                                    lambda ws, cb: ws.start_ticker_stream(['btcusdt'], cb),
+                                    lambda ws, cb: ws.start_user_stream(cb)),
+           'OKEX': (lambda: OkexWSManager('spot'),
+                    lambda ws, cb: ws.start_ticker_stream(['BTC-USDT'], cb),
+                    lambda ws, cb: ws.start_user_stream('BTC-USDT', cb)),
+           'COINBASE': (lambda: CoinbaseWSManager(),
+                        lambda ws, cb: ws.start_ticker_stream(['BTC-USD'], cb),
+                        lambda ws, cb: ws.start_user_stream(['BTC-USD'], cb)),
+           'DERIBIT': (lambda: DeribitWSManager('SUB1'),
+                       lambda ws, cb: ws.start_ticker_stream(['BTC-PERPETUAL'], cb),
+                       lambda ws, cb: ws.start_user_stream('BTC-PERPETUAL', cb)),
+           'HUOBI': (lambda: HuobiWSManager('spot'),
+                     None,
+                     lambda ws, cb: ws.start_user_stream('btcusdt', cb))}
+
+
+class StreamCounter:
+    def __init__(self):
+        self.count = 0
+        self.first = None
+        self.last = None
+        self.max_gap = 0.
+
+    def __call__(self, message):
+        now = time.monotonic()
+        if self.last is not None:
+            self.max_gap = max(self.max_gap, now - self.last)
+        else:
+            self.first = now
+        self.last = now
+        self.count += 1
+
+
+class MockServerThread(threading.Thread):
+    def __init__(self, mock):
+        super().__init__(daemon=True)
+        self._mock = mock
+        self.ready = threading.Event()
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(self._mock.start())
+        self.ready.set()
+        loop.run_forever()
+
+
+def run_load_test(venues=None, seconds=10., user=False, **kwargs):
+    """
+
+    Parameters
+    ----------
+    venues list; venues of STREAMS to drive, every one by default
+    seconds float; how long the streams are counted for
+    user bool; drive the user streams instead of the ticker streams (set user_rate to get messages)
+    kwargs; rate, latency_ms, disconnect_every, user_rate, seed as MockVenue
+
+    Returns
+    -------
+    report: dict; venue -> stream and server stats
+    """
+    venues = [venue.upper() for venue in venues] if venues else list(STREAMS)
+    mock = MockExchange(venues=venues, **kwargs)
+    server = MockServerThread(mock)
+    server.start()
+    server.ready.wait()
+
+    counters = {}
+    for venue in venues:
+        factory, ticker_stream, user_stream = STREAMS[venue]
+        stream = user_stream if user else ticker_stream
+        if stream is None:
+            continue
+
+        ws = factory()
+        # Nothing joins the managers, let the process exit with them still connected;
+        ws.daemon = True
+        counters[venue] = StreamCounter()
+        stream(ws, counters[venue])
+
+    start = time.monotonic()
+    time.sleep(seconds)
+    elapsed = time.monotonic() - start
+
+    report = {}
+    for venue, counter in counters.items():
+        stats = mock.venues[venue].stats
+        report[venue] = {'messages': counter.count,
+                         'msgs_per_sec': counter.count / elapsed,
+                         'max_gap_ms': counter.max_gap * 1e3,
+                         'server_disconnects': stats['disconnects'],
+                         'server_connections': stats['ws_connections'],
+                         'server_messages_out': stats['ws_messages_out']}
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='----MOCK EXCHANGE LOAD TEST----')
+    parser.add_argument('--venues', nargs='+', default=None, help=f'any of {" ".join(STREAMS)}')
+    parser.add_argument('--seconds', type=float, default=10.)
+    parser.add_argument('--user', action='store_true', help='user streams instead of ticker streams')
+    parser.add_argument('--rate', type=float, default=100., help='public msgs/sec per subscribed stream')
+    parser.add_argument('--latency-ms', type=float, default=0.)
+    parser.add_argument('--disconnect-every', type=float, default=0.)
+    parser.add_argument('--user-rate', type=float, default=0.)
+    parser.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+
+    report = run_load_test(args.venues, args.seconds, args.user, rate=args.rate, latency_ms=args.latency_ms,
+                           disconnect_every=args.disconnect_every, user_rate=args.user_rate, seed=args.seed)
+
+    print()
+    for venue, stats in report.items():
+        print(f'{venue:<22}' + '  '.join(f'{key} {value:.1f}' if isinstance(value, float) else f'{key} {value}'
+                                         for key, value in stats.items()))
+    os._exit(0)
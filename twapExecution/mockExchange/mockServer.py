@@ -0,0 +1,1067 @@
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import math
+import random
+import time
+import urllib.parse
+import zlib
+from datetime import datetime
+
+from aiohttp import web, WSMsgType
+
+from twapExecution.exchanges.env import load_environment
+
+"""
+This is a Mock Exchange Server, which speaks the REST and websocket dialect of every venue closely enough for the
+existing clients and WS managers, so they can be load tested and taken through disconnects without keys or network;
+
+Every venue listens on the port of its MOCK url in config.json (TWAP_ENVIRONMENT=MOCK points the clients at it).
+Prices are seeded random walks, market orders fill at once and are pushed on the user stream in the venue's own
+format: Binance user data messages, OKEx deflate compressed tables, Coinbase user channel, Deribit JSON-RPC
+notifications and Huobi v2 pushes. Public streams tick at rate msgs/sec per subscription, latency_ms delays every
+REST response and websocket message, and disconnect_every closes every websocket on the venue periodically.
+"""
+
+FEED_INTERVAL = 0.01
+
+# Fills kept per venue for the REST endpoints serving them back;
+MAX_FILLS = 10000
+
+# Symbols listed by the instrument endpoints, other symbols are priced as soon as they are asked for;
+DEFAULT_SYMBOLS = {'BINANCE_SPOT': ['BTCUSDT', 'ETHUSDT', 'BNBUSDT'],
+                   'BINANCE_USDT_FUTURES': ['BTCUSDT', 'ETHUSDT'],
+                   'BINANCE_COIN_FUTURES': ['BTCUSD_PERP', 'ETHUSD_PERP'],
+                   'OKEX': ['BTC-USDT', 'ETH-USDT'],
+                   'COINBASE': ['BTC-USD', 'ETH-USD'],
+                   'DERIBIT': ['BTC-PERPETUAL', 'ETH-PERPETUAL'],
+                   'HUOBI': ['btcusdt', 'ethusdt']}
+
+START_PRICES = {'BTC': 50000., 'ETH': 3000., 'BNB': 400.}
+
+# Levels per side of the Binance depth book, one bps apart from the touch;
+DEPTH_LEVELS = 20
+# Legs per futures batchOrders request, as Binance;
+BATCH_ORDERS_LIMIT = 5
+
+
+def _iso(ms):
+    return datetime.utcfromtimestamp(ms / 1e3).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def _now_ms():
+    return int(time.time() * 1e3)
+
+
+class MockConnection:
+    def __init__(self, ws):
+        self.ws = ws
+        self.topics = set()
+
+
+class MockVenue:
+    def __init__(self, name, url, ws_path, rate=10., latency_ms=0., disconnect_every=0., user_rate=0., seed=0,
+                 fee_rate=0.001, volatility_bps=1.):
+        """
+
+        Parameters
+        ----------
+        name string; e.g. 'BINANCE_SPOT'
+        url string; REST url of the venue in config.json, the port is listened on and the path prefixes the routes
+        ws_path string; websocket route, None for REST only venues
+        rate float; public messages/sec pushed on every subscribed public topic
+        latency_ms float; delay of every REST response and websocket message
+        disconnect_every float; seconds between two server side drops of every websocket, 0 never
+        user_rate float; synthetic fills/sec pushed on every subscribed user topic, 0 only real orders fill
+        seed int; price walk seed
+        fee_rate float; taker fee reported to the clients
+        volatility_bps float; std of the price walk per public message
+        """
+        parsed_url = urllib.parse.urlparse(url)
+        self.name = name
+        self.host = parsed_url.hostname
+        self.port = parsed_url.port
+        self.prefix = parsed_url.path.rstrip('/')
+        self._ws_path = ws_path
+
+        self._rate = rate
+        self._latency = latency_ms / 1e3
+        self._disconnect_every = disconnect_every
+        self._user_rate = user_rate
+        self._fee_rate = fee_rate
+        self._volatility = volatility_bps / 1e4
+        self._rng = random.Random(f'{seed}_{name}')
+
+        self._prices = {}
+        self._connections = set()
+        self._order_ids = itertools.count(1)
+        self._trade_ids = itertools.count(1)
+        # Recent fills, for the venues whose REST serves them back (fill recovery);
+        self.fills = collections.deque(maxlen=MAX_FILLS)
+        self._tasks = []
+        self._runner = None
+
+        self.stats = dict(rest_requests=0, ws_connections=0, ws_messages_in=0, ws_messages_out=0, disconnects=0,
+                          orders=0, fills_pushed=0)
+
+    def price(self, symbol, step=False):
+        key = self.price_key(symbol)
+        if key not in self._prices:
+            base = next((p for coin, p in START_PRICES.items() if key.startswith(coin)), 100.)
+            self._prices[key] = base * (1 + self._rng.uniform(-0.01, 0.01))
+        if step:
+            self._prices[key] *= math.exp(self._rng.gauss(0, self._volatility))
+        return self._prices[key]
+
+    def top_of_book(self, symbol, step=False):
+        price = self.price(symbol, step)
+        return price * (1 - 1e-4), price * (1 + 1e-4)
+
+    @staticmethod
+    def price_key(symbol):
+        return symbol.upper()
+
+    def routes(self):
+        return []
+
+    async def on_ws_message(self, conn, data):
+        pass
+
+    async def on_ws_connect(self, conn):
+        pass
+
+    def public_message(self, topic):
+        """
+        Next message of a public topic, None if the topic is a user topic
+        """
+        return None
+
+    def user_messages(self, fill):
+        """
+        (topic, message) pairs pushing a fill on the user streams
+        """
+        return []
+
+    def user_topic_symbol(self, topic):
+        """
+        Symbol a user topic carries fills of, None if the topic is public
+        """
+        return None
+
+    def encode(self, message):
+        return json.dumps(message)
+
+    def match_orders(self):
+        """
+        Fills the resting limit orders the price walked through, on the venues that take limit orders
+        """
+        pass
+
+    def fill(self, symbol, side, qty, client_order_id=None, price=None, order_id=None, **extra):
+        """
+        Fills a market order at the walk price plus half spread (a resting order at its price) and pushes it on the
+        user streams
+        """
+        bid, ask = self.top_of_book(symbol)
+        ms = _now_ms()
+        order_id = order_id if order_id is not None else next(self._order_ids)
+        if price is None:
+            price = ask if 'BUY' in side.upper() else bid
+        fill = dict(symbol=symbol, side=side.upper(), qty=float(qty), price=price,
+                    order_id=order_id, trade_id=next(self._trade_ids),
+                    client_order_id=client_order_id or f'mock{order_id}', ms=ms, **extra)
+        self.stats['orders'] += 1
+        self.fills.append(fill)
+        self.push_fill(fill)
+        return fill
+
+    def push_fill(self, fill):
+        for topic, message in self.user_messages(fill):
+            self.stats['fills_pushed'] += self.publish(topic, message)
+
+    def publish(self, topic, message):
+        """
+        Sends a message to every connection subscribed to topic; returns the number of connections
+        """
+        data = None
+        n = 0
+        for conn in list(self._connections):
+            if topic in conn.topics:
+                data = data if data is not None else self.encode(message)
+                self.send(conn, data, encoded=True)
+                n += 1
+        return n
+
+    def send(self, conn, message, encoded=False):
+        data = message if encoded else self.encode(message)
+        if self._latency > 0:
+            asyncio.get_event_loop().call_later(self._latency, self._send_now, conn, data)
+        else:
+            self._send_now(conn, data)
+
+    def _send_now(self, conn, data):
+        if conn.ws.closed:
+            return
+        self.stats['ws_messages_out'] += 1
+        if isinstance(data, bytes):
+            asyncio.ensure_future(self._write(conn.ws.send_bytes(data)))
+        else:
+            asyncio.ensure_future(self._write(conn.ws.send_str(data)))
+
+    @staticmethod
+    async def _write(coroutine):
+        try:
+            await coroutine
+        except (ConnectionResetError, RuntimeError):
+            pass
+
+    async def _handle_ws(self, request):
+        ws = web.WebSocketResponse(autoping=True)
+        await ws.prepare(request)
+
+        conn = MockConnection(ws)
+        self._connections.add(conn)
+        self.stats['ws_connections'] += 1
+        await self.on_ws_connect(conn)
+
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.TEXT:
+                    self.stats['ws_messages_in'] += 1
+                    await self.on_ws_message(conn, msg.data)
+                elif msg.type == WSMsgType.ERROR:
+                    break
+        finally:
+            self._connections.discard(conn)
+        return ws
+
+    async def _feed(self):
+        due_public, due_user = 0., 0.
+        last = time.monotonic()
+
+        while True:
+            await asyncio.sleep(FEED_INTERVAL)
+            now = time.monotonic()
+            due_public += self._rate * (now - last)
+            due_user += self._user_rate * (now - last)
+            last = now
+
+            n_public, n_user = int(due_public), int(due_user)
+            due_public -= n_public
+            due_user -= n_user
+
+            user_topics = set()
+            for conn in list(self._connections):
+                for topic in list(conn.topics):
+                    if self.user_topic_symbol(topic) is not None:
+                        user_topics.add(topic)
+                        continue
+                    for _ in range(n_public):
+                        message = self.public_message(topic)
+                        if message is not None:
+                            self.send(conn, message)
+
+            # A fill is published to every connection on its topic, so one per topic, not per connection;
+            for topic in user_topics:
+                for _ in range(n_user):
+                    self.fill(self.user_topic_symbol(topic), 'BUY', 1)
+
+            self.match_orders()
+
+    async def _disconnect(self):
+        while True:
+            await asyncio.sleep(self._disconnect_every)
+            for conn in list(self._connections):
+                self.stats['disconnects'] += 1
+                await conn.ws.close(code=1012, message=b'mock restart')
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        self.stats['rest_requests'] += 1
+        if self._latency > 0 and request.headers.get('Upgrade', '').lower() != 'websocket':
+            await asyncio.sleep(self._latency)
+        return await handler(request)
+
+    @staticmethod
+    async def params(request):
+        """
+        Query string and body of a request as one dict, body json or form encoded
+        """
+        params = dict(request.query)
+        if request.can_read_body:
+            body = await request.text()
+            if body:
+                try:
+                    params.update(json.loads(body))
+                except ValueError:
+                    params.update(dict(urllib.parse.parse_qsl(body)))
+        return params
+
+    def app(self):
+        app = web.Application(middlewares=[self._middleware])
+        app.add_routes(self.routes())
+        if self._ws_path is not None:
+            app.add_routes([web.get(self._ws_path, self._handle_ws)])
+        return app
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+        self._tasks.append(asyncio.ensure_future(self._feed()))
+        if self._disconnect_every > 0:
+            self._tasks.append(asyncio.ensure_future(self._disconnect()))
+        print(f'MOCK {self.name} LISTENING ON {self.host}:{self.port}{self.prefix}')
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        for conn in list(self._connections):
+            await conn.ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+class BinanceVenue(MockVenue):
+    LISTEN_KEY = 'mockListenKey'
+
+    def __init__(self, market, url, ws_url, **kwargs):
+        self.market = market.upper()
+        super().__init__(f'BINANCE_{self.market.replace("-", "_")}', url, urllib.parse.urlparse(ws_url).path,
+                         **kwargs)
+        # orderId -> resting limit order;
+        self._open_orders = {}
+        # symbol -> {'bids': {price: qty}, 'asks': {price: qty}, 'u': last update id}, moved by the diff stream;
+        self._books = {}
+
+    def routes(self):
+        p = self.prefix + '/{version}'
+        return [web.get(p + '/time', self._time),
+                web.get(p + '/exchangeInfo', self._exchange_info),
+                web.get(p + '/account', self._account),
+                web.get(p + '/commissionRate', self._commission_rate),
+                web.get(p + '/ticker/price', self._ticker_price),
+                web.post(p + '/userDataStream', self._listen_key),
+                web.put(p + '/userDataStream', self._listen_key),
+                web.post(p + '/listenKey', self._listen_key),
+                web.put(p + '/listenKey', self._listen_key),
+                web.post(p + '/order', self._order),
+                web.get(p + '/order', self._order_status),
+                web.delete(p + '/order', self._cancel),
+                web.get(p + '/allOrders', self._all_orders),
+                web.get(p + '/myTrades', self._trades),
+                web.get(p + '/userTrades', self._trades),
+                web.post(p + '/leverage', self._leverage),
+                web.post(p + '/positionSide/dual', self._position_mode),
+                web.get(p + '/depth', self._depth)] + \
+            ([web.post(p + '/batchOrders', self._batch_orders)] if 'FUTURES' in self.market else [])
+
+    async def _time(self, request):
+        return web.json_response({'serverTime': _now_ms()})
+
+    async def _exchange_info(self, request):
+        futures = 'FUTURES' in self.market
+        symbols = [{'symbol': symbol,
+                    'status': 'TRADING',
+                    'quantityPrecision': 3,
+                    'pricePrecision': 2,
+                    'filters': [{'filterType': 'PRICE_FILTER', 'tickSize': '0.01'},
+                                {'filterType': 'LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001'},
+                                {'filterType': 'MIN_NOTIONAL', 'notional': '5'} if futures else
+                                {'filterType': 'MIN_NOTIONAL', 'minNotional': '10'}]}
+                   for symbol in DEFAULT_SYMBOLS[self.name]]
+        return web.json_response({'timezone': 'UTC', 'serverTime': _now_ms(), 'symbols': symbols})
+
+    async def _account(self, request):
+        if self.market == 'SPOT':
+            return web.json_response({'makerCommission': int(self._fee_rate * 1e4),
+                                      'takerCommission': int(self._fee_rate * 1e4),
+                                      'balances': [{'asset': 'BNB', 'free': '0', 'locked': '0'},
+                                                   {'asset': 'USDT', 'free': '1000000', 'locked': '0'}]})
+        return web.json_response({'assets': [], 'positions': []})
+
+    async def _commission_rate(self, request):
+        return web.json_response({'symbol': request.query.get('symbol'),
+                                  'makerCommissionRate': str(self._fee_rate / 2),
+                                  'takerCommissionRate': str(self._fee_rate)})
+
+    async def _ticker_price(self, request):
+        symbol = request.query['symbol']
+        return web.json_response({'symbol': symbol, 'price': f'{self.price(symbol):.2f}', 'time': _now_ms()})
+
+    async def _listen_key(self, request):
+        return web.json_response({'listenKey': self.LISTEN_KEY})
+
+    async def _order(self, request):
+        params = await self.params(request)
+        if params.get('type') in ('LIMIT', 'LIMIT_MAKER'):
+            order = self._limit_order(params)
+            return web.json_response(order, status=400 if 'code' in order else 200)
+        fill = self.fill(params['symbol'], params['side'], params['quantity'], params.get('newClientOrderId'))
+        return web.json_response(self._order_json(fill))
+
+    async def _batch_orders(self, request):
+        orders = json.loads((await self.params(request))['batchOrders'])
+        if len(orders) > BATCH_ORDERS_LIMIT:
+            return web.json_response({'code': -1130, 'msg': "Data sent for parameter 'batchOrders' is not valid."},
+                                     status=400)
+        responses = []
+        for params in orders:
+            if params['symbol'] not in DEFAULT_SYMBOLS[self.name]:
+                responses.append({'code': -1121, 'msg': 'Invalid symbol.'})
+            elif params.get('type') in ('LIMIT', 'LIMIT_MAKER'):
+                responses.append(self._limit_order(params))
+            else:
+                responses.append(self._order_json(self.fill(params['symbol'], params['side'], params['quantity'],
+                                                            params.get('newClientOrderId'))))
+        return web.json_response(responses)
+
+    def _limit_order(self, params):
+        side, price = params['side'].upper(), float(params['price'])
+        bid, ask = self.top_of_book(params['symbol'])
+        marketable = price >= ask if side == 'BUY' else price <= bid
+        post_only = params.get('timeInForce') == 'GTX' or params.get('type') == 'LIMIT_MAKER'
+
+        if marketable and not post_only:
+            return self._order_json(self.fill(params['symbol'], side, params['quantity'],
+                                              params.get('newClientOrderId'), price=price))
+
+        # A post only order that would take is rejected, LIMIT_MAKER on spot, GTX on futures;
+        if marketable and params.get('type') == 'LIMIT_MAKER':
+            return {'code': -2010, 'msg': 'Order would immediately match and take.'}
+        if marketable:
+            return {'code': -5022, 'msg': 'Due to the order could not be executed as maker, the Post Only order will be '
+                                          'rejected. The order will not be recorded in the order history'}
+
+        order_id = next(self._order_ids)
+        order = dict(symbol=params['symbol'], side=side, qty=float(params['quantity']), price=price,
+                     order_id=order_id, client_order_id=params.get('newClientOrderId') or f'mock{order_id}',
+                     ms=_now_ms())
+        self._open_orders[order_id] = order
+        return dict(self._order_json(order), type='LIMIT', status='NEW', executedQty='0')
+
+    def match_orders(self):
+        for order_id, order in list(self._open_orders.items()):
+            bid, ask = self.top_of_book(order['symbol'])
+            if ask <= order['price'] if order['side'] == 'BUY' else bid >= order['price']:
+                del self._open_orders[order_id]
+                self.fill(order['symbol'], order['side'], order['qty'], order['client_order_id'],
+                          price=order['price'], order_id=order_id)
+
+    async def _cancel(self, request):
+        order = self._open_orders.pop(int(request.query['orderId']), None)
+        if order is None:
+            return web.json_response({'code': -2011, 'msg': 'Unknown order sent.'}, status=400)
+        return web.json_response(dict(self._order_json(order), type='LIMIT', status='CANCELED', executedQty='0'))
+
+    @staticmethod
+    def _order_json(fill):
+        return {'symbol': fill['symbol'],
+                'orderId': fill['order_id'],
+                'clientOrderId': fill['client_order_id'],
+                'transactTime': fill['ms'],
+                'time': fill['ms'],
+                'updateTime': fill['ms'],
+                'status': 'FILLED',
+                'type': 'MARKET',
+                'side': fill['side'],
+                'origQty': str(fill['qty']),
+                'executedQty': str(fill['qty']),
+                'avgPrice': str(fill['price'])}
+
+    def _fills_since(self, request):
+        symbol = request.query['symbol']
+        start = int(request.query.get('startTime', 0))
+        return [fill for fill in self.fills if fill['symbol'] == symbol and fill['ms'] >= start]
+
+    async def _order_status(self, request):
+        order_id = int(request.query['orderId'])
+        if order_id in self._open_orders:
+            return web.json_response(dict(self._order_json(self._open_orders[order_id]), type='LIMIT', status='NEW',
+                                          executedQty='0'))
+        for fill in self.fills:
+            if fill['order_id'] == order_id:
+                return web.json_response(self._order_json(fill))
+        return web.json_response({'code': -2013, 'msg': 'Order does not exist.'}, status=400)
+
+    async def _all_orders(self, request):
+        return web.json_response([self._order_json(fill) for fill in self._fills_since(request)])
+
+    async def _trades(self, request):
+        trades = []
+        for fill in self._fills_since(request):
+            trade = {'symbol': fill['symbol'],
+                     'id': fill['trade_id'],
+                     'orderId': fill['order_id'],
+                     'price': str(fill['price']),
+                     'qty': str(fill['qty']),
+                     'time': fill['ms']}
+            if 'FUTURES' in self.market:
+                trade['side'] = fill['side']
+            else:
+                trade['isBuyer'] = fill['side'] == 'BUY'
+            trades.append(trade)
+        return web.json_response(trades)
+
+    async def _leverage(self, request):
+        params = await self.params(request)
+        return web.json_response({'symbol': params.get('symbol'), 'leverage': int(params.get('leverage', 1)),
+                                  'maxNotionalValue': '1000000'})
+
+    async def _position_mode(self, request):
+        return web.json_response({'code': 200, 'msg': 'success'})
+
+    def _depth_levels(self, symbol, step=False):
+        bid, ask = self.top_of_book(symbol, step)
+        tick = bid * 1e-4
+        return ({f'{bid - i * tick:.2f}': f'{self._rng.uniform(0.1, 2):.3f}' for i in range(DEPTH_LEVELS)},
+                {f'{ask + i * tick:.2f}': f'{self._rng.uniform(0.1, 2):.3f}' for i in range(DEPTH_LEVELS)})
+
+    def _depth_book(self, symbol):
+        if symbol not in self._books:
+            bids, asks = self._depth_levels(symbol)
+            self._books[symbol] = {'bids': bids, 'asks': asks, 'u': next(self._trade_ids)}
+        return self._books[symbol]
+
+    def _depth_update(self, symbol, ms):
+        book = self._depth_book(symbol)
+        bids, asks = self._depth_levels(symbol, step=True)
+        # A diff carries the levels that changed, 0 for the levels that are gone, and may bundle several updates;
+        diffs = [[[price, qty] for price, qty in new.items() if old.get(price) != qty] +
+                 [[price, '0'] for price in old if price not in new]
+                 for old, new in ((book['bids'], bids), (book['asks'], asks))]
+        previous = book['u']
+        book.update(bids=bids, asks=asks, u=previous + self._rng.randint(1, 3))
+
+        message = {'e': 'depthUpdate', 'E': ms, 's': symbol, 'U': previous + 1, 'u': book['u'], 'b': diffs[0],
+                   'a': diffs[1]}
+        if 'FUTURES' in self.market:
+            message.update(T=ms, pu=previous)
+        return message
+
+    async def _depth(self, request):
+        book = self._depth_book(request.query['symbol'])
+        limit = int(request.query.get('limit', 100))
+        return web.json_response({'lastUpdateId': book['u'],
+                                  'bids': list(book['bids'].items())[:limit],
+                                  'asks': list(book['asks'].items())[:limit]})
+
+    async def on_ws_message(self, conn, data):
+        message = json.loads(data)
+        if message.get('method') == 'SUBSCRIBE':
+            conn.topics.update(message['params'])
+        elif message.get('method') == 'UNSUBSCRIBE':
+            conn.topics.difference_update(message['params'])
+        self.send(conn, {'result': None, 'id': message.get('id')})
+
+    def user_topic_symbol(self, topic):
+        return DEFAULT_SYMBOLS[self.name][0] if topic == self.LISTEN_KEY else None
+
+    def public_message(self, topic):
+        if '@' not in topic:
+            return None
+        symbol, stream = topic.split('@', 1)
+        symbol = symbol.upper()
+        ms = _now_ms()
+
+        if stream == 'bookTicker':
+            bid, ask = self.top_of_book(symbol, step=True)
+            message = {'u': next(self._trade_ids), 's': symbol, 'b': f'{bid:.2f}', 'B': '1.000', 'a': f'{ask:.2f}',
+                       'A': '1.000'}
+            if 'FUTURES' in self.market:
+                message.update(e='bookTicker', E=ms, T=ms)
+            return message
+        elif stream == 'depth@100ms':
+            return self._depth_update(symbol, ms)
+        elif stream == 'aggTrade':
+            trade_id = next(self._trade_ids)
+            return {'e': 'aggTrade', 'E': ms, 's': symbol, 'a': trade_id, 'p': f'{self.price(symbol, step=True):.2f}',
+                    'q': '0.010', 'f': trade_id, 'l': trade_id, 'T': ms, 'm': self._rng.random() < 0.5}
+
+    def user_messages(self, fill):
+        order = {'s': fill['symbol'], 'c': fill['client_order_id'], 'S': fill['side'], 'o': 'MARKET',
+                 'q': str(fill['qty']), 'X': 'FILLED', 'x': 'TRADE', 'i': fill['order_id'], 'l': str(fill['qty']),
+                 'z': str(fill['qty']), 'L': str(fill['price']), 't': fill['trade_id']}
+        if self.market == 'SPOT':
+            return [(self.LISTEN_KEY, dict(order, e='executionReport', E=fill['ms'], T=fill['ms']))]
+        return [(self.LISTEN_KEY, {'e': 'ORDER_TRADE_UPDATE', 'E': fill['ms'], 'T': fill['ms'],
+                                   'o': dict(order, ps=fill.get('position_side', 'BOTH'))})]
+
+
+class OkexVenue(MockVenue):
+    FUTURES_TYPES = {'1': 'BUY', '2': 'SELL', '3': 'SELL', '4': 'BUY'}
+
+    def __init__(self, url, ws_url, **kwargs):
+        super().__init__('OKEX', url, urllib.parse.urlparse(ws_url).path, **kwargs)
+
+    def encode(self, message):
+        # OKEx v3 sends every frame raw deflate compressed, the WS manager inflates them;
+        compressor = zlib.compressobj(-1, zlib.DEFLATED, -zlib.MAX_WBITS)
+        data = message if isinstance(message, str) else json.dumps(message)
+        return compressor.compress(data.encode('utf-8')) + compressor.flush()
+
+    def routes(self):
+        return [web.get('/api/general/v3/time', self._time),
+                web.get('/api/spot/v3/instruments/', self._instruments),
+                web.get('/api/spot/v3/instruments/{instrument_id}/ticker', self._ticker),
+                web.get('/api/spot/v3/trade_fee', self._trade_fee),
+                web.get('/api/spot/v3/accounts', self._accounts),
+                web.post('/api/spot/v3/orders', self._spot_order),
+                web.get('/api/futures/v3/instruments/{instrument_id}/ticker', self._ticker),
+                web.get('/api/futures/v3/trade_fee', self._trade_fee),
+                web.post('/api/futures/v3/order', self._futures_order),
+                web.post('/api/futures/v3/accounts/{underlying}/leverage', self._leverage)]
+
+    async def _time(self, request):
+        ms = _now_ms()
+        return web.json_response({'iso': _iso(ms), 'epoch': f'{ms / 1e3:.3f}'})
+
+    async def _instruments(self, request):
+        return web.json_response([{'instrument_id': symbol,
+                                   'base_currency': symbol.split('-')[0],
+                                   'quote_currency': symbol.split('-')[1],
+                                   'min_size': '0.0001',
+                                   'size_increment': '0.0001',
+                                   'tick_size': '0.1'}
+                                  for symbol in DEFAULT_SYMBOLS[self.name]])
+
+    def _ticker_message(self, symbol, step=False):
+        bid, ask = self.top_of_book(symbol, step)
+        return {'instrument_id': symbol, 'last': f'{self.price(symbol):.2f}', 'best_bid': f'{bid:.2f}',
+                'best_ask': f'{ask:.2f}', 'timestamp': _iso(_now_ms())}
+
+    async def _ticker(self, request):
+        return web.json_response(self._ticker_message(request.match_info['instrument_id']))
+
+    async def _trade_fee(self, request):
+        return web.json_response({'maker': str(self._fee_rate / 2), 'taker': str(self._fee_rate),
+                                  'timestamp': _iso(_now_ms())})
+
+    async def _accounts(self, request):
+        return web.json_response([{'currency': 'USDT', 'balance': '1000000', 'available': '1000000', 'hold': '0'}])
+
+    async def _spot_order(self, request):
+        params = await self.params(request)
+        symbol = params['instrument_id']
+        if 'notional' in params:
+            qty = float(params['notional']) / self.top_of_book(symbol)[1]
+        else:
+            qty = float(params['size'])
+        fill = self.fill(symbol, params['side'], qty, params.get('client_oid'), market='spot')
+        return web.json_response({'order_id': str(fill['order_id']), 'client_oid': params.get('client_oid', ''),
+                                  'result': True, 'error_code': '', 'error_message': ''})
+
+    async def _futures_order(self, request):
+        params = await self.params(request)
+        fill = self.fill(params['instrument_id'], self.FUTURES_TYPES[params['type']], params['size'],
+                         params.get('client_oid'), market='futures', type=params['type'])
+        return web.json_response({'order_id': str(fill['order_id']), 'client_oid': params.get('client_oid', ''),
+                                  'result': True, 'error_code': '0', 'error_message': ''})
+
+    async def _leverage(self, request):
+        params = await self.params(request)
+        return web.json_response({'result': 'true', 'underlying': request.match_info['underlying'].upper(),
+                                  'leverage': params.get('leverage'), 'margin_mode': 'crossed'})
+
+    async def on_ws_message(self, conn, data):
+        if data == 'ping':
+            self.send(conn, 'pong')
+            return
+
+        message = json.loads(data)
+        op = message.get('op')
+        if op == 'login':
+            self.send(conn, {'event': 'login', 'success': True})
+        elif op in ('subscribe', 'unsubscribe'):
+            for channel in message.get('args', []):
+                if op == 'subscribe':
+                    conn.topics.add(channel)
+                else:
+                    conn.topics.discard(channel)
+                self.send(conn, {'event': op, 'channel': channel})
+
+    def user_topic_symbol(self, topic):
+        table, _, symbol = topic.partition(':')
+        return symbol if table.endswith('/order') else None
+
+    def public_message(self, topic):
+        table, _, symbol = topic.partition(':')
+        if table.endswith('/ticker'):
+            return {'table': table, 'data': [self._ticker_message(symbol, step=True)]}
+
+    def user_messages(self, fill):
+        market = fill.get('market') or ('futures' if fill['symbol'].count('-') == 2 else 'spot')
+        data = {'instrument_id': fill['symbol'], 'order_id': str(fill['order_id']), 'client_oid': '',
+                'order_type': '4' if market == 'futures' else '0', 'state': '2', 'price_avg': str(fill['price']),
+                'timestamp': _iso(fill['ms'])}
+
+        if market == 'spot':
+            data.update(side=fill['side'].lower(), type='market', filled_size=str(fill['qty']),
+                        filled_notional=str(fill['qty'] * fill['price']))
+        else:
+            data.update(type=fill.get('type', '1'), size=str(int(fill['qty'])), filled_qty=str(int(fill['qty'])))
+
+        return [(f'{market}/order:{fill["symbol"]}', {'table': f'{market}/order', 'data': [data]})]
+
+
+class CoinbaseVenue(MockVenue):
+    def __init__(self, url, ws_url, **kwargs):
+        super().__init__('COINBASE', url, urllib.parse.urlparse(ws_url).path, **kwargs)
+
+    def routes(self):
+        return [web.get('/products', self._products),
+                web.get('/products/{product_id}/ticker', self._ticker),
+                web.get('/fees', self._fees),
+                web.post('/orders', self._order)]
+
+    async def _products(self, request):
+        return web.json_response([{'id': symbol,
+                                   'base_currency': symbol.split('-')[0],
+                                   'quote_currency': symbol.split('-')[1],
+                                   'base_increment': '0.00000001',
+                                   'quote_increment': '0.01',
+                                   'base_min_size': '0.0001',
+                                   'min_market_funds': '5',
+                                   'status': 'online'}
+                                  for symbol in DEFAULT_SYMBOLS[self.name]])
+
+    async def _ticker(self, request):
+        symbol = request.match_info['product_id']
+        bid, ask = self.top_of_book(symbol)
+        return web.json_response({'trade_id': next(self._trade_ids), 'price': f'{self.price(symbol):.2f}',
+                                  'size': '0.01', 'bid': f'{bid:.2f}', 'ask': f'{ask:.2f}', 'volume': '1000',
+                                  'time': _iso(_now_ms())})
+
+    async def _fees(self, request):
+        return web.json_response({'maker_fee_rate': str(self._fee_rate / 2), 'taker_fee_rate': str(self._fee_rate),
+                                  'usd_volume': '0'})
+
+    async def _order(self, request):
+        params = await self.params(request)
+        symbol = params['product_id']
+        if params.get('size') is not None:
+            qty = float(params['size'])
+        else:
+            qty = float(params['funds']) / self.top_of_book(symbol)[1]
+        fill = self.fill(symbol, params['side'], qty, params.get('client_oid'))
+        return web.json_response({'id': str(fill['order_id']), 'product_id': symbol, 'side': params['side'],
+                                  'type': 'market', 'size': str(qty), 'status': 'pending',
+                                  'created_at': _iso(fill['ms'])})
+
+    async def on_ws_message(self, conn, data):
+        message = json.loads(data)
+        channels = [channel if isinstance(channel, str) else channel['name'] for channel in message['channels']]
+        topics = {f'{channel}:{product_id}' for channel in channels for product_id in message['product_ids']}
+
+        if message.get('type') == 'subscribe':
+            conn.topics.update(topics)
+        elif message.get('type') == 'unsubscribe':
+            conn.topics.difference_update(topics)
+
+        self.send(conn, {'type': 'subscriptions',
+                         'channels': [{'name': channel, 'product_ids': sorted(topic.split(':')[1]
+                                                                              for topic in conn.topics
+                                                                              if topic.startswith(channel + ':'))}
+                                      for channel in channels]})
+
+    def user_topic_symbol(self, topic):
+        channel, _, symbol = topic.partition(':')
+        return symbol if channel == 'user' else None
+
+    def public_message(self, topic):
+        channel, _, symbol = topic.partition(':')
+        if channel == 'ticker':
+            bid, ask = self.top_of_book(symbol, step=True)
+            return {'type': 'ticker', 'sequence': next(self._trade_ids), 'product_id': symbol,
+                    'price': f'{self.price(symbol):.2f}', 'best_bid': f'{bid:.2f}', 'best_ask': f'{ask:.2f}',
+                    'side': 'buy', 'time': _iso(_now_ms()), 'trade_id': next(self._trade_ids), 'last_size': '0.01'}
+
+    def user_messages(self, fill):
+        topic = f'user:{fill["symbol"]}'
+        order_id = str(fill['order_id'])
+        common = {'product_id': fill['symbol'], 'time': _iso(fill['ms']), 'sequence': fill['trade_id']}
+        # The match side is the maker's, the opposite of the market order;
+        maker_side = 'sell' if fill['side'] == 'BUY' else 'buy'
+
+        return [(topic, dict(common, type='received', order_id=order_id, order_type='market',
+                             side=fill['side'].lower(), client_oid=fill['client_order_id'])),
+                (topic, dict(common, type='match', trade_id=fill['trade_id'], maker_order_id=f'maker{order_id}',
+                             taker_order_id=order_id, size=str(fill['qty']), price=str(fill['price']),
+                             side=maker_side)),
+                (topic, dict(common, type='done', order_id=order_id, reason='filled', remaining_size='0',
+                             side=fill['side'].lower()))]
+
+
+class DeribitVenue(MockVenue):
+    def __init__(self, url, ws_url, **kwargs):
+        super().__init__('DERIBIT', url, urllib.parse.urlparse(ws_url).path, **kwargs)
+
+    def routes(self):
+        # Deribit clients only talk JSON-RPC over the websocket, also serve it without the trailing slash;
+        return [web.get(self._ws_path.rstrip('/'), self._handle_ws)]
+
+    def _result(self, request_id, result):
+        us = int(time.time() * 1e6)
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': result, 'usIn': us, 'usOut': us, 'usDiff': 0,
+                'testnet': False}
+
+    def _ticker_data(self, symbol, step=False):
+        bid, ask = self.top_of_book(symbol, step)
+        price = self.price(symbol)
+        return {'instrument_name': symbol, 'timestamp': _now_ms(), 'state': 'open', 'mark_price': price,
+                'index_price': price, 'last_price': price, 'best_bid_price': bid, 'best_ask_price': ask,
+                'best_bid_amount': 1000, 'best_ask_amount': 1000}
+
+    async def on_ws_message(self, conn, data):
+        message = json.loads(data)
+        method, params, request_id = message.get('method'), message.get('params') or {}, message.get('id')
+
+        if method == 'public/auth':
+            result = {'access_token': 'mock', 'refresh_token': 'mock', 'expires_in': 31536000,
+                      'scope': 'connection', 'token_type': 'bearer'}
+        elif method in ('public/subscribe', 'private/subscribe'):
+            conn.topics.update(params.get('channels', []))
+            result = params.get('channels', [])
+        elif method in ('public/unsubscribe', 'private/unsubscribe'):
+            conn.topics.difference_update(params.get('channels', []))
+            result = params.get('channels', [])
+        elif method == 'public/ticker':
+            result = self._ticker_data(params['instrument_name'])
+        elif method == 'public/get_index':
+            price = self.price(f'{params["currency"]}-PERPETUAL')
+            result = {params['currency']: price, 'edp': price}
+        elif method in ('private/buy', 'private/sell'):
+            fill = self.fill(params['instrument_name'], method.split('/')[1], params['amount'], params.get('label'))
+            order = {'order_id': str(fill['order_id']), 'instrument_name': fill['symbol'],
+                     'direction': method.split('/')[1], 'amount': fill['qty'], 'filled_amount': fill['qty'],
+                     'average_price': fill['price'], 'order_type': 'market', 'order_state': 'filled',
+                     'creation_timestamp': fill['ms'], 'last_update_timestamp': fill['ms']}
+            result = {'order': order, 'trades': [self._trade(fill)]}
+        elif method == 'private/get_account_summary':
+            result = {'currency': params.get('currency', 'BTC'), 'equity': 100., 'balance': 100.,
+                      'available_funds': 100., 'fees': [{'currency': params.get('currency', 'BTC'),
+                                                         'instrument_type': 'perpetual', 'fee_type': 'relative',
+                                                         'maker_fee': self._fee_rate / 2,
+                                                         'taker_fee': self._fee_rate}]}
+        elif method == 'private/get_positions':
+            result = []
+        elif method == 'private/get_position':
+            result = {'instrument_name': params.get('instrument_name'), 'size': 0, 'direction': 'zero'}
+        elif method in ('public/test', 'public/get_time'):
+            result = _now_ms() if method == 'public/get_time' else {'version': 'mock'}
+        else:
+            self.send(conn, {'jsonrpc': '2.0', 'id': request_id,
+                             'error': {'code': -32601, 'message': 'Method not found'}})
+            return
+
+        self.send(conn, self._result(request_id, result))
+
+    def _trade(self, fill):
+        return {'trade_id': str(fill['trade_id']), 'order_id': str(fill['order_id']),
+                'instrument_name': fill['symbol'], 'direction': fill['side'].lower(), 'amount': fill['qty'],
+                'price': fill['price'], 'state': 'filled', 'order_type': 'market', 'timestamp': fill['ms'],
+                'fee': fill['qty'] * self._fee_rate / fill['price'], 'fee_currency': fill['symbol'].split('-')[0]}
+
+    def user_topic_symbol(self, topic):
+        if topic.startswith('user.trades.'):
+            return topic.split('.')[2]
+
+    def public_message(self, topic):
+        if topic.startswith('ticker.'):
+            symbol = topic.split('.')[1]
+            return {'jsonrpc': '2.0', 'method': 'subscription',
+                    'params': {'channel': topic, 'data': self._ticker_data(symbol, step=True)}}
+
+    def user_messages(self, fill):
+        topic = f'user.trades.{fill["symbol"]}.raw'
+        return [(topic, {'jsonrpc': '2.0', 'method': 'subscription',
+                         'params': {'channel': topic, 'data': [self._trade(fill)]}})]
+
+
+class HuobiVenue(MockVenue):
+    PING_INTERVAL = 20
+
+    def __init__(self, url, ws_url, **kwargs):
+        super().__init__('HUOBI', url, urllib.parse.urlparse(ws_url).path, **kwargs)
+
+    def routes(self):
+        return [web.get('/v2/market-status', self._market_status),
+                web.get('/v1/account/accounts', self._accounts),
+                web.get('/v1/account/accounts/{account_id}/balance', self._balance),
+                web.get('/v1/common/symbols', self._symbols),
+                web.get('/market/detail', self._detail),
+                web.post('/v1/order/orders/place', self._order)]
+
+    async def _market_status(self, request):
+        return web.json_response({'code': 200, 'message': 'success', 'data': {'marketStatus': 1}})
+
+    async def _accounts(self, request):
+        return web.json_response({'status': 'ok', 'data': [{'id': 1, 'type': 'spot', 'subtype': '',
+                                                            'state': 'working'}]})
+
+    async def _balance(self, request):
+        return web.json_response({'status': 'ok',
+                                  'data': {'id': int(request.match_info['account_id']), 'type': 'spot',
+                                           'state': 'working',
+                                           'list': [{'currency': 'usdt', 'type': 'trade', 'balance': '1000000'}]}})
+
+    async def _symbols(self, request):
+        return web.json_response({'status': 'ok',
+                                  'data': [{'symbol': symbol, 'base-currency': symbol[:-4],
+                                            'quote-currency': symbol[-4:], 'price-precision': 2,
+                                            'amount-precision': 4, 'min-order-value': 5, 'state': 'online'}
+                                           for symbol in DEFAULT_SYMBOLS[self.name]]})
+
+    async def _detail(self, request):
+        symbol = request.query['symbol']
+        return web.json_response({'status': 'ok', 'ch': f'market.{symbol}.detail', 'ts': _now_ms(),
+                                  'tick': {'close': self.price(symbol), 'amount': 1000, 'count': 1000}})
+
+    async def _order(self, request):
+        params = await self.params(request)
+        symbol = params['symbol']
+        side = params['type'].split('-')[0]
+        qty = float(params['amount'])
+        if side == 'buy':
+            # Huobi market buys are sized in quote currency;
+            qty /= self.top_of_book(symbol)[1]
+        fill = self.fill(symbol, side, qty, params.get('client-order-id'))
+        return web.json_response({'status': 'ok', 'data': str(fill['order_id'])})
+
+    async def on_ws_connect(self, conn):
+        asyncio.ensure_future(self._ping(conn))
+
+    async def _ping(self, conn):
+        while not conn.ws.closed:
+            self.send(conn, {'action': 'ping', 'data': {'ts': _now_ms()}})
+            await asyncio.sleep(self.PING_INTERVAL)
+
+    async def on_ws_message(self, conn, data):
+        message = json.loads(data)
+        action, ch = message.get('action'), message.get('ch')
+
+        if action == 'req' and ch == 'auth':
+            self.send(conn, {'action': 'req', 'code': 200, 'ch': 'auth', 'data': {}})
+        elif action == 'sub':
+            conn.topics.add(ch)
+            self.send(conn, {'action': 'sub', 'code': 200, 'ch': ch, 'data': {}})
+        elif action == 'unsub':
+            conn.topics.discard(ch)
+            self.send(conn, {'action': 'unsub', 'code': 200, 'ch': ch, 'data': {}})
+
+    def user_topic_symbol(self, topic):
+        return topic.split('#')[1] if topic.startswith('orders#') else None
+
+    def user_messages(self, fill):
+        topic = f'orders#{fill["symbol"]}'
+        side = fill['side'].lower()
+        return [(topic, {'action': 'push', 'ch': topic,
+                         'data': {'eventType': 'trade', 'symbol': fill['symbol'], 'orderId': fill['order_id'],
+                                  'clientOrderId': fill['client_order_id'], 'orderSide': side,
+                                  'orderType': f'{side}-market', 'tradePrice': str(fill['price']),
+                                  'tradeVolume': str(fill['qty']), 'tradeId': fill['trade_id'],
+                                  'tradeTime': fill['ms'], 'aggressor': True, 'orderStatus': 'filled',
+                                  'remainAmt': '0'}})]
+
+
+class TelegramVenue(MockVenue):
+    def __init__(self, url, **kwargs):
+        super().__init__('TELEGRAM', url, None, **kwargs)
+        # chat_id -> sent and edited messages, newest last;
+        self.messages = {}
+        self._message_ids = itertools.count(1)
+
+    def routes(self):
+        return [web.post('/bot{token}/sendMessage', self._send_message),
+                web.post('/bot{token}/editMessageText', self._edit_message),
+                web.route('*', '/bot{token}/getUpdates', self._get_updates)]
+
+    def _message(self, params, message_id):
+        return {'message_id': message_id, 'date': int(time.time()), 'text': params.get('text', ''),
+                'chat': {'id': int(params['chat_id']), 'type': 'private'}}
+
+    async def _send_message(self, request):
+        params = await self.params(request)
+        message = self._message(params, next(self._message_ids))
+        self.messages.setdefault(message['chat']['id'], []).append(message)
+        return web.json_response({'ok': True, 'result': message})
+
+    async def _edit_message(self, request):
+        params = await self.params(request)
+        message = self._message(params, int(params['message_id']))
+        self.messages.setdefault(message['chat']['id'], []).append(message)
+        return web.json_response({'ok': True, 'result': message})
+
+    async def _get_updates(self, request):
+        return web.json_response({'ok': True, 'result': []})
+
+
+class MockExchange:
+    def __init__(self, env_vars=None, venues=None, **kwargs):
+        """
+
+        Parameters
+        ----------
+        env_vars dict; urls of the venues, the MOCK environment of config.json by default
+        venues list; names of the venues to serve, e.g. ['BINANCE_SPOT', 'OKEX'], None serves every venue
+        kwargs; rate, latency_ms, disconnect_every, user_rate, seed as MockVenue
+        """
+        env_vars = env_vars or load_environment('MOCK')
+
+        all_venues = [BinanceVenue('SPOT', env_vars['BINANCE_SPOT_URL'], env_vars['BINANCE_SPOT_WS_URL'], **kwargs),
+                      BinanceVenue('USDT-FUTURES', env_vars['BINANCE_USDT_FUTURES_URL'],
+                                   env_vars['BINANCE_USDT_FUTURES_WS_URL'], **kwargs),
+                      BinanceVenue('COIN-FUTURES', env_vars['BINANCE_COIN_FUTURES_URL'],
+                                   env_vars['BINANCE_COIN_FUTURES_WS_URL'], **kwargs),
+                      OkexVenue(env_vars['OKEX_URL'], env_vars['OKEX_WS_URL'], **kwargs),
+                      CoinbaseVenue(env_vars['COINBASE_SPOT_URL'], env_vars['COINBASE_WS_URL'], **kwargs),
+                      DeribitVenue(env_vars['DERIBIT_URL'], env_vars['DERIBIT_WS_URL'], **kwargs),
+                      HuobiVenue(env_vars['HUOBI_SPOT_URL'], env_vars['HUOBI_SPOT_WS_URL'], **kwargs),
+                      TelegramVenue(env_vars['TELEGRAM_API_URL'], **kwargs)]
+
+        self.venues = {venue.name: venue for venue in all_venues
+                       if venues is None or venue.name in [v.upper() for v in venues]}
+
+    async def start(self):
+        for venue in self.venues.values():
+            await venue.start()
+
+    async def close(self):
+        for venue in self.venues.values():
+            await venue.close()
+
+    def stats(self):
+        return {name: dict(venue.stats) for name, venue in self.venues.items()}
+
+    async def run_forever(self, stats_every=10):
+        await self.start()
+        try:
+            while True:
+                await asyncio.sleep(stats_every)
+                for name, stats in self.stats().items():
+                    print(f'{datetime.now()} {name:<22}{stats}')
+        finally:
+            await self.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='----MOCK EXCHANGE----')
+    parser.add_argument('--venues', nargs='+', default=None, help='e.g. BINANCE_SPOT OKEX, every venue by default')
+    parser.add_argument('--rate', type=float, default=10., help='public msgs/sec per subscribed stream')
+    parser.add_argument('--latency-ms', type=float, default=0., help='delay of every REST response and ws message')
+    parser.add_argument('--disconnect-every', type=float, default=0., help='seconds between ws drops, 0 never')
+    parser.add_argument('--user-rate', type=float, default=0., help='synthetic fills/sec per user stream')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stats-every', type=float, default=10.)
+
+    args = parser.parse_args()
+
+    mock = MockExchange(venues=args.venues, rate=args.rate, latency_ms=args.latency_ms,
+                        disconnect_every=args.disconnect_every, user_rate=args.user_rate, seed=args.seed)
+    try:
+        asyncio.run(mock.run_forever(args.stats_every))
+    except KeyboardInterrupt:
+        pass
@@ -1,5 +1,7 @@
 import requests
 
+from twapExecution.exchanges.env import env_vars
+
 
 #
 # tokens = {'pgex_binance_bot': '1492399420:AAGz-JOY0mBijyHJdDlzLjlAKFU_Yevmq0c',
@@ -16,19 +18,21 @@ import requests
 
 
 class TgBotAPI:
-    def __init__(self, token):
+    def __init__(self, token, timeout=10, api_url=None):
         self._token = token
+        self._timeout = timeout
+        self._api_url = api_url or env_vars.get('TELEGRAM_API_URL', 'https://api.telegram.org')
 
     def send_message(self, chat_id, message, parse_mode):
-        url = f'https://api.telegram.org/bot{self._token}/sendMessage'
+        url = f'{self._api_url}/bot{self._token}/sendMessage'
         data = {'chat_id': chat_id, 'text': message, 'parse_mode': parse_mode}
-        return requests.post(url, data).json()
+        return requests.post(url, data, timeout=self._timeout).json()
 
     def edit_message(self, chat_id, message_id, message, parse_mode):
-        url = f'https://api.telegram.org/bot{self._token}/editMessageText'
+        url = f'{self._api_url}/bot{self._token}/editMessageText'
         data = {'chat_id': chat_id, 'message_id': message_id, 'text': message, 'parse_mode': parse_mode}
-        return requests.post(url, data).json()
+        return requests.post(url, data, timeout=self._timeout).json()
 
     def get_updates(self, offset=0):
-        url = f'https://api.telegram.org/bot{self._token}/getUpdates?offset={offset}'
-        return requests.post(url).json()
+        url = f'{self._api_url}/bot{self._token}/getUpdates?offset={offset}'
+        return requests.post(url, timeout=self._timeout).json()
@@ -0,0 +1,146 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+from telegram import ParseMode
+
+from twapExecution.tgBot.tgBotAPI import TgBotAPI
+
+"""
+This is a Telegram Notifier, which takes Telegram sends/edits off the execution path;
+
+send() only queues the message and returns. A background worker thread delivers the queue in order, at most one
+message per chat every chat_interval seconds, and backs off when Telegram answers 429. Messages sent with a key are
+a single Telegram message: the first send creates it, later sends edit it, and edits still waiting in the queue
+are merged so only the latest text goes out.
+"""
+
+_notifiers = {}
+_notifiers_lock = threading.Lock()
+
+
+def _chat_key(chat_id):
+    # Rate limits are kept per chat, a list of chats (TELEGRAM_CHAT_ID) is one key;
+    return tuple(chat_id) if isinstance(chat_id, list) else chat_id
+
+
+class TgNotifier:
+    def __init__(self, tg_bot, chat_interval=1.0):
+        """
+
+        Parameters
+        ----------
+        tg_bot TgBotAPI;
+        chat_interval float; min seconds between two messages to the same chat
+        """
+        self._tg_bot = tg_bot
+        self._chat_interval = chat_interval
+
+        # key -> (chat_id, message, parse_mode), oldest first;
+        self._pending = OrderedDict()
+        # key -> message_id of the Telegram message the key edits;
+        self._message_ids = {}
+        # chat_id -> monotonic time the chat accepts the next message;
+        self._chat_ready = {}
+        self._in_flight = False
+        self._anonymous_keys = itertools.count()
+
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def send(self, chat_id, message, key=None, parse_mode=ParseMode.HTML):
+        """
+        Queues a message and returns immediately
+
+        Parameters
+        ----------
+        chat_id int or list; config.json TELEGRAM_CHAT_ID is a list
+        message string;
+        key hashable; messages with the same key edit one Telegram message, None sends a new message every time
+        parse_mode string;
+        """
+        if key is None:
+            key = ('_anonymous', next(self._anonymous_keys))
+
+        with self._cond:
+            # Replace in place so a merged edit keeps its position in the queue;
+            self._pending[key] = (chat_id, message, parse_mode)
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Blocks until everything queued so far is delivered; returns False on timeout
+        """
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+
+    def forget(self, key):
+        """
+        Drops the Telegram message a key edits, the next send with the key creates a new one
+        """
+        with self._cond:
+            self._message_ids.pop(key, None)
+
+    def _next_ready(self):
+        now = time.monotonic()
+        wait = None
+        for key, (chat_id, _, _) in self._pending.items():
+            ready = self._chat_ready.get(_chat_key(chat_id), 0)
+            if ready <= now:
+                return key, None
+            wait = ready - now if wait is None else min(wait, ready - now)
+        return None, wait
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while True:
+                    key, wait = self._next_ready()
+                    if key is not None:
+                        break
+                    self._cond.wait(wait)
+
+                chat_id, message, parse_mode = self._pending.pop(key)
+                message_id = self._message_ids.get(key)
+                self._in_flight = True
+
+            retry_after = None
+            try:
+                if message_id is None:
+                    response = self._tg_bot.send_message(chat_id, message=message, parse_mode=parse_mode)
+                else:
+                    response = self._tg_bot.edit_message(chat_id=chat_id, message_id=message_id,
+                                                         message=message, parse_mode=parse_mode)
+
+                if response.get('ok'):
+                    if message_id is None and key[0] != '_anonymous':
+                        with self._cond:
+                            self._message_ids[key] = response['result']['message_id']
+                elif response.get('error_code') == 429:
+                    retry_after = response.get('parameters', {}).get('retry_after', 5)
+                    print(f'TELEGRAM RATE LIMITED, RETRY AFTER {retry_after}s')
+                elif 'message is not modified' not in response.get('description', ''):
+                    print(f'CANNOT SEND TELEGRAM MESSAGE! ERROR: {response}')
+            except Exception as e:
+                print(f'CANNOT SEND TELEGRAM MESSAGE! ERROR: {e}')
+
+            with self._cond:
+                self._chat_ready[_chat_key(chat_id)] = time.monotonic() + max(self._chat_interval, retry_after or 0)
+                # Put a rate limited message back at the front, unless a newer edit of it is already queued;
+                if retry_after is not None and key not in self._pending:
+                    self._pending[key] = (chat_id, message, parse_mode)
+                    self._pending.move_to_end(key, last=False)
+                self._in_flight = False
+                self._cond.notify_all()
+
+
+def get_notifier(token, chat_interval=1.0):
+    """
+    Returns the process wide TgNotifier of a bot token, so every execution in the process shares its rate limit
+    """
+    with _notifiers_lock:
+        if token not in _notifiers:
+            _notifiers[token] = TgNotifier(TgBotAPI(token), chat_interval=chat_interval)
+        return _notifiers[token]
@@ -11,6 +11,8 @@ from telegram.ext import Updater
 from twapExecution.exchanges.binance.binanceClient import BinanceClient
 from twapExecution.exchanges.deribit.deribitClient import DeribitClient
 from twapExecution.exchanges.env import env_vars
+from twapExecution.exchanges.executionMethods.controlChannel import send_control_command
+from twapExecution.exchanges.executionMethods.twapEngine import send_engine_command
 from twapExecution.exchanges.huobi.huobiSpotClient import HuobiSpotClient
 from twapExecution.exchanges.okex.okexFuturesClient import OkexFuturesClient
 from twapExecution.exchanges.okex.okexSpotClient import OkexSpotClient
@@ -18,6 +20,9 @@ from twapExecution.exchanges.utils.utils import spacedict
 
 print(f'Telegram Start --- {threading.enumerate()}')
 
+# Send every /start to one running TWAPEngine process instead of spawning a process per order;
+ENGINE_MODE = False
+
 updater = Updater(token=env_vars['TELEGRAM_TWAP_BOT'],
                   use_context=True)
 
@@ -47,6 +52,20 @@ def start(update, context):
     exchange = context.args[0]
     market = context.args[1]
 
+    if ENGINE_MODE:
+        print('SEND TWAP TO ENGINE!!')
+        try:
+            response = send_engine_command({'cmd': 'start', 'args': context.args})
+        except OSError as e:
+            response = {'ok': False, 'error': f'TWAP engine is not running: {e}'}
+
+        if not response['ok']:
+            context.bot.send_message(chat_id=update.effective_chat.id,
+                                     text='<code>' + response['error'] + '</code>',
+                                     parse_mode=ParseMode.HTML)
+        print(f'END! --- {threading.enumerate()}')
+        return
+
     print('RUN TWAP SCRIPT!!')
     subprocess.call(f'nohup {os.path.join(os.getcwd(), ".env", "bin", "python")} '
                     f'-u -m twapExecution.exchanges.executionMethods.baseTWAP --args {" ".join(context.args)} > '
@@ -57,6 +76,123 @@ def start(update, context):
     print(f'END! --- {threading.enumerate()}')
 
 
+# BASKET COMMAND; one process executes every leg, /stop [exchange] [market] basket stops it
+def basket(update, context):
+    if len(context.args) < 9 or (len(context.args) - 5) % 4 != 0:
+        context.bot.send_message(chat_id=update.effective_chat.id,
+                                 text='<pre>/basket [exchange|market|mins|trades/min|cont|pair|qty|side|limit ...]</pre>',
+                                 parse_mode=ParseMode.HTML)
+        return
+
+    exchange, market = context.args[0], context.args[1]
+    legs = context.args[5:]
+
+    context.bot.send_message(chat_id=update.effective_chat.id,
+                             text='<code>' + f"--------------------------------\nStarting Basket TWAP on "
+                                             f"{exchange.capitalize()} {market.capitalize()}, {len(legs) // 4} legs!\n"
+                                             f"--------------------------------\n{' '.join(context.args)}" + '</code>',
+                             parse_mode=ParseMode.HTML)
+
+    print('RUN BASKET TWAP SCRIPT!!')
+    subprocess.call(f'nohup {os.path.join(os.getcwd(), ".env", "bin", "python")} '
+                    f'-u -m twapExecution.exchanges.executionMethods.basketTWAP --args {" ".join(context.args[:5])} '
+                    f'--legs {" ".join(legs)} > '
+                    f'{os.path.join(os.getcwd(), f"{exchange.upper()}_{market.upper()}_BASKET_TWAP.log")} &',
+                    shell=True)
+
+
+# STOP/PAUSE/RESUME/MODIFY COMMANDS; pushed once to the control channel of every matching execution
+def _control(update, context, action):
+    if len(context.args) < 2:
+        context.bot.send_message(chat_id=update.effective_chat.id,
+                                 text=f'<pre>/{action} [exchange|market|pair]</pre>',
+                                 parse_mode=ParseMode.HTML)
+        return
+
+    exchange = context.args[0]
+    market = context.args[1]
+    coin = context.args[2] if len(context.args) > 2 else None
+    args = context.args[3:] if action == 'modify' else None
+
+    try:
+        responses = send_control_command(exchange, market, action, coin=coin, args=args)
+    except Exception as e:
+        responses = {'': {'ok': False, 'error': str(e)}}
+
+    if not responses:
+        output_string = f'No TWAP running on {exchange.capitalize()} {market.capitalize()}{" " + coin.upper() if coin else ""}'
+    else:
+        output_string = '\n'.join(f'{name}: ' + ('OK' if response['ok'] else response['error'])
+                                  for name, response in responses.items())
+
+    context.bot.send_message(chat_id=update.effective_chat.id,
+                             text='<code>' + f"--------------------------------\n{action.capitalize()}\n"
+                                             f"--------------------------------\n" + output_string + '</code>',
+                             parse_mode=ParseMode.HTML)
+
+
+def stop(update, context):
+    _control(update, context, 'stop')
+
+
+def pause(update, context):
+    _control(update, context, 'pause')
+
+
+def resume(update, context):
+    _control(update, context, 'resume')
+
+
+def modify(update, context):
+    _control(update, context, 'modify')
+
+
+# STREAMS COMMAND; health of the WS connections of every matching execution
+def _format_stream(stream):
+    state = 'up' if stream['connected'] else 'DOWN'
+    output = f"{stream['name']}: {state}, {stream['msg_rate']} msg/s, lag p50/p99 {stream['lag_p50_ms']}/" \
+             f"{stream['lag_p99_ms']} ms, ping {stream['ping_rtt_ms']} ms, silent {stream['silence']} s"
+    if stream['stale']:
+        output += f", STALE: {stream['stale']}"
+    return output
+
+
+def streams(update, context):
+    if len(context.args) < 2:
+        context.bot.send_message(chat_id=update.effective_chat.id,
+                                 text='<pre>/streams [exchange|market|pair*]</pre>',
+                                 parse_mode=ParseMode.HTML)
+        return
+
+    exchange = context.args[0]
+    market = context.args[1]
+    coin = context.args[2] if len(context.args) > 2 else None
+
+    try:
+        responses = send_control_command(exchange, market, 'metrics', coin=coin)
+    except Exception as e:
+        responses = {'': {'ok': False, 'error': str(e)}}
+
+    # Executions in one engine process share their streams, show each once;
+    lines = {}
+    for name, response in responses.items():
+        if not response['ok']:
+            lines[name] = f'{name}: ' + response['error']
+            continue
+        for stream in response['streams']:
+            lines[stream['name']] = _format_stream(stream)
+
+    if not lines:
+        output_string = f'No TWAP running on {exchange.capitalize()} {market.capitalize()}{" " + coin.upper() if coin else ""}'
+    else:
+        output_string = '\n'.join(lines[name] for name in sorted(lines))
+
+    context.bot.send_message(chat_id=update.effective_chat.id,
+                             text='<code>' + f"--------------------------------\nStreams\n"
+                                             f"--------------------------------\n" + output_string + '</code>',
+                             parse_mode=ParseMode.HTML)
+
+
 # ACCOUNT INFO COMMAND
 def account(update, context):
     exchange = context.args[0].upper()
@@ -224,7 +360,7 @@ def account(update, context):
                 output_string += '<code>\n----------------------\n</code>'
 
     else:
-        raise Exception('Only Coinbase/Binance/Okex/Huobi/Deribit is supported.')i
+        raise Exception('Only Coinbase/Binance/Okex/Huobi/Deribit is supported.')
 
     context.bot.send_message(chat_id=update.effective_chat.id, text=output_string, parse_mode=ParseMode.HTML)
 
@@ -261,10 +397,23 @@ def help(update, context):
                    '  [leverage]    futures only: 1*, 2... 125\n' \
                    '  [account]     deribit only: main, sub1*, sub2</pre>\n'
 
-    output_stop = '<pre>/stop [exchange|market]</pre>'
+    output_basket = '<pre>' \
+                    '/basket\n' \
+                    '  [exchange] [market] [mins] [trades/min] [cont]\n' \
+                    '  [pair] [qty] [side] [limit]  repeated for every leg\n' \
+                    '  legs are kept in step by notional, /stop [exchange|market|basket]</pre>\n'
+
+    output_stop = '<pre>' \
+                  '/stop   [exchange|market|pair*]\n' \
+                  '/pause  [exchange|market|pair*]\n' \
+                  '/resume [exchange|market|pair*]\n' \
+                  '/modify [exchange|market|pair|field|value]\n' \
+                  '  [field]       price_threshold/qty\n' \
+                  '/streams [exchange|market|pair*]\n' \
+                  '  * optional, all pairs when left out</pre>'
 
     context.bot.send_message(chat_id=update.effective_chat.id,
-                             text=instruments + '\n' + output_summary + '\n' + template_summary + '\n' + alert_summary + '\n' + output_start + '\n' + output_stop,
+                             text=instruments + '\n' + output_summary + '\n' + template_summary + '\n' + alert_summary + '\n' + output_start + '\n' + output_basket + '\n' + output_stop,
                              parse_mode=ParseMode.HTML)
 
     # HELP COMMAND
@@ -323,19 +472,31 @@ def alert(update, context):
 
 # PUT ALL COMMAND INTO HANDLER;
 start_handler = CommandHandler('start', start, pass_args=True)
+basket_handler = CommandHandler('basket', basket, pass_args=True)
 account_handler = CommandHandler('account', account)
 help_handler = CommandHandler('help', help)
 template_handler = CommandHandler('template', template)
 alert_handler = CommandHandler('alert', alert)
+stop_handler = CommandHandler('stop', stop)
+pause_handler = CommandHandler('pause', pause)
+resume_handler = CommandHandler('resume', resume)
+modify_handler = CommandHandler('modify', modify)
+streams_handler = CommandHandler('streams', streams)
 
 print(f'Telegram After Setting Handler --- {threading.enumerate()}')
 
 # ADD THE HANDLERS TO DISPATCHER
 dispatcher.add_handler(start_handler)
+dispatcher.add_handler(basket_handler)
 dispatcher.add_handler(help_handler)
 dispatcher.add_handler(template_handler)
 dispatcher.add_handler(account_handler)
 dispatcher.add_handler(alert_handler)
+dispatcher.add_handler(stop_handler)
+dispatcher.add_handler(pause_handler)
+dispatcher.add_handler(resume_handler)
+dispatcher.add_handler(modify_handler)
+dispatcher.add_handler(streams_handler)
 
 print(f'Telegram After Adding Handlers --- {threading.enumerate()}')
 